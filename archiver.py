@@ -0,0 +1,107 @@
+# Moves settled bets and matches out of the live tables.
+# Live queries only look for PENDING/OPEN/ACTIVE rows, so everything that has
+# been settled for a while is copied to <table>_archive and deleted from the
+# live table in small batches, keeping those tables (and their indexes) small.
+
+import asyncio
+import json
+import os
+import time
+from discord.ext import commands, tasks
+from dotenv import load_dotenv
+from database import db_manager
+from queries import ARCHIVED_TABLES, ARCHIVED_CHILDREN
+import logger
+
+load_dotenv()
+
+# Settled rows older than this many days are archived (0 turns the archiver off)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# Rows moved per transaction; the writer is released between batches
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Minutes between archiver runs
+ARCHIVE_INTERVAL_MINUTES = float(os.getenv("ARCHIVE_INTERVAL_MINUTES", "60"))
+
+class Archiver(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # Metrics
+        self.runs = 0
+        self.archived = {table: 0 for table in ARCHIVED_TABLES}
+        self.last_run_at = None
+        self.last_run_rows = 0
+        self.last_run_ms = 0.0
+
+    async def cog_load(self):
+        if ARCHIVE_AFTER_DAYS > 0:
+            self.archive_loop.start()
+
+    async def cog_unload(self):
+        self.archive_loop.cancel()
+
+    async def archive_batch(self, table, cutoff, limit):
+        """Move up to `limit` settled rows of one table. Returns how many moved."""
+        async with db_manager.write() as db:
+            rows = await db.fetchall(f"archive.{table}.due", (cutoff, limit))
+            if not rows:
+                return 0
+            ids = json.dumps([row[0] for row in rows])
+
+            child = ARCHIVED_CHILDREN.get(table)
+            if child:
+                await db.run(f"archive.{child[0]}.copy", (ids,))
+                await db.run(f"archive.{child[0]}.delete", (ids,))
+            await db.run(f"archive.{table}.copy", (ids,))
+            await db.run(f"archive.{table}.delete", (ids,))
+        return len(rows)
+
+    async def run_archive(self, days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+        """Archive every table until no due rows are left. Returns {table: rows moved}."""
+        start = time.perf_counter()
+        cutoff = f"-{days} days"
+        moved = {}
+        for table in ARCHIVED_TABLES:
+            total = 0
+            while True:
+                count = await self.archive_batch(table, cutoff, batch_size)
+                total += count
+                if count < batch_size:
+                    break
+                # Let queued XP flushes, bets and spins take the writer between batches
+                await asyncio.sleep(0)
+            if total:
+                moved[table] = total
+                self.archived[table] += total
+
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_run_rows = sum(moved.values())
+        self.last_run_ms = (time.perf_counter() - start) * 1000
+        if moved:
+            summary = ", ".join(f"{table}: {count}" for table, count in moved.items())
+            logger.info(f"Archived {self.last_run_rows} settled rows in {self.last_run_ms:.0f} ms ({summary})")
+        return moved
+
+    @tasks.loop(minutes=ARCHIVE_INTERVAL_MINUTES)
+    async def archive_loop(self):
+        try:
+            await self.run_archive()
+        except Exception as e:
+            logger.error(f"Archiver run failed: {e}")
+
+    @archive_loop.before_loop
+    async def before_archive_loop(self):
+        await self.bot.wait_until_ready()
+
+    def stats(self):
+        return {
+            "after_days": ARCHIVE_AFTER_DAYS,
+            "runs": self.runs,
+            "archived": dict(self.archived),
+            "last_run_at": self.last_run_at,
+            "last_run_rows": self.last_run_rows,
+            "last_run_ms": self.last_run_ms,
+        }
+
+async def setup(bot):
+    await bot.add_cog(Archiver(bot))
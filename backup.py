@@ -0,0 +1,178 @@
+# Online backups of bot_data.db.
+# Uses SQLite's backup API from a worker thread instead of copying the file, so
+# a snapshot is always a consistent database (never a half-written page or a
+# file missing its WAL) and the event loop keeps serving commands meanwhile.
+
+import asyncio
+import datetime
+import glob
+import os
+import sqlite3
+import time
+import discord
+from discord.ext import commands, tasks
+from dotenv import load_dotenv
+from database import db_manager
+import logger
+
+load_dotenv()
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+# Hours between scheduled snapshots (0 turns the schedule off, /backup still works)
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "6"))
+# Scheduled snapshots kept in BACKUP_DIR; older ones are deleted
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+# Pages copied per step (4 KiB each) and the pause between steps
+BACKUP_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES", "1024"))
+BACKUP_STEP_SLEEP = 0.005
+
+# One snapshot at a time, whether scheduled, manual or from /checkupdate
+_backup_lock = asyncio.Lock()
+
+def _copy_database(src_path, dest_path, pages, sleep):
+    """Runs in a worker thread. Returns (page_count, steps)."""
+    src = sqlite3.connect(src_path, isolation_level=None, timeout=5)
+    dst = sqlite3.connect(dest_path, isolation_level=None)
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+
+    try:
+        # Hold one read transaction across every step so the copy is a single
+        # point-in-time snapshot. Under WAL this doesn't block the bot's writer,
+        # and the backup never has to restart because a write landed mid-copy.
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        src.execute("COMMIT")
+
+        # The copy inherits WAL mode; switch it back so the backup is one self-contained file
+        dst.execute("PRAGMA journal_mode = DELETE")
+        page_count = dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    return page_count, steps
+
+async def snapshot(dest_path, pages=BACKUP_STEP_PAGES):
+    """
+    Copy the live database to dest_path.
+    Returns {"path", "bytes", "pages", "steps", "seconds", "bytes_per_sec"}.
+    """
+    tmp_path = f"{dest_path}.partial"
+    async with _backup_lock:
+        start = time.perf_counter()
+        try:
+            page_count, steps = await asyncio.to_thread(_copy_database, db_manager.db_file, tmp_path, pages, BACKUP_STEP_SLEEP)
+            # Only a finished copy ever gets the real name
+            os.replace(tmp_path, dest_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        seconds = time.perf_counter() - start
+
+    size = os.path.getsize(dest_path)
+    return {
+        "path": dest_path,
+        "bytes": size,
+        "pages": page_count,
+        "steps": steps,
+        "seconds": seconds,
+        "bytes_per_sec": size / seconds if seconds > 0 else 0.0,
+    }
+
+def list_backups(directory=BACKUP_DIR):
+    """Scheduled/manual snapshots in directory, newest first."""
+    paths = glob.glob(os.path.join(directory, "bot_data-*.db"))
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+def prune(directory=BACKUP_DIR, keep=BACKUP_KEEP):
+    removed = []
+    for path in list_backups(directory)[max(keep, 1):]:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            logger.error(f"Could not remove old backup {path}: {e}")
+    return removed
+
+def format_result(result):
+    mb = result['bytes'] / (1024 * 1024)
+    rate = result['bytes_per_sec'] / (1024 * 1024)
+    return f"{mb:.2f} MB in {result['seconds']:.2f}s ({rate:.1f} MB/s, {result['steps']} steps)"
+
+class Backups(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.last_result = None
+        self.last_error = None
+
+    async def cog_load(self):
+        if BACKUP_INTERVAL_HOURS > 0:
+            self.scheduled_backup.start()
+
+    async def cog_unload(self):
+        self.scheduled_backup.cancel()
+
+    async def take_backup(self):
+        """Flush buffered writes, snapshot into BACKUP_DIR and apply retention."""
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        leveling_cog = self.bot.get_cog("Leveling")
+        if leveling_cog:
+            await leveling_cog.xp.flush()
+
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        try:
+            result = await snapshot(os.path.join(BACKUP_DIR, f"bot_data-{stamp}.db"))
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        self.last_result = result
+        self.last_error = None
+
+        removed = prune()
+        logger.success(f"Database backup written to {result['path']}: {format_result(result)}")
+        if removed:
+            logger.info(f"Pruned {len(removed)} old backups (keeping {BACKUP_KEEP}).")
+        return result
+
+    @tasks.loop(hours=BACKUP_INTERVAL_HOURS or 24)
+    async def scheduled_backup(self):
+        # Frequent restarts shouldn't pile up snapshots: skip if the newest is still fresh
+        existing = list_backups()
+        if existing and time.time() - os.path.getmtime(existing[0]) < BACKUP_INTERVAL_HOURS * 3600 * 0.9:
+            return
+        try:
+            await self.take_backup()
+        except Exception as e:
+            logger.error(f"Scheduled backup failed: {e}")
+
+    @scheduled_backup.before_loop
+    async def before_scheduled_backup(self):
+        await self.bot.wait_until_ready()
+
+    @commands.hybrid_command(name="backup", description="Take a database backup now (Admin only)")
+    async def backup(self, ctx):
+        if not ctx.author.guild_permissions.administrator:
+            return await ctx.send("You need Administrator permissions.", ephemeral=True)
+
+        await ctx.defer()
+        try:
+            result = await self.take_backup()
+        except Exception as e:
+            return await ctx.send(f"❌ Backup failed: {e}")
+
+        embed = discord.Embed(title="💾 Database Backup", color=discord.Color.green())
+        embed.add_field(name="File", value=f"`{result['path']}`", inline=False)
+        embed.add_field(name="Size", value=f"{result['bytes'] / (1024 * 1024):.2f} MB ({result['pages']} pages)")
+        embed.add_field(name="Duration", value=f"{result['seconds']:.2f}s ({result['steps']} steps)")
+        embed.add_field(name="Throughput", value=f"{result['bytes_per_sec'] / (1024 * 1024):.1f} MB/s")
+        schedule = f"every {BACKUP_INTERVAL_HOURS:g}h" if BACKUP_INTERVAL_HOURS > 0 else "off"
+        embed.set_footer(text=f"Schedule: {schedule} | Keeping {BACKUP_KEEP} | {len(list_backups())} on disk")
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Backups(bot))
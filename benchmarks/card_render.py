@@ -0,0 +1,154 @@
+"""
+Measures rank card renders/sec with and without the prebuilt card template.
+
+"per-card setup" is render_card as it was before card_template: three
+ImageFont.truetype calls and a full-size overlay image for every card.
+"template" is the current render_card. Both draw the same card from prepared
+avatar/background pixels, in this process and then through RenderService.
+
+    python benchmarks/card_render.py [--seconds 5] [--workers 2] [--no-background]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Fonts are loaded by relative path, like the bot does from its own directory
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+from card_renderer import (  # noqa: E402
+    CardSpec, RenderService, hex_to_rgb, prepare_avatar, prepare_background, render_card,
+    WIDTH, HEIGHT, AVATAR_SIZE,
+)
+
+
+def legacy_render(spec):
+    """render_card before card_template: fonts and overlay built per card."""
+    if spec.background:
+        image = Image.frombytes("RGBA", (WIDTH, HEIGHT), spec.background)
+    else:
+        image = Image.new("RGBA", (WIDTH, HEIGHT), hex_to_rgb(spec.card_bg_color))
+
+    overlay = Image.new("RGBA", (WIDTH, HEIGHT), (0, 0, 0, 0))
+    draw_overlay = ImageDraw.Draw(overlay)
+    box_x, box_y, box_w, box_h = 20, 20, 860, 210
+    alpha = int(255 * spec.card_opacity)
+    draw_overlay.rectangle((box_x, box_y, box_x + box_w, box_y + box_h), fill=(0, 0, 0, alpha))
+    image = Image.alpha_composite(image, overlay)
+    draw = ImageDraw.Draw(image)
+
+    avatar = Image.frombytes("RGBA", (AVATAR_SIZE, AVATAR_SIZE), spec.avatar)
+    border_size = 5
+    draw.ellipse((50 - border_size, 50 - border_size, 50 + AVATAR_SIZE + border_size, 50 + AVATAR_SIZE + border_size), fill=hex_to_rgb(spec.card_color))
+    image.paste(avatar, (50, 50), mask=avatar)
+
+    text_color = (255, 255, 255)
+    try:
+        font_large = ImageFont.truetype("Roboto-Bold.ttf", 60)
+        font_medium = ImageFont.truetype("Roboto-Regular.ttf", 40)
+        font_small = ImageFont.truetype("Roboto-Regular.ttf", 30)
+    except OSError:
+        font_large = font_medium = font_small = ImageFont.load_default()
+
+    draw.text((230, 50), spec.username, font=font_large, fill=text_color)
+    draw.text((230, 120), f"Rank #{spec.rank}   Level {spec.level}", font=font_medium, fill=text_color)
+
+    needed = 100
+    current_progress = spec.xp - spec.level * 100
+    xp_text = f"{current_progress} / {needed} XP"
+    bbox = font_small.getbbox(xp_text)
+    draw.text((860 - (bbox[2] - bbox[0]) - 20, 170), xp_text, font=font_small, fill=text_color)
+
+    bar_x, bar_y, bar_w, bar_h = 230, 180, 600, 20
+    draw.rectangle((bar_x, bar_y, bar_x + bar_w, bar_y + bar_h), fill=(50, 50, 50))
+    percent = max(0, min(1, current_progress / needed))
+    draw.rectangle((bar_x, bar_y, bar_x + int(bar_w * percent), bar_y + bar_h), fill=hex_to_rgb(spec.card_color))
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_spec(with_background):
+    def png(color, size):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, color).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    background = prepare_background(png("purple", (1800, 600)), 0, 0, 900) if with_background else None
+    return CardSpec(
+        username="benchmark", xp=1234, level=12, rank=3, progress=34, needed=100,
+        avatar=prepare_avatar(png("green", (256, 256))), background=background,
+    )
+
+
+def encode_only(spec):
+    """Just the PNG encode of a finished card, the part neither version can skip."""
+    image = Image.open(io.BytesIO(render_card(spec)))
+    image.load()
+
+    def encode(_):
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        return buffer.getvalue()
+    return encode
+
+
+def run_inline(render, spec, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        render(spec)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+async def run_service(spec, seconds, workers):
+    service = RenderService(workers=workers, max_queue=workers * 4)
+    await service.start()
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+
+    async def client():
+        nonlocal count
+        while time.perf_counter() < deadline:
+            await service.render(spec)
+            count += 1
+
+    await asyncio.gather(*(client() for _ in range(workers * 2)))
+    rate = count / (time.perf_counter() - start)
+    stats = service.stats()
+    service.shutdown()
+    return rate, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-background", action="store_true")
+    args = parser.parse_args()
+
+    spec = make_spec(not args.no_background)
+    assert legacy_render(spec) == render_card(spec), "template render differs from the legacy render"
+
+    before = run_inline(legacy_render, spec, args.seconds)
+    after = run_inline(render_card, spec, args.seconds)
+    print(f"{'render':<16} {'cards/s':>10}")
+    print(f"{'per-card setup':<16} {before:>10.1f}")
+    print(f"{'template':<16} {after:>10.1f}   ({after / before:.2f}x)")
+    encode = run_inline(encode_only(spec), spec, args.seconds)
+    print(f"{'PNG encode only':<16} {encode:>10.1f}   ({1000 / encode:.1f} ms of every card)")
+
+    rate, stats = asyncio.run(run_service(spec, args.seconds, args.workers))
+    print(f"{f'pool x{args.workers}':<16} {rate:>10.1f}   (p50 {stats['render_p50_ms']:.1f} ms, p99 {stats['render_p99_ms']:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
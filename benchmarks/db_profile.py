@@ -0,0 +1,109 @@
+"""
+Compares XP write and rank read throughput on bot_data.db settings.
+
+Runs the same mixed workload as Leveling.on_message + /rank against a throwaway
+database for each profile: the old rollback journal, WAL "fast" and WAL "safe".
+
+    python benchmarks/db_profile.py [--seconds 5] [--users 5000] [--readers 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ConnectionPool  # noqa: E402
+
+GUILD_ID = 1
+
+
+class RollbackPool(ConnectionPool):
+    """The pool as it was before the startup profile: default journal, no PRAGMAs."""
+    journal_mode = "DELETE"
+
+    async def _configure(self, conn):
+        pass
+
+
+async def seed(pool, users):
+    async with pool.write() as db:
+        await db.execute("""
+            CREATE TABLE user_levels (
+                guild_id INTEGER, user_id INTEGER, xp INTEGER DEFAULT 0, level INTEGER DEFAULT 0,
+                last_message_time REAL, PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        await db.executemany(
+            "INSERT INTO user_levels (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)",
+            [(GUILD_ID, uid, random.randint(0, 50000), 0) for uid in range(users)]
+        )
+
+
+async def xp_writer(pool, users, deadline, counter):
+    while time.perf_counter() < deadline:
+        uid = random.randrange(users)
+        # Same shape as Leveling.add_xp: read current XP, upsert, commit
+        async with pool.write() as db:
+            async with db.execute("SELECT xp, level FROM user_levels WHERE guild_id = ? AND user_id = ?", (GUILD_ID, uid)) as cursor:
+                xp, level = await cursor.fetchone()
+            xp += 15
+            await db.execute("""
+                INSERT INTO user_levels (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET xp = ?, level = ?
+            """, (GUILD_ID, uid, xp, level, xp, level))
+        counter["writes"] += 1
+
+
+async def rank_reader(pool, users, deadline, counter):
+    while time.perf_counter() < deadline:
+        uid = random.randrange(users)
+        async with pool.read() as db:
+            async with db.execute("SELECT xp FROM user_levels WHERE guild_id = ? AND user_id = ?", (GUILD_ID, uid)) as cursor:
+                xp = (await cursor.fetchone())[0]
+            async with db.execute("SELECT COUNT(*) FROM user_levels WHERE guild_id = ? AND xp > ?", (GUILD_ID, xp)) as cursor:
+                await cursor.fetchone()
+        counter["reads"] += 1
+
+
+async def run_profile(name, pool_factory, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = pool_factory(os.path.join(tmp, "bench.db"), args.readers)
+        await seed(pool, args.users)
+
+        # Writes on their own first, then writes competing with /rank readers
+        solo = {"writes": 0, "reads": 0}
+        start = time.perf_counter()
+        await xp_writer(pool, args.users, start + args.seconds, solo)
+        solo_rate = solo["writes"] / (time.perf_counter() - start)
+
+        mixed = {"writes": 0, "reads": 0}
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        tasks = [xp_writer(pool, args.users, deadline, mixed)]
+        tasks += [rank_reader(pool, args.users, deadline, mixed) for _ in range(args.readers)]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        await pool.close()
+        print(f"{name:<10} {solo_rate:>14.0f} {mixed['writes'] / elapsed:>14.0f} {mixed['reads'] / elapsed:>14.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'writes/s solo':>14} {'writes/s mixed':>14} {'reads/s mixed':>14}")
+    await run_profile("rollback", lambda path, r: RollbackPool(path, r), args)
+    await run_profile("wal-fast", lambda path, r: ConnectionPool(path, r, durability="fast"), args)
+    await run_profile("wal-safe", lambda path, r: ConnectionPool(path, r, durability="safe"), args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands, tasks
-import aiosqlite
+from database import db_manager
+from config_manager import config_manager
 import datetime
 
 class Birthdays(commands.Cog):
@@ -20,12 +21,7 @@ class Birthdays(commands.Cog):
             day = d.day
             month = d.month
 
-            async with aiosqlite.connect("bot_data.db") as db:
-                await db.execute("""
-                    INSERT INTO birthdays (user_id, day, month) VALUES (?, ?, ?)
-                    ON CONFLICT(user_id) DO UPDATE SET day = ?, month = ?
-                """, (ctx.author.id, day, month, day, month))
-                await db.commit()
+            await db_manager.run("birthdays.set", (ctx.author.id, day, month))
 
             await ctx.send(f"Birthday set to {date} (Month/Day)!")
         except ValueError:
@@ -36,9 +32,7 @@ class Birthdays(commands.Cog):
         now = datetime.datetime.now()
         day, month = now.day, now.month
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT user_id FROM birthdays WHERE day = ? AND month = ?", (day, month)) as cursor:
-                users = await cursor.fetchall()
+        users = await db_manager.fetchall("birthdays.today", (day, month))
 
         if not users: return
 
@@ -47,7 +41,6 @@ class Birthdays(commands.Cog):
         # Ideally, we add 'birthday_channel_id' to config.
         # For now, let's use 'log_channel_id' or general.
 
-        from database import db_manager
 
         for user_row in users:
             user_id = user_row[0]
@@ -60,8 +53,8 @@ class Birthdays(commands.Cog):
                     channel = discord.utils.get(guild.text_channels, name="general")
                     if not channel:
                         # Fallback to log channel
-                        config = await db_manager.get_guild_config(guild.id)
-                        lid = config.get('log_channel_id')
+                        config = await config_manager.get_guild_config(guild.id)
+                        lid = config.log_channel_id
                         if lid: channel = guild.get_channel(lid)
 
                     if channel:
@@ -12,6 +12,8 @@ import shutil
 import sys
 from config_manager import config_manager
 from database import db_manager
+import queries
+import backup
 import logger
 
 # Load environment variables
@@ -49,11 +51,17 @@ class MyBot(commands.Bot):
         # Initialize DB
         await db_manager.init_db()
         await db_manager.migrate_from_json()
+        await config_manager.preload()
 
         # Sync slash commands globally
         await self.tree.sync()
         logger.success(f"Commands synced. Bot Version: {BOT_VERSION}")
 
+    async def close(self):
+        # Cogs are unloaded by super().close(), so they can still flush to the DB first
+        await super().close()
+        await db_manager.close()
+
 bot = MyBot()
 
 # Helper to check permissions (Async now)
@@ -76,9 +84,9 @@ async def is_admin_or_mod(obj):
         if obj.permissions.administrator:
             return True
 
-    # Check Configured Mod Roles via DB
+    # Check Configured Mod Roles (cached)
     config = await config_manager.get_guild_config(guild.id)
-    mod_roles = config.get('mod_roles', [])
+    mod_roles = config.mod_roles
 
     if mod_roles:
         for role in user.roles:
@@ -148,10 +156,19 @@ async def perform_update(interaction_or_ctx):
             has_config_backup = True
             logger.info("Backed up guild_configs.json")
 
+        # Write buffered XP first so the copy has it
+        leveling_cog = bot.get_cog("Leveling")
+        if leveling_cog:
+            await leveling_cog.xp.flush()
+
         if os.path.exists("bot_data.db"):
-            shutil.copy2("bot_data.db", db_backup_path)
+            # Online backup: a consistent copy even if a write lands mid-way
+            result = await backup.snapshot(db_backup_path)
             has_db_backup = True
-            logger.info("Backed up bot_data.db")
+            logger.info(f"Backed up bot_data.db ({backup.format_result(result)})")
+
+        # Checkpoint the WAL and release the file before git touches it
+        await db_manager.close()
 
         # 2. Git Operations
         # We assume origin is set up correctly in the environment
@@ -188,6 +205,7 @@ async def perform_update(interaction_or_ctx):
             logger.info("Restored guild_configs.json")
 
         if has_db_backup and os.path.exists(db_backup_path):
+            await db_manager.close()
             shutil.move(db_backup_path, "bot_data.db")
             logger.info("Restored bot_data.db")
 
@@ -1056,6 +1074,152 @@ async def update_bot(ctx):
 
     await perform_update(ctx)
 
+@bot.command(name="dbstats", help="Show database connection pool statistics (Admin only)")
+async def db_stats(ctx):
+    if not ctx.author.guild_permissions.administrator:
+        return await ctx.send("You need Administrator permissions.")
+
+    stats = db_manager.pool_stats()
+    embed = discord.Embed(title="🗄️ Database Pool", color=discord.Color.blue())
+    embed.add_field(name="Durability", value=stats['durability'])
+    embed.add_field(name="Readers", value=f"{stats['readers_in_use']}/{stats['readers']} checked out")
+    embed.add_field(name="Writer", value="Busy" if stats['writer_in_use'] else "Idle")
+    embed.add_field(name="Acquires", value=f"Read: {stats['read_acquires']} | Write: {stats['write_acquires']}", inline=False)
+    embed.add_field(name="Read Wait", value=f"avg {stats['read_wait_avg_ms']:.2f} ms | max {stats['read_wait_max_ms']:.2f} ms", inline=False)
+    embed.add_field(name="Write Wait", value=f"avg {stats['write_wait_avg_ms']:.2f} ms | max {stats['write_wait_max_ms']:.2f} ms", inline=False)
+
+    cfg = config_manager.stats()
+    embed.add_field(name="Config Cache", value=f"{cfg['cached']} guilds | Hits: {cfg['hits']} | Misses: {cfg['misses']} ({cfg['hit_rate']:.1%} hit rate)", inline=False)
+
+    leveling_cog = bot.get_cog("Leveling")
+    if leveling_cog:
+        xp = leveling_cog.xp.stats()
+        last = f"{xp['last_flush_rows']} rows in {xp['last_flush_ms']:.1f} ms" if xp['last_flush_at'] else "never"
+        embed.add_field(
+            name="XP Write-Behind",
+            value=(f"Pending: {xp['queue_depth']}/{xp['max_pending']} (peak {xp['max_depth']}) | Cached: {xp['cached']}\n"
+                   f"Every {xp['flush_interval']:g}s | Flushes: {xp['flushes']} ({xp['rows_flushed']} rows) | Last: {last}"),
+            inline=False
+        )
+        cd = leveling_cog.cooldowns.stats()
+        embed.add_field(
+            name="XP Cooldown",
+            value=(f"On cooldown: {cd['tracked']} members in {cd['buckets']} buckets | Expired: {cd['expired']}\n"
+                   f"Rewarded: {cd['allowed']} | Dropped: {cd['dropped']} ({cd['drop_rate']:.1%})"),
+            inline=False
+        )
+        ranks = leveling_cog.ranks.stats()
+        pages = leveling_cog.leaderboard_cache.stats()
+        embed.add_field(
+            name="Rank Index",
+            value=(f"{ranks['members']} members in {ranks['guilds']} guilds | Built in {ranks['build_ms']:.0f} ms | Lookups: {ranks['lookups']} | Updates: {ranks['updates']}\n"
+                   f"Leaderboard pages cached: {pages['entries']} | Hits: {pages['hits']} ({pages['hit_rate']:.1%})"),
+            inline=False
+        )
+        cards = leveling_cog.renderer.stats()
+        embed.add_field(
+            name="Card Rendering",
+            value=(f"Workers: {cards['workers']} | Pending: {cards['pending']}/{cards['workers'] + cards['max_queue']} (peak {cards['max_pending']})\n"
+                   f"Rendered: {cards['rendered']} | Failed: {cards['failed']} | Rejected: {cards['rejected']} | "
+                   f"p50 {cards['render_p50_ms']:.0f} ms, p99 {cards['render_p99_ms']:.0f} ms (wait p99 {cards['wait_p99_ms']:.0f} ms)"),
+            inline=False
+        )
+        img = leveling_cog.backgrounds.stats()
+        mem = img['memory']
+        embed.add_field(
+            name="Background Cache",
+            value=(f"Memory: {mem['entries']} ({mem['bytes'] / (1024 * 1024):.1f}/{mem['max_bytes'] / (1024 * 1024):.0f} MB) | Hits: {mem['hits']} ({mem['hit_rate']:.1%}) | Evicted: {mem['evictions']}\n"
+                   f"Disk: {img['disk_entries']} ({img['disk_bytes'] / (1024 * 1024):.1f}/{img['disk_max_bytes'] / (1024 * 1024):.0f} MB) | Hits: {img['disk_hits']} | "
+                   f"Downloads: {img['downloads']} | Revalidated: {img['revalidated']}"),
+            inline=False
+        )
+        av = leveling_cog.avatars.stats()
+        embed.add_field(
+            name="Avatar Cache",
+            value=(f"{av['memory']['entries']} avatars ({av['memory']['bytes'] / (1024 * 1024):.1f}/{av['memory']['max_bytes'] / (1024 * 1024):.0f} MB) | "
+                   f"Hits: {av['memory']['hits']} ({av['memory']['hit_rate']:.1%}) | Fetches: {av['fetches']} | Prefetched: {av['prefetched']} | Invalidated: {av['invalidated']}"),
+            inline=False
+        )
+        cc = leveling_cog.cards.stats()
+        embed.add_field(
+            name="Card Cache",
+            value=(f"{cc['entries']} cards ({cc['bytes'] / (1024 * 1024):.1f}/{cc['max_bytes'] / (1024 * 1024):.0f} MB) | "
+                   f"Hits: {cc['hits']} ({cc['hit_rate']:.1%}) | Misses: {cc['misses']} | Invalidated: {cc['invalidated']}"),
+            inline=False
+        )
+
+    backup_cog = bot.get_cog("Backups")
+    if backup_cog:
+        if backup_cog.last_error:
+            last = f"Failed: {backup_cog.last_error}"
+        elif backup_cog.last_result:
+            last = backup.format_result(backup_cog.last_result)
+        else:
+            last = "none since startup"
+        embed.add_field(name="Last Backup", value=last, inline=False)
+
+    archiver_cog = bot.get_cog("Archiver")
+    if archiver_cog:
+        arc = archiver_cog.stats()
+        total = sum(arc['archived'].values())
+        last = f"{arc['last_run_rows']} rows in {arc['last_run_ms']:.0f} ms" if arc['last_run_at'] else "not run yet"
+        embed.add_field(name="Archive", value=f"Settled > {arc['after_days']}d | Runs: {arc['runs']} | Moved: {total} | Last: {last}", inline=False)
+
+    economy_cog = bot.get_cog("Economy")
+    if economy_cog:
+        econ = economy_cog.stats()
+        embed.add_field(
+            name="Balance Cache",
+            value=(f"Wallets: {econ['cached']}/{econ['max_cached']} | Hits: {econ['hits']} ({econ['hit_rate']:.1%}) | Evicted: {econ['evictions']}\n"
+                   f"Verified {econ['verify_runs']} times | Mismatches: {econ['verify_mismatches']}"),
+            inline=False
+        )
+        shop = economy_cog.catalog.stats()
+        embed.add_field(name="Shop Catalog", value=f"{shop['items']} items in {shop['guilds']} guilds | Hits: {shop['hits']} | Misses: {shop['misses']} ({shop['hit_rate']:.1%} hit rate)", inline=False)
+        embed.add_field(name="Settlements", value=f"Batches: {econ['settlements']} | Rows: {econ['settled_rows']} | {econ['rows_per_sec']:.0f} rows/s", inline=False)
+
+    members_cog = bot.get_cog("GuildMembers")
+    if members_cog:
+        mem = members_cog.stats()
+        last = f"{mem['last_sync_ms']:.0f} ms" if mem['last_sync_at'] else "pending"
+        embed.add_field(name="Guild Members", value=f"Synced guilds: {mem['synced_guilds']} | Added: {mem['added']} | Removed: {mem['removed']} | Startup sync: {last}", inline=False)
+    await ctx.send(embed=embed)
+
+@bot.command(name="dbcheck", help="Check catalog queries for full table scans (Admin only)")
+async def db_check(ctx):
+    if not ctx.author.guild_permissions.administrator:
+        return await ctx.send("You need Administrator permissions.")
+
+    flagged = await db_manager.check_query_plans()
+    if not flagged:
+        return await ctx.send(f"✅ All {len(queries.QUERIES) - len(queries.SCAN_OK)} catalog queries use an index.")
+
+    embed = discord.Embed(title="⚠️ Full Table Scans", color=discord.Color.orange())
+    for name, plan in list(flagged.items())[:25]:
+        embed.add_field(name=name, value="\n".join(plan)[:1024], inline=False)
+    await ctx.send(embed=embed)
+
+@bot.command(name="querystats", help="Show per-query latency and row counts (Admin only)")
+async def query_stats(ctx):
+    if not ctx.author.guild_permissions.administrator:
+        return await ctx.send("You need Administrator permissions.")
+
+    summary = db_manager.query_stats()
+    if not summary:
+        return await ctx.send("No queries recorded yet.")
+
+    embed = discord.Embed(title="⏱️ Query Latency (slowest p99 first)", color=discord.Color.blue())
+    for q in summary[:20]:
+        errors = f" | Errors: {q['errors']}" if q['errors'] else ""
+        embed.add_field(
+            name=q['name'],
+            value=(f"p50 {q['p50_ms']:.2f} ms | p99 {q['p99_ms']:.2f} ms | max {q['max_ms']:.2f} ms\n"
+                   f"Calls: {q['calls']} | Rows: {q['rows']}{errors}"),
+            inline=False
+        )
+    embed.set_footer(text=f"{len(summary)} of {len(queries.QUERIES)} catalog queries used since startup")
+    await ctx.send(embed=embed)
+
 @bot.command(name="fix_duplicates", help="Fix duplicate commands by clearing guild commands (Admin/Owner only)")
 async def fix_duplicates(ctx):
     # Check for admin
@@ -1289,7 +1453,10 @@ async def setup_cogs():
         "sportsbook",
         "casino",
         "tcfc",
-        "ladders"
+        "ladders",
+        "backup",
+        "archiver",
+        "guild_members"
     ]
 
     for ext in extensions:
@@ -1370,6 +1537,10 @@ class HelpSelect(Select):
             cmds = get_cmds("config")
             embed.add_field(name="/setup", value="Run the interactive setup wizard.", inline=False)
             embed.add_field(name="@Bot update", value="Update the bot code.", inline=False)
+            embed.add_field(name="!dbstats", value="Database pool statistics (Admin).", inline=False)
+            embed.add_field(name="!dbcheck", value="Flag catalog queries that scan a whole table (Admin).", inline=False)
+            embed.add_field(name="!querystats", value="Slowest named queries by p99 latency (Admin).", inline=False)
+            embed.add_field(name="/backup", value="Take a database backup now (Admin).", inline=False)
 
         # Sort
         cmds.sort(key=lambda x: x.name)
@@ -0,0 +1,266 @@
+# Rank card rendering, off the event loop.
+# Leveling gathers everything a card needs into a CardSpec (plain values and
+# raw image bytes, so it pickles cheaply) and RenderService draws it in a
+# worker process. Pillow work never runs on the loop that serves the gateway.
+# Backgrounds and avatars are cropped/resized once by prepare_background and
+# prepare_avatar and the results are cached by image_cache; fonts, the avatar
+# mask and overlay layers come from card_template. A card only draws its text,
+# border and progress bar over ready pixels.
+
+import asyncio
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Optional
+from PIL import Image, ImageChops, ImageDraw
+from dotenv import load_dotenv
+import card_template
+from card_template import WIDTH, HEIGHT, AVATAR_SIZE, OVERLAY_BOX
+import logger
+
+load_dotenv()
+
+# Worker processes drawing cards
+CARD_RENDER_WORKERS = int(os.getenv("CARD_RENDER_WORKERS", "2"))
+# Cards allowed to wait for a worker before new requests are turned away
+CARD_RENDER_QUEUE = int(os.getenv("CARD_RENDER_QUEUE", "16"))
+# Render timings kept for the p50/p99 figures
+RENDER_SAMPLES = 512
+
+@dataclass(frozen=True)
+class CardSpec:
+    username: str
+    xp: int
+    level: int
+    rank: int
+    progress: int  # XP into the current level (level_curve.LevelCurve.progress)
+    needed: int    # XP the current level spans
+    avatar: bytes  # AVATAR_SIZE x AVATAR_SIZE RGBA pixels from prepare_avatar
+    background: Optional[bytes] = None  # WIDTH x HEIGHT RGBA pixels from prepare_background
+    card_color: str = "#5865F2"
+    card_bg_color: str = "#2C2F33"
+    card_opacity: float = 0.5
+    card_font: str = "default"
+
+def hex_to_rgb(hex_code):
+    hex_code = hex_code.lstrip('#')
+    try:
+        return tuple(int(hex_code[i:i+2], 16) for i in (0, 2, 4))
+    except:
+        return (114, 137, 218) # Default Blurple
+
+def prepare_background(data, crop_x=0, crop_y=0, crop_w=0):
+    """Decode, crop and resize a background image. Returns raw RGBA pixels for CardSpec.background."""
+    bg_image = Image.open(io.BytesIO(data)).convert("RGBA")
+
+    # Apply Crop if configured
+    if crop_w > 0:
+        crop_h = int(crop_w / 3.6)
+        bg_image = bg_image.crop((crop_x, crop_y, crop_x + crop_w, crop_y + crop_h))
+
+    return bg_image.resize((WIDTH, HEIGHT), Image.Resampling.LANCZOS).tobytes()
+
+def prepare_avatar(data):
+    """Decode and resize an avatar, cutting it to a circle. Returns raw RGBA pixels for CardSpec.avatar."""
+    avatar = Image.open(io.BytesIO(data)).convert("RGBA")
+    avatar = avatar.resize((AVATAR_SIZE, AVATAR_SIZE))
+
+    # Keep the avatar's own transparency inside the circle
+    alpha = ImageChops.multiply(avatar.getchannel("A"), card_template.load().avatar_mask)
+    avatar.putalpha(alpha)
+    return avatar.tobytes()
+
+def render_card(spec):
+    """Draw a rank card. Returns PNG bytes. Runs in a worker process."""
+    template = card_template.load()
+
+    # 1. Background
+    if spec.background:
+        image = Image.frombytes("RGBA", (WIDTH, HEIGHT), spec.background)
+    else:
+        image = Image.new("RGBA", (WIDTH, HEIGHT), hex_to_rgb(spec.card_bg_color))
+
+    # 2. Overlay (Dark Box), composited over the box only
+    box_x, box_y, _, _ = OVERLAY_BOX
+    image.alpha_composite(template.overlay(spec.card_opacity), dest=(box_x, box_y))
+    draw = ImageDraw.Draw(image)
+
+    # 3. Avatar
+    avatar = Image.frombytes("RGBA", (AVATAR_SIZE, AVATAR_SIZE), spec.avatar)
+
+    border_size = 5
+    draw.ellipse((50 - border_size, 50 - border_size, 50 + AVATAR_SIZE + border_size, 50 + AVATAR_SIZE + border_size), fill=hex_to_rgb(spec.card_color))
+
+    image.paste(avatar, (50, 50), mask=avatar)
+
+    # 4. Text & Fonts
+    text_color = (255, 255, 255)
+    font_large, font_medium, font_small = template.font_large, template.font_medium, template.font_small
+
+    text_x = 230
+    draw.text((text_x, 50), spec.username, font=font_large, fill=text_color)
+
+    stats_text = f"Rank #{spec.rank}   Level {spec.level}"
+    draw.text((text_x, 120), stats_text, font=font_medium, fill=text_color)
+
+    needed = spec.needed
+    current_progress = spec.progress
+
+    xp_text = f"{current_progress} / {needed} XP"
+    try:
+        bbox = font_small.getbbox(xp_text)
+        text_w = bbox[2] - bbox[0]
+    except:
+        text_w = 100
+
+    draw.text((860 - text_w - 20, 170), xp_text, font=font_small, fill=text_color)
+
+    # 5. Progress Bar
+    bar_x, bar_y, bar_w, bar_h = 230, 180, 600, 20
+    draw.rectangle((bar_x, bar_y, bar_x + bar_w, bar_y + bar_h), fill=(50, 50, 50))
+
+    percent = max(0, min(1, current_progress / needed)) if needed > 0 else 0
+    draw.rectangle((bar_x, bar_y, bar_x + int(bar_w * percent), bar_y + bar_h), fill=hex_to_rgb(spec.card_color))
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def render_leaderboard(title, rows):
+    """Draw one leaderboard page. rows: [(position, name, level, xp)]. Returns PNG bytes."""
+    template = card_template.load()
+    row_h = 56
+    height = 90 + row_h * max(len(rows), 1)
+    image = Image.new("RGBA", (WIDTH, height), hex_to_rgb("#2C2F33"))
+    draw = ImageDraw.Draw(image)
+    text_color = (255, 255, 255)
+
+    draw.text((30, 20), title, font=template.font_medium, fill=text_color)
+    for i, (position, name, level, xp) in enumerate(rows):
+        y = 80 + i * row_h
+        if i % 2 == 0:
+            draw.rectangle((20, y - 4, WIDTH - 20, y + row_h - 8), fill=(35, 39, 42))
+        draw.text((40, y), f"#{position}", font=template.font_small, fill=hex_to_rgb("#FEE75C"))
+        draw.text((150, y), name[:32], font=template.font_small, fill=text_color)
+
+        stats_text = f"Level {level} • {xp} XP"
+        bbox = template.font_small.getbbox(stats_text)
+        draw.text((WIDTH - 40 - (bbox[2] - bbox[0]), y), stats_text, font=template.font_small, fill=text_color)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def _render_timed(spec):
+    start = time.perf_counter()
+    png = render_card(spec)
+    return png, time.perf_counter() - start
+
+class RenderBusy(Exception):
+    """Raised instead of queueing when CARD_RENDER_QUEUE cards are already waiting."""
+
+class RenderService:
+    """
+    Process pool for rank cards with a bounded queue.
+    At most `workers` cards render at once; up to `max_queue` more wait for a
+    slot, and anything beyond that fails fast with RenderBusy.
+    """
+    def __init__(self, workers=CARD_RENDER_WORKERS, max_queue=CARD_RENDER_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._pool = None
+        self._slots = asyncio.Semaphore(self.workers)
+        self.pending = 0  # Rendering + waiting
+
+        # Metrics
+        self.rendered = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_pending = 0
+        self.render_times = deque(maxlen=RENDER_SAMPLES)
+        self.wait_times = deque(maxlen=RENDER_SAMPLES)
+
+    def _executor(self):
+        if self._pool is None:
+            # Each worker parses fonts and builds the static layers once, up front
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=card_template.warm)
+        return self._pool
+
+    async def start(self):
+        """Spawn the workers now so the first /rank doesn't pay for process start and font loading."""
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, card_template.warm) for _ in range(self.workers)))
+
+    async def _run(self, func, *args):
+        """Run func(*args) in the pool, subject to the queue limit."""
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise RenderBusy()
+
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        queued_at = time.perf_counter()
+        try:
+            async with self._slots:
+                self.wait_times.append(time.perf_counter() - queued_at)
+                loop = asyncio.get_running_loop()
+                try:
+                    return await loop.run_in_executor(self._executor(), func, *args)
+                except BrokenProcessPool:
+                    # A worker died (OOM, killed); start a fresh pool for the next card
+                    logger.error("Card render pool broke, restarting it.")
+                    self._pool = None
+                    self.failed += 1
+                    raise
+                except Exception:
+                    self.failed += 1
+                    raise
+        finally:
+            self.pending -= 1
+
+    async def render(self, spec):
+        """Render a CardSpec to PNG bytes in a worker process."""
+        png, seconds = await self._run(_render_timed, spec)
+        self.rendered += 1
+        self.render_times.append(seconds)
+        return png
+
+    async def render_leaderboard(self, title, rows):
+        """Render a leaderboard page to PNG bytes in a worker process."""
+        return await self._run(render_leaderboard, title, rows)
+
+    async def prepare_background(self, data, crop_x=0, crop_y=0, crop_w=0):
+        """Crop and resize a downloaded background in a worker process."""
+        return await self._run(prepare_background, data, crop_x, crop_y, crop_w)
+
+    async def prepare_avatar(self, data):
+        """Resize and circle-mask a downloaded avatar in a worker process."""
+        return await self._run(prepare_avatar, data)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        def percentile(samples, p):
+            ordered = sorted(samples)
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000 if ordered else 0.0
+
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "render_p50_ms": percentile(self.render_times, 0.50),
+            "render_p99_ms": percentile(self.render_times, 0.99),
+            "wait_p99_ms": percentile(self.wait_times, 0.99),
+        }
@@ -0,0 +1,54 @@
+# Static parts of the rank card, built once per process.
+# Fonts are parsed once, the avatar circle mask is drawn once and the
+# translucent overlay box is kept per opacity, so card_renderer.render_card
+# only draws what differs between cards. Render workers build the template
+# when they start (RenderService passes warm() as the pool initializer).
+
+from PIL import Image, ImageDraw, ImageFont
+
+WIDTH, HEIGHT = 900, 250
+AVATAR_SIZE = 150
+OVERLAY_BOX = (20, 20, 860, 210)  # x, y, w, h
+
+FONT_BOLD = "Roboto-Bold.ttf"
+FONT_REGULAR = "Roboto-Regular.ttf"
+
+class CardTemplate:
+    def __init__(self):
+        try:
+            self.font_large = ImageFont.truetype(FONT_BOLD, 60)
+            self.font_medium = ImageFont.truetype(FONT_REGULAR, 40)
+            self.font_small = ImageFont.truetype(FONT_REGULAR, 30)
+        except OSError:
+            self.font_large = ImageFont.load_default()
+            self.font_medium = ImageFont.load_default()
+            self.font_small = ImageFont.load_default()
+
+        self.avatar_mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+        ImageDraw.Draw(self.avatar_mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+
+        self._overlays = {}  # alpha -> box-sized RGBA layer
+
+    def overlay(self, opacity):
+        """The dark box behind the text, as a layer covering only the box."""
+        alpha = max(0, min(255, int(255 * opacity)))
+        layer = self._overlays.get(alpha)
+        if layer is None:
+            _, _, box_w, box_h = OVERLAY_BOX
+            # +1: ImageDraw.rectangle includes both corners
+            layer = Image.new("RGBA", (box_w + 1, box_h + 1), (0, 0, 0, alpha))
+            self._overlays[alpha] = layer
+        return layer
+
+_template = None
+
+def load():
+    """Build this process's template if it doesn't exist yet. Returns it."""
+    global _template
+    if _template is None:
+        _template = CardTemplate()
+    return _template
+
+def warm():
+    """load() without returning the template, for pool initializers and warm-up calls."""
+    load()
@@ -5,7 +5,7 @@ import random
 import asyncio
 import time
 from config_manager import config_manager
-import aiosqlite
+from database import db_manager
 
 # --- Deck Helper ---
 def get_deck():
@@ -135,11 +135,9 @@ class Casino(commands.Cog):
         await self.load_rtp()
 
     async def load_rtp(self):
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT value FROM global_config WHERE key = 'rtp_modifier'") as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    self.rtp_modifier = float(row[0])
+        value = await db_manager.fetchval("casino.get_rtp")
+        if value is not None:
+            self.rtp_modifier = float(value)
 
     async def check_balance(self, user_id, amount):
         economy = self.bot.get_cog("Economy")
@@ -148,6 +146,16 @@ class Casino(commands.Cog):
         if bal < amount: return False, f"Insufficient funds. You have {bal} coins."
         return True, bal
 
+    async def take_wager(self, user_id, amount):
+        """Charge a wager in one conditional debit. Returns (ok, balance or error message)."""
+        economy = self.bot.get_cog("Economy")
+        if not economy: return False, "Economy offline."
+        bal = await economy.debit(user_id, amount, "casino_wager")
+        if bal is None:
+            bal = await economy.get_balance(user_id)
+            return False, f"Insufficient funds. You have {bal} coins."
+        return True, bal
+
     # --- ADMIN: Set RTP ---
     @discord.app_commands.command(name="set_rtp", description="Set Global Slots RTP Modifier (Admin Only)")
     @commands.has_permissions(administrator=True)
@@ -156,12 +164,7 @@ class Casino(commands.Cog):
             return await interaction.response.send_message("Admin only.", ephemeral=True)
 
         self.rtp_modifier = value
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("""
-                INSERT INTO global_config (key, value) VALUES ('rtp_modifier', ?)
-                ON CONFLICT(key) DO UPDATE SET value = ?
-            """, (str(value), str(value)))
-            await db.commit()
+        await db_manager.run("casino.set_rtp", (str(value),))
         await interaction.response.send_message(f"🎰 Global Slots RTP Modifier set to {value}", ephemeral=True)
 
     # --- SLOTS (Buffalo Style - Enhanced) ---
@@ -172,10 +175,7 @@ class Casino(commands.Cog):
         if not ok: return await ctx.send(msg, ephemeral=True)
 
         # Luck Check (Pre-deduction for decision)
-        has_luck = False
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT 1 FROM inventory WHERE user_id = ? AND item_name = 'Lucky Charm'", (ctx.author.id,)) as cursor:
-                if await cursor.fetchone(): has_luck = True
+        has_luck = await self.bot.get_cog("Economy").has_item(ctx.author.id, "Lucky Charm")
 
         if has_luck:
             # Ask user if they want to use luck
@@ -259,23 +259,12 @@ class Casino(commands.Cog):
 
     async def run_slots(self, ctx, wager, use_luck=False):
         econ = self.bot.get_cog("Economy")
-        bal = await econ.get_balance(ctx.author.id)
-        if bal < wager:
-            return await ctx.send(f"Insufficient funds. You have {bal} coins.")
-
-        await econ.update_balance(ctx.author.id, -wager)
+        ok, msg = await self.take_wager(ctx.author.id, wager)
+        if not ok:
+            return await ctx.send(msg)
 
         if use_luck:
-            item_consumed = False
-            async with aiosqlite.connect("bot_data.db") as db:
-                async with db.execute("SELECT id FROM inventory WHERE user_id = ? AND item_name = 'Lucky Charm' LIMIT 1", (ctx.author.id,)) as cursor:
-                    row = await cursor.fetchone()
-                    if row:
-                        await db.execute("DELETE FROM inventory WHERE id = ?", (row[0],))
-                        await db.commit()
-                        item_consumed = True
-
-            if not item_consumed:
+            if not await econ.consume_item(ctx.author.id, "Lucky Charm"):
                 use_luck = False
                 await ctx.send("⚠️ **Lucky Charm not found!** Spinning normally...", delete_after=5)
 
@@ -310,7 +299,7 @@ class Casino(commands.Cog):
 
         # Final Update
         if total_payout > 0:
-            await econ.update_balance(ctx.author.id, total_payout)
+            await econ.credit(ctx.author.id, total_payout, "slots_win")
             embed.color = discord.Color.green()
             embed.title = "🎰 BIG WIN!" if total_payout > wager * 10 else "🎰 WINNER"
             ft = f"**Total Win: {total_payout} 🪙**"
@@ -330,16 +319,14 @@ class Casino(commands.Cog):
         if wager <= 0: return await ctx.send("Wager must be positive.", ephemeral=True)
 
         # Check Inventory
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT 1 FROM inventory WHERE user_id = ? AND item_name = 'Auto Slot'", (ctx.author.id,)) as cursor:
-                if not await cursor.fetchone():
-                    return await ctx.send("❌ You need the **Auto Slot** item to use this command.", ephemeral=True)
-
         econ = self.bot.get_cog("Economy")
+        if not await econ.has_item(ctx.author.id, "Auto Slot"):
+            return await ctx.send("❌ You need the **Auto Slot** item to use this command.", ephemeral=True)
+
         total_cost = wager * spins
-        bal = await econ.get_balance(ctx.author.id)
 
-        if bal < total_cost:
+        # Deduct all upfront in one conditional debit; safer for async loops
+        if await econ.debit(ctx.author.id, total_cost, "autoslots_wager") is None:
             return await ctx.send(f"Insufficient funds for {spins} spins. Total cost: {total_cost}", ephemeral=True)
 
         await ctx.defer()
@@ -348,9 +335,6 @@ class Casino(commands.Cog):
         total_won = 0
         wins_log = []
 
-        # Deduct all upfront? Or per spin? Upfront is safer for async loops
-        await econ.update_balance(ctx.author.id, -total_cost)
-
         embed = discord.Embed(title="🎰 Auto Slots Running...", description=f"Spinning {spins} times...", color=discord.Color.blue())
         msg = await ctx.send(embed=embed)
 
@@ -367,7 +351,8 @@ class Casino(commands.Cog):
 
         # Final Result
         net = total_won - total_cost
-        await econ.update_balance(ctx.author.id, total_won)
+        if total_won > 0:
+            await econ.credit(ctx.author.id, total_won, "autoslots_win")
 
         embed.title = "🎰 Auto Slots Complete"
         embed.color = discord.Color.green() if net >= 0 else discord.Color.red()
@@ -387,11 +372,10 @@ class Casino(commands.Cog):
     @commands.hybrid_command(name="blackjack", description="Play Blackjack")
     async def blackjack(self, ctx, wager: int):
         if wager <= 0: return await ctx.send("Positive wager only.", ephemeral=True)
-        ok, msg = await self.check_balance(ctx.author.id, wager)
+        ok, msg = await self.take_wager(ctx.author.id, wager)
         if not ok: return await ctx.send(msg, ephemeral=True)
 
         econ = self.bot.get_cog("Economy")
-        await econ.update_balance(ctx.author.id, -wager)
 
         game = BlackjackGame(ctx, wager, econ)
         await game.start()
@@ -400,11 +384,10 @@ class Casino(commands.Cog):
     @commands.hybrid_command(name="highlow", description="Guess High or Low")
     async def highlow(self, ctx, wager: int):
         if wager <= 0: return await ctx.send("Positive wager only.", ephemeral=True)
-        ok, msg = await self.check_balance(ctx.author.id, wager)
+        ok, msg = await self.take_wager(ctx.author.id, wager)
         if not ok: return await ctx.send(msg, ephemeral=True)
 
         econ = self.bot.get_cog("Economy")
-        await econ.update_balance(ctx.author.id, -wager)
 
         game = HighLowGame(ctx, wager, econ)
         await game.start()
@@ -413,11 +396,10 @@ class Casino(commands.Cog):
     @commands.hybrid_command(name="crash", description="Ride the line! Cash out before it crashes.")
     async def crash(self, ctx, wager: int):
         if wager <= 0: return await ctx.send("Positive wager only.", ephemeral=True)
-        ok, msg = await self.check_balance(ctx.author.id, wager)
+        ok, msg = await self.take_wager(ctx.author.id, wager)
         if not ok: return await ctx.send(msg, ephemeral=True)
 
         econ = self.bot.get_cog("Economy")
-        await econ.update_balance(ctx.author.id, -wager)
 
         embed = discord.Embed(title="🚀 Ride the Line", color=discord.Color.blue())
         embed.description = "Multiplier: **1.00x**\nPossible Win: **" + str(wager) + "**"
@@ -455,11 +437,10 @@ class Casino(commands.Cog):
     @commands.hybrid_command(name="poker", description="Casino Hold'em vs Dealer")
     async def poker(self, ctx, wager: int):
         if wager <= 0: return await ctx.send("Positive wager only.", ephemeral=True)
-        ok, msg = await self.check_balance(ctx.author.id, wager)
+        ok, msg = await self.take_wager(ctx.author.id, wager)
         if not ok: return await ctx.send(msg, ephemeral=True)
 
         econ = self.bot.get_cog("Economy")
-        await econ.update_balance(ctx.author.id, -wager)
 
         game = CasinoHoldemGame(ctx, wager, econ)
         await game.start()
@@ -591,13 +572,13 @@ class BlackjackGame:
         p = self.calc(self.player_hand)
         d = self.calc(self.dealer_hand)
         if d > 21:
-            await self.economy.update_balance(self.ctx.author.id, self.wager * 2)
+            await self.economy.credit(self.ctx.author.id, self.wager * 2, "blackjack_win")
             await self.update_view(True, "✅ **Dealer Bust! You Win!**")
         elif p > d:
-            await self.economy.update_balance(self.ctx.author.id, self.wager * 2)
+            await self.economy.credit(self.ctx.author.id, self.wager * 2, "blackjack_win")
             await self.update_view(True, "✅ **You Win!**")
         elif p == d:
-            await self.economy.update_balance(self.ctx.author.id, self.wager)
+            await self.economy.credit(self.ctx.author.id, self.wager, "blackjack_push")
             await self.update_view(True, "🤝 **Push.**")
         else:
             await self.update_view(True, "❌ **Dealer Wins.**")
@@ -616,14 +597,11 @@ class BlackjackView(View):
         await self.game.stand()
     @discord.ui.button(label="Double", style=discord.ButtonStyle.success)
     async def double(self, interaction, button):
-        # Double Down Logic
-        bal = await self.game.economy.get_balance(self.game.ctx.author.id)
-        if bal < self.game.wager:
+        # Double Down Logic: deduct the extra wager if they can cover it
+        if await self.game.economy.debit(self.game.ctx.author.id, self.game.wager, "blackjack_double") is None:
              return await interaction.response.send_message("Insufficient funds to double down.", ephemeral=True)
 
         await interaction.response.defer()
-        # Deduct extra wager
-        await self.game.economy.update_balance(self.game.ctx.author.id, -self.game.wager)
         self.game.wager *= 2
 
         # Hit once then force stand
@@ -651,7 +629,7 @@ class CrashView(View):
         if interaction.user != self.ctx.author: return
         self.cashed_out = True
         win = int(self.wager * self.current_multiplier)
-        await self.economy.update_balance(self.ctx.author.id, win)
+        await self.economy.credit(self.ctx.author.id, win, "crash_cashout")
         embed = discord.Embed(title="💰 CASHED OUT!", color=discord.Color.green())
         embed.description = f"Cashed at **{self.current_multiplier:.2f}x**\nWon: **{win}**"
         await interaction.response.edit_message(embed=embed, view=None)
@@ -666,9 +644,8 @@ class HorseRaceView(View):
 
     async def start_race(self, interaction, choice):
         # Deduct
-        bal = await self.economy.get_balance(self.ctx.author.id)
-        if bal < self.wager: return await interaction.response.send_message("Insufficient funds.", ephemeral=True)
-        await self.economy.update_balance(self.ctx.author.id, -self.wager)
+        if await self.economy.debit(self.ctx.author.id, self.wager, "horserace_wager") is None:
+            return await interaction.response.send_message("Insufficient funds.", ephemeral=True)
 
         await interaction.response.defer()
 
@@ -705,7 +682,7 @@ class HorseRaceView(View):
         # Result
         if winner == choice:
             payout = self.wager * 3 # 4 horses = 3x payout roughly?
-            await self.economy.update_balance(self.ctx.author.id, payout)
+            await self.economy.credit(self.ctx.author.id, payout, "horserace_win")
             res = f"🎉 **Horse {winner} Won!** You won {payout} coins!"
             col = discord.Color.green()
         else:
@@ -752,9 +729,8 @@ class CasinoHoldemGame:
 
     async def call(self, interaction):
         call_amt = self.wager * 2
-        bal = await self.economy.get_balance(self.ctx.author.id)
-        if bal < call_amt: return await interaction.response.send_message("Insufficient funds.", ephemeral=True)
-        await self.economy.update_balance(self.ctx.author.id, -call_amt)
+        if await self.economy.debit(self.ctx.author.id, call_amt, "holdem_call") is None:
+            return await interaction.response.send_message("Insufficient funds.", ephemeral=True)
 
         turn = self.deck.pop()
         river = self.deck.pop()
@@ -770,14 +746,14 @@ class CasinoHoldemGame:
 
         if p_score > d_score:
             profit = (self.wager + call_amt) * 2
-            await self.economy.update_balance(self.ctx.author.id, profit)
+            await self.economy.credit(self.ctx.author.id, profit, "holdem_win")
             embed.description = f"**YOU WIN!** (+{profit})"
             embed.color = discord.Color.green()
         elif p_score < d_score:
             embed.description = "**DEALER WINS.**"
             embed.color = discord.Color.red()
         else:
-            await self.economy.update_balance(self.ctx.author.id, self.wager + call_amt)
+            await self.economy.credit(self.ctx.author.id, self.wager + call_amt, "holdem_push")
             embed.description = "**PUSH.**"
 
         await interaction.response.edit_message(embed=embed, view=None)
@@ -821,10 +797,17 @@ class PvPPokerLobby(View):
         pot = 0
         hands = {}
         for p in self.players:
-            await econ.update_balance(p.id, -self.wager)
+            # Players who can no longer cover the entry fee sit this one out
+            if await econ.debit(p.id, self.wager, "pvppoker_entry") is None:
+                await channel.send(f"{p.mention} can't cover the {self.wager} entry and was removed.")
+                continue
             pot += self.wager
             hands[p] = [deck.pop(), deck.pop()]
 
+        if len(hands) < 2:
+            await econ.settle([(p.id, self.wager) for p in hands], "pvppoker_refund")
+            return await channel.send("Not enough players could pay the entry. Game cancelled, fees refunded.")
+
         board = [deck.pop() for _ in range(5)]
         board_disp = " ".join([c['display'] for c in board])
         await channel.send(f"🃏 **PvP Poker**\nPot: {pot}\nBoard: {board_disp}\nEvaluating...")
@@ -843,7 +826,7 @@ class PvPPokerLobby(View):
                 winners.append(p)
 
         share = int(pot / len(winners))
-        for w in winners: await econ.update_balance(w.id, share)
+        await econ.settle([(w.id, share) for w in winners], "pvppoker_win")
 
         embed = discord.Embed(title="🏆 Poker Results", description=res, color=discord.Color.gold())
         embed.add_field(name="Winners", value=", ".join([w.mention for w in winners]) + f" (+{share})")
@@ -871,7 +854,7 @@ class HighLowGame:
         elif choice == "lower" and next_card['value'] < self.current_card['value']: won = True
 
         if won:
-            await self.economy.update_balance(self.ctx.author.id, self.wager * 2)
+            await self.economy.credit(self.ctx.author.id, self.wager * 2, "highlow_win")
             res = "✅ **Correct!**"
             col = discord.Color.green()
         else:
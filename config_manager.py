@@ -1,47 +1,114 @@
-# This file is now a wrapper around the DB manager for backward compatibility
-# or we can fully replace it. For now, let's keep the class interface but use DB.
+# Cached, typed view of the guild_configs table.
+# Reads are served from memory; every write goes through here so the cached
+# copy can be dropped and re-read on the next lookup.
 
 import json
+from dataclasses import dataclass, fields
+from typing import Optional
 from database import db_manager
-import asyncio
+import logger
+
+LIST_KEYS = ('allowed_search_channels', 'mod_roles')
+
+@dataclass(frozen=True)
+class GuildConfig:
+    guild_id: int
+    owner_role_id: Optional[int] = None
+    forum_channel_id: Optional[int] = None
+    log_channel_id: Optional[int] = None
+    muted_role_id: Optional[int] = None
+    allowed_search_channels: frozenset = frozenset()
+    mod_roles: frozenset = frozenset()
+    xp_rate: float = 1.0
+    update_log_channel_id: Optional[int] = None
+    level_up_channel_id: Optional[int] = None
+    tcfc_channel_id: Optional[int] = None
+    tcfc_analyst_role_id: Optional[int] = None
+    level_curve: Optional[str] = None
+    xp_cooldown: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, guild_id, row):
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in dict(row).items() if k in known and v is not None}
+        for key in LIST_KEYS:
+            raw = values.get(key)
+            if isinstance(raw, str):
+                try: values[key] = frozenset(json.loads(raw))
+                except: values[key] = frozenset()
+            elif raw is not None:
+                values[key] = frozenset()  # Non-JSON garbage from old schemas
+        values['guild_id'] = guild_id
+        return cls(**values)
+
+    def get(self, key, default=None):
+        """Dict-style access for older callers: config.get('log_channel_id')"""
+        value = getattr(self, key, None)
+        return default if value is None else value
 
 class ConfigManager:
-    # We need to bridge synchronous calls (if any) to async,
-    # but bot.py commands are async, so we can switch to async methods.
+    def __init__(self):
+        self._cache = {}  # guild_id -> GuildConfig
+        self._generation = 0  # bumped on every invalidation so in-flight misses don't store stale rows
+        self.hits = 0
+        self.misses = 0
 
-    # However, to minimize refactoring pain in step 1,
-    # we might need to update bot.py to await these calls.
-    # YES: bot.py needs to be updated to await config calls.
+    async def preload(self):
+        """Load every configured guild in one query (called from setup_hook)."""
+        rows = await db_manager.fetchall("config.all")
+        for row in rows:
+            self._cache[row['guild_id']] = GuildConfig.from_row(row['guild_id'], row)
+        logger.info(f"Preloaded config for {len(rows)} guilds.")
 
     async def get_guild_config(self, guild_id):
-        data = await db_manager.get_guild_config(guild_id)
-        if not data: return {}
-        # Parse JSON lists
-        if 'allowed_search_channels' in data and data['allowed_search_channels']:
-            try: data['allowed_search_channels'] = json.loads(data['allowed_search_channels'])
-            except: data['allowed_search_channels'] = []
+        config = self._cache.get(guild_id)
+        if config is not None:
+            self.hits += 1
+            return config
 
-        if 'mod_roles' in data and data['mod_roles']:
-            try: data['mod_roles'] = json.loads(data['mod_roles'])
-            except: data['mod_roles'] = []
+        self.misses += 1
+        generation = self._generation
+        data = await db_manager.get_guild_config(guild_id)
+        config = GuildConfig.from_row(guild_id, data) if data else GuildConfig(guild_id)
+        if generation == self._generation:
+            # Unconfigured guilds are cached too, so they don't miss on every message
+            self._cache[guild_id] = config
+        return config
 
-        return data
+    def invalidate(self, guild_id=None):
+        self._generation += 1
+        if guild_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(guild_id, None)
 
     async def update_guild_config(self, guild_id, key, value):
-        await db_manager.update_guild_config(guild_id, key, value)
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        try:
+            return await db_manager.update_guild_config(guild_id, key, value)
+        finally:
+            self.invalidate(guild_id)
 
     async def add_to_list(self, guild_id, key, value):
         config = await self.get_guild_config(guild_id)
-        current_list = config.get(key, [])
-        if value not in current_list:
-            current_list.append(value)
-            await db_manager.update_guild_config(guild_id, key, current_list)
+        current = config.get(key, frozenset())
+        if value not in current:
+            await self.update_guild_config(guild_id, key, current | {value})
 
     async def remove_from_list(self, guild_id, key, value):
         config = await self.get_guild_config(guild_id)
-        current_list = config.get(key, [])
-        if value in current_list:
-            current_list.remove(value)
-            await db_manager.update_guild_config(guild_id, key, current_list)
+        current = config.get(key, frozenset())
+        if value in current:
+            await self.update_guild_config(guild_id, key, current - {value})
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
 
 config_manager = ConfigManager()
@@ -0,0 +1,51 @@
+# Live previews for the background crop editor (leveling.CropView).
+# The uploaded image is decoded once into a proxy: a copy downscaled to about
+# twice the card width. Every Zoom/Move press renders its preview from the
+# proxy with a bilinear resize and a JPEG encode in a thread, so the event loop
+# never decodes, LANCZOS-resizes or PNG-encodes the full-resolution original.
+# Crop coordinates stay in original pixels; Save stores them and
+# card_renderer.prepare_background applies the exact crop to the original.
+
+import asyncio
+import io
+from PIL import Image
+from card_template import WIDTH, HEIGHT
+
+# Widest proxy kept per editor; zoomed-in previews upscale from this
+PROXY_MAX_WIDTH = WIDTH * 2
+PREVIEW_QUALITY = 80
+
+class CropProxy:
+    def __init__(self, image, size):
+        self.image = image  # RGB, at most PROXY_MAX_WIDTH wide
+        self.size = size    # (width, height) of the original
+        self.scale = image.width / size[0]
+
+    @classmethod
+    def from_bytes(cls, data):
+        image = Image.open(io.BytesIO(data))
+        size = image.size
+        # JPEGs can be decoded straight at a reduced scale
+        image.draft("RGB", (PROXY_MAX_WIDTH, PROXY_MAX_WIDTH * size[1] // max(1, size[0])))
+        image = image.convert("RGB")
+        if image.width > PROXY_MAX_WIDTH:
+            height = max(1, round(image.height * PROXY_MAX_WIDTH / image.width))
+            image = image.resize((PROXY_MAX_WIDTH, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return cls(image, size)
+
+    @classmethod
+    async def load(cls, data):
+        return await asyncio.to_thread(cls.from_bytes, data)
+
+    def render(self, crop_x, crop_y, crop_w, crop_h):
+        """JPEG preview of a crop given in original pixels."""
+        s = self.scale
+        box = (crop_x * s, crop_y * s, (crop_x + crop_w) * s, (crop_y + crop_h) * s)
+        preview = self.image.resize((WIDTH, HEIGHT), Image.Resampling.BILINEAR, box=box)
+
+        buffer = io.BytesIO()
+        preview.save(buffer, "JPEG", quality=PREVIEW_QUALITY)
+        return buffer.getvalue()
+
+    async def preview(self, crop_x, crop_y, crop_w, crop_h):
+        return await asyncio.to_thread(self.render, crop_x, crop_y, crop_w, crop_h)
@@ -1,337 +1,412 @@
 import aiosqlite
 import json
 import os
+import time
 import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
 import logger
+import migrations
+import queries
+import level_curve
 
-DB_FILE = "bot_data.db"
-
-class DatabaseManager:
-    def __init__(self):
-        self.db_file = DB_FILE
+load_dotenv()
 
-    async def init_db(self):
-        async with aiosqlite.connect(self.db_file) as db:
-            # 1. Guild Configs
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS guild_configs (
-                    guild_id INTEGER PRIMARY KEY,
-                    owner_role_id INTEGER,
-                    forum_channel_id INTEGER,
-                    log_channel_id INTEGER,
-                    muted_role_id INTEGER,
-                    allowed_search_channels TEXT, -- JSON List
-                    mod_roles TEXT -- JSON List,
-                    xp_rate REAL DEFAULT 1.0
-                )
-            """)
-
-            # Schema update for xp_rate if it doesn't exist (migration)
-            try:
-                await db.execute("ALTER TABLE guild_configs ADD COLUMN xp_rate REAL DEFAULT 1.0")
-            except Exception: pass
-
-            # 2. Flagged Words
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS flagged_words (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    word TEXT,
-                    UNIQUE(guild_id, word)
-                )
-            """)
-
-            # 3. Warnings
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS warnings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    user_id INTEGER,
-                    moderator_id INTEGER,
-                    reason TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 4. Leveling
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_levels (
-                    guild_id INTEGER,
-                    user_id INTEGER,
-                    xp INTEGER DEFAULT 0,
-                    level INTEGER DEFAULT 0,
-                    last_message_time REAL DEFAULT 0,
-                    PRIMARY KEY (guild_id, user_id)
-                )
-            """)
-
-            # 5. Global Economy / Profile
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS global_users (
-                    user_id INTEGER PRIMARY KEY,
-                    balance INTEGER DEFAULT 0,
-                    last_daily REAL DEFAULT 0,
-                    bg_url TEXT DEFAULT NULL,
-                    card_color TEXT DEFAULT '#7289da'
-                )
-            """)
-
-            # --- Schema Updates for Rank Cards (v1.1) ---
-            # SQLite doesn't support IF NOT EXISTS for ADD COLUMN easily.
-            # We check pragma or catch duplicate column error.
-            try:
-                await db.execute("ALTER TABLE global_users ADD COLUMN card_bg_color TEXT DEFAULT '#2C2F33'")
-            except Exception: pass
-
-            try:
-                await db.execute("ALTER TABLE global_users ADD COLUMN card_opacity REAL DEFAULT 0.5")
-            except Exception: pass
-
-            try:
-                await db.execute("ALTER TABLE global_users ADD COLUMN card_font TEXT DEFAULT 'default'")
-            except Exception: pass
-
-            try:
-                await db.execute("ALTER TABLE global_users ADD COLUMN bg_crop_x INTEGER DEFAULT 0")
-            except Exception: pass
+DB_FILE = "bot_data.db"
+# Number of persistent read connections kept open next to the single writer
+DB_READERS = int(os.getenv("DB_READERS", "4"))
+# "fast" lets WAL skip the fsync on every commit (a power cut can drop the last
+# few transactions, never corrupt the file). "safe" fsyncs every commit.
+DB_DURABILITY = os.getenv("DB_DURABILITY", "fast").lower()
+
+DURABILITY_PROFILES = {
+    "fast": {"synchronous": "NORMAL"},
+    "safe": {"synchronous": "FULL"},
+}
+
+# Per-connection tuning applied on top of the durability profile
+CONNECTION_PRAGMAS = {
+    "busy_timeout": 5000,       # ms to wait on a locked database before raising
+    "cache_size": -16000,       # negative = KiB, so ~16 MB page cache per connection
+    "mmap_size": 268435456,     # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+}
+
+# Latency samples kept per named query for the p50/p99 figures in !querystats
+QUERY_STATS_SAMPLES = 1024
+# sqlite3 keeps this many prepared statements per connection. Sized so every
+# catalog query stays prepared, plus headroom for PRAGMAs and migrations.
+STATEMENT_CACHE_SIZE = max(128, len(queries.QUERIES) + 64)
+
+# Writer connection held by the current task. Nested write()/read() calls made
+# while a write block is open reuse it instead of deadlocking on the lock.
+_held_writer = contextvars.ContextVar("held_writer", default=None)
+
+class QueryStats:
+    """Call counts, row counts and a rolling latency window per named query."""
+    def __init__(self, samples=QUERY_STATS_SAMPLES):
+        self.samples = samples
+        self.queries = {}
+
+    def record(self, name, seconds, rows):
+        entry = self.queries.get(name)
+        if entry is None:
+            entry = self.queries[name] = {"calls": 0, "rows": 0, "errors": 0, "total": 0.0, "max": 0.0,
+                                          "latencies": deque(maxlen=self.samples)}
+        entry["calls"] += 1
+        entry["rows"] += max(rows, 0)
+        entry["total"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+        entry["latencies"].append(seconds)
+
+    def record_error(self, name):
+        self.record(name, 0.0, 0)
+        self.queries[name]["errors"] += 1
+
+    def summary(self):
+        """[{name, calls, rows, errors, avg_ms, p50_ms, p99_ms, max_ms}], slowest p99 first."""
+        def percentile(ordered, p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+        result = []
+        for name, entry in self.queries.items():
+            ordered = sorted(entry["latencies"])
+            result.append({
+                "name": name,
+                "calls": entry["calls"],
+                "rows": entry["rows"],
+                "errors": entry["errors"],
+                "avg_ms": entry["total"] / entry["calls"] * 1000,
+                "p50_ms": percentile(ordered, 0.50) * 1000,
+                "p99_ms": percentile(ordered, 0.99) * 1000,
+                "max_ms": entry["max"] * 1000,
+            })
+        result.sort(key=lambda q: q["p99_ms"], reverse=True)
+        return result
+
+class Session:
+    """
+    A pooled connection as handed out by read()/write().
+    Adds the named-query helpers (fetchone/fetchall/fetchval/run/run_many) that
+    look SQL up in queries.QUERIES and time it; everything else, including raw
+    execute() for migrations and PRAGMAs, goes straight to the aiosqlite connection.
+    """
+    __slots__ = ("conn", "stats", "commit_hooks", "rollback_hooks")
+
+    def __init__(self, conn, stats):
+        self.conn = conn
+        self.stats = stats
+        self.commit_hooks = []
+        self.rollback_hooks = []
+
+    def on_commit(self, hook):
+        """Call hook() once this write block has committed, before the writer is released."""
+        self.commit_hooks.append(hook)
+
+    def on_rollback(self, hook):
+        """Call hook() if this write block ends in a rollback (e.g. to drop cached values it wrote)."""
+        self.rollback_hooks.append(hook)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    async def fetchone(self, name, params=()):
+        start = time.perf_counter()
+        try:
+            async with self.conn.execute(queries.QUERIES[name], params) as cursor:
+                row = await cursor.fetchone()
+        except Exception:
+            self.stats.record_error(name)
+            raise
+        self.stats.record(name, time.perf_counter() - start, 1 if row is not None else 0)
+        return row
+
+    async def fetchall(self, name, params=()):
+        start = time.perf_counter()
+        try:
+            async with self.conn.execute(queries.QUERIES[name], params) as cursor:
+                rows = await cursor.fetchall()
+        except Exception:
+            self.stats.record_error(name)
+            raise
+        self.stats.record(name, time.perf_counter() - start, len(rows))
+        return rows
+
+    async def fetchval(self, name, params=(), default=None):
+        """First column of the first row, or default if there is no row."""
+        row = await self.fetchone(name, params)
+        return row[0] if row is not None else default
+
+    async def run(self, name, params=()):
+        """Execute a write. Returns the cursor for rowcount/lastrowid."""
+        start = time.perf_counter()
+        try:
+            cursor = await self.conn.execute(queries.QUERIES[name], params)
+        except Exception:
+            self.stats.record_error(name)
+            raise
+        self.stats.record(name, time.perf_counter() - start, cursor.rowcount)
+        return cursor
+
+    async def run_many(self, name, seq_of_params):
+        """executemany a write. Returns the total rowcount."""
+        start = time.perf_counter()
+        try:
+            cursor = await self.conn.executemany(queries.QUERIES[name], seq_of_params)
+        except Exception:
+            self.stats.record_error(name)
+            raise
+        self.stats.record(name, time.perf_counter() - start, cursor.rowcount)
+        return cursor.rowcount
+
+class ConnectionPool:
+    """
+    Bounded pool of long-lived aiosqlite connections.
+    SQLite allows a single writer at a time, so writes are serialized through one
+    connection while reads are spread over a fixed set of reader connections.
+    """
+    journal_mode = "WAL"
+
+    def __init__(self, db_file, readers=DB_READERS, durability=DB_DURABILITY):
+        self.db_file = db_file
+        self.reader_count = max(1, readers)
+        if durability not in DURABILITY_PROFILES:
+            logger.warning(f"Unknown DB_DURABILITY '{durability}', falling back to 'safe'.")
+            durability = "safe"
+        self.durability = durability
+        self._writer = None
+        self._readers = None
+        self._connections = []
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+        self.query_stats = QueryStats()
+
+        # Stats
+        self.readers_in_use = 0
+        self.writer_in_use = False
+        self.read_acquires = 0
+        self.write_acquires = 0
+        self.read_wait_total = 0.0
+        self.write_wait_total = 0.0
+        self.read_wait_max = 0.0
+        self.write_wait_max = 0.0
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.db_file, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = aiosqlite.Row
+        await self._configure(conn)
+        await conn.create_function("level_for", 2, level_curve.sql_level_for, deterministic=True)
+        return conn
+
+    async def _configure(self, conn):
+        pragmas = dict(CONNECTION_PRAGMAS)
+        pragmas.update(DURABILITY_PROFILES[self.durability])
+        for key, value in pragmas.items():
+            await conn.execute(f"PRAGMA {key} = {value}")
+
+    async def open(self):
+        async with self._open_lock:
+            if self.is_open:
+                return
+            self._writer = await self._connect()
+            # WAL is stored in the file itself, so setting it once on the writer is enough.
+            # Readers then no longer block on (or get blocked by) XP writes.
+            async with self._writer.execute(f"PRAGMA journal_mode = {self.journal_mode}") as cursor:
+                mode = (await cursor.fetchone())[0]
+            if mode.lower() != self.journal_mode.lower():
+                logger.warning(f"Could not enable {self.journal_mode}, journal mode is '{mode}'.")
+            self._connections = [self._writer]
+            self._readers = asyncio.Queue()
+            for _ in range(self.reader_count):
+                conn = await self._connect()
+                self._connections.append(conn)
+                self._readers.put_nowait(conn)
+            logger.info(f"Database pool opened (1 writer, {self.reader_count} readers, journal={mode}, durability={self.durability}).")
+
+    async def close(self):
+        async with self._open_lock:
+            if not self.is_open:
+                return
+            # Let in-flight writes finish before tearing down
+            async with self._write_lock:
+                try:
+                    # Fold the WAL back into bot_data.db so the file is complete on its own
+                    await self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except Exception as e:
+                    logger.error(f"WAL checkpoint on close failed: {e}")
+                for conn in self._connections:
+                    try:
+                        await conn.close()
+                    except Exception as e:
+                        logger.error(f"Error closing database connection: {e}")
+                self._connections = []
+                self._writer = None
+                self._readers = None
+            logger.info("Database pool closed.")
+
+    @asynccontextmanager
+    async def read(self):
+        held = _held_writer.get()
+        if held is not None:
+            # Inside a write block: read through the writer so we see our own changes
+            yield held
+            return
 
-            try:
-                await db.execute("ALTER TABLE global_users ADD COLUMN bg_crop_y INTEGER DEFAULT 0")
-            except Exception: pass
+        if not self.is_open:
+            await self.open()
 
-            try:
-                await db.execute("ALTER TABLE global_users ADD COLUMN bg_crop_w INTEGER DEFAULT 0")
-            except Exception: pass
+        readers = self._readers
+        start = time.perf_counter()
+        conn = await readers.get()
+        waited = time.perf_counter() - start
 
-            # --- Schema Updates for Sportsbook (v2.2.1) ---
-            try:
-                await db.execute("ALTER TABLE active_sports_bets ADD COLUMN matchup TEXT DEFAULT NULL")
-            except Exception: pass
+        self.read_acquires += 1
+        self.read_wait_total += waited
+        self.read_wait_max = max(self.read_wait_max, waited)
+        self.readers_in_use += 1
+        try:
+            yield Session(conn, self.query_stats)
+        finally:
+            self.readers_in_use -= 1
+            readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self):
+        held = _held_writer.get()
+        if held is not None:
+            # Nested write: the outermost block owns the transaction
+            yield held
+            return
 
-            # --- Schema Updates for Config (v2.3.1) ---
-            try:
-                await db.execute("ALTER TABLE guild_configs ADD COLUMN update_log_channel_id INTEGER DEFAULT NULL")
-            except Exception: pass
+        if not self.is_open:
+            await self.open()
 
-            # --- Schema Updates for Config (v2.3.x) ---
-            try:
-                await db.execute("ALTER TABLE guild_configs ADD COLUMN level_up_channel_id INTEGER DEFAULT NULL")
-            except Exception: pass
+        start = time.perf_counter()
+        async with self._write_lock:
+            waited = time.perf_counter() - start
+            self.write_acquires += 1
+            self.write_wait_total += waited
+            self.write_wait_max = max(self.write_wait_max, waited)
+            self.writer_in_use = True
 
-            # --- Schema Updates for TCFC Config (v2.3.5) ---
+            conn = self._writer
+            session = Session(conn, self.query_stats)
+            token = _held_writer.set(session)
             try:
-                await db.execute("ALTER TABLE guild_configs ADD COLUMN tcfc_channel_id INTEGER DEFAULT NULL")
-            except Exception: pass
+                yield session
+                if conn.in_transaction:
+                    await conn.commit()
+                for hook in session.commit_hooks:
+                    hook()
+            except BaseException:
+                if conn.in_transaction:
+                    await conn.rollback()
+                for hook in session.rollback_hooks:
+                    hook()
+                raise
+            finally:
+                _held_writer.reset(token)
+                self.writer_in_use = False
+
+    def stats(self):
+        def avg_ms(total, count):
+            return (total / count * 1000) if count else 0.0
+
+        return {
+            "durability": self.durability,
+            "readers": self.reader_count,
+            "readers_in_use": self.readers_in_use,
+            "writer_in_use": self.writer_in_use,
+            "read_acquires": self.read_acquires,
+            "write_acquires": self.write_acquires,
+            "read_wait_avg_ms": avg_ms(self.read_wait_total, self.read_acquires),
+            "write_wait_avg_ms": avg_ms(self.write_wait_total, self.write_acquires),
+            "read_wait_max_ms": self.read_wait_max * 1000,
+            "write_wait_max_ms": self.write_wait_max * 1000,
+        }
 
-            try:
-                await db.execute("ALTER TABLE guild_configs ADD COLUMN tcfc_analyst_role_id INTEGER DEFAULT NULL")
-            except Exception: pass
-
-            # --- Schema Updates for TCFC (v2.3.0) ---
-            # Fighters
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tcfc_fighters (
-                    user_id INTEGER PRIMARY KEY,
-                    elo INTEGER DEFAULT 1000,
-                    wins INTEGER DEFAULT 0,
-                    losses INTEGER DEFAULT 0,
-                    kos INTEGER DEFAULT 0,
-                    rounds_fought INTEGER DEFAULT 0,
-                    total_damage REAL DEFAULT 0.0
-                )
-            """)
-
-            # Matches
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tcfc_matches (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fighter_a INTEGER,
-                    fighter_b INTEGER,
-                    tournament_id TEXT,
-                    status TEXT DEFAULT 'OPEN', -- OPEN, CLOSED, RESOLVED
-                    winner_id INTEGER,
-                    method TEXT, -- KO, DEC
-                    round INTEGER,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # TCFC Bets
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tcfc_bets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    match_id INTEGER,
-                    bet_type TEXT, -- WINNER, METHOD, ROUND
-                    selection TEXT,
-                    wager INTEGER,
-                    odds REAL,
-                    potential_payout INTEGER,
-                    status TEXT DEFAULT 'PENDING'
-                )
-            """)
-
-            # 6. Shop Items
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS shop_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    name TEXT,
-                    price INTEGER,
-                    role_id INTEGER,
-                    description TEXT
-                )
-            """)
+class DatabaseManager:
+    def __init__(self):
+        self.db_file = DB_FILE
+        self.pool = ConnectionPool(self.db_file)
+
+    # --- Connection Access ---
+    def read(self):
+        """Borrow a reader connection: `async with db_manager.read() as db:`"""
+        return self.pool.read()
+
+    def write(self):
+        """Borrow the writer connection. Commits on exit, rolls back on error."""
+        return self.pool.write()
+
+    def in_write(self):
+        """True inside a write() block (the writer already serializes this task's writes)."""
+        return _held_writer.get() is not None
+
+    async def close(self):
+        await self.pool.close()
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def query_stats(self):
+        return self.pool.query_stats.summary()
+
+    # --- Named Queries (one-shot) ---
+    # For a single statement outside any block. Several statements that belong
+    # together still go through `async with db_manager.write() as db:`.
+    async def fetchone(self, name, params=()):
+        async with self.read() as db:
+            return await db.fetchone(name, params)
+
+    async def fetchall(self, name, params=()):
+        async with self.read() as db:
+            return await db.fetchall(name, params)
+
+    async def fetchval(self, name, params=(), default=None):
+        async with self.read() as db:
+            return await db.fetchval(name, params, default)
+
+    async def run(self, name, params=()):
+        async with self.write() as db:
+            return await db.run(name, params)
+
+    async def run_many(self, name, seq_of_params):
+        async with self.write() as db:
+            return await db.run_many(name, seq_of_params)
+
+    async def check_query_plans(self):
+        """
+        EXPLAIN QUERY PLAN every entry in queries.QUERIES.
+        Returns {name: [plan lines]} for the queries that fall back to a full
+        table scan, other than the ones listed in queries.SCAN_OK.
+        """
+        flagged = {}
+        async with self.read() as db:
+            # EXPLAIN doesn't check the schema cookie, so a reader opened before the
+            # migrations ran would plan against its stale schema. A real read reloads it.
+            await db.execute("SELECT COUNT(*) FROM sqlite_master")
+            for name, sql in queries.QUERIES.items():
+                if name in queries.SCAN_OK:
+                    continue
+                params = (None,) * sql.count("?")
+                async with db.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+                    plan = [row[3] for row in await cursor.fetchall()]
+                # "SCAN t USING INDEX ..." walks an index, a bare "SCAN t" reads the whole table.
+                # "SCAN (subquery-N)" only reads rows an inner, already-checked step produced.
+                if any(line.startswith("SCAN") and "INDEX" not in line and not line.startswith("SCAN (") for line in plan):
+                    flagged[name] = plan
+        return flagged
 
-            try:
-                await db.execute("ALTER TABLE shop_items ADD COLUMN item_type TEXT DEFAULT 'ROLE'")
-            except Exception: pass
-
-            # 7. User Inventory (Added v2.4.1)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS inventory (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    guild_id INTEGER,
-                    item_name TEXT,
-                    purchase_date DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Seed Lucky Charm if missing (Fix for v2.4.3)
-            async with db.execute("SELECT 1 FROM shop_items WHERE name = 'Lucky Charm'") as cursor:
-                 if not await cursor.fetchone():
-                     await db.execute("INSERT INTO shop_items (name, price, role_id, description, item_type) VALUES (?, ?, ?, ?, ?)",
-                                      ('Lucky Charm', 2500, 0, 'Increases luck in Casino games!', 'LUCK'))
-                 else:
-                     # Update type if exists (Migration)
-                     await db.execute("UPDATE shop_items SET item_type = 'LUCK' WHERE name = 'Lucky Charm'")
-
-            # Seed Auto Slot
-            async with db.execute("SELECT 1 FROM shop_items WHERE name = 'Auto Slot'") as cursor:
-                 if not await cursor.fetchone():
-                     await db.execute("INSERT INTO shop_items (name, price, role_id, description, item_type) VALUES (?, ?, ?, ?, ?)",
-                                      ('Auto Slot', 5000, 0, 'Unlocks /autoslots command for rapid spinning.', 'UNLOCK'))
-                 else:
-                     await db.execute("UPDATE shop_items SET item_type = 'UNLOCK' WHERE name = 'Auto Slot'")
-
-            # 8. Active Bets
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS active_bets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    description TEXT,
-                    options TEXT, -- JSON list of options
-                    status TEXT DEFAULT 'OPEN', -- OPEN, CLOSED, RESOLVED
-                    creator_id INTEGER,
-                    winning_option TEXT DEFAULT NULL
-                )
-            """)
-
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS bet_entries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    bet_id INTEGER,
-                    user_id INTEGER,
-                    option TEXT,
-                    amount INTEGER,
-                    FOREIGN KEY(bet_id) REFERENCES active_bets(id)
-                )
-            """)
-
-            # 9. Active Sports Bets (Plugin 2.2)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS active_sports_bets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    guild_id INTEGER,
-                    game_id TEXT,
-                    sport_key TEXT,
-                    bet_type TEXT, -- moneyline, spread, total
-                    bet_selection TEXT, -- Team Name or Over/Under
-                    bet_line TEXT, -- e.g. -110, +200, or -5.5
-                    wager_amount INTEGER,
-                    potential_payout INTEGER,
-                    status TEXT DEFAULT 'PENDING', -- PENDING, WON, LOST, PUSH
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    matchup TEXT DEFAULT NULL
-                )
-            """)
-
-            # 10. Birthdays
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS birthdays (
-                    user_id INTEGER PRIMARY KEY,
-                    day INTEGER,
-                    month INTEGER
-                )
-            """)
-
-            # 11. Global Config (e.g. RTP)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS global_config (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """)
-
-            # 12. PvP Bets (Economy)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS pvp_bets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    challenger_id INTEGER,
-                    opponent_id INTEGER,
-                    amount INTEGER,
-                    status TEXT DEFAULT 'PENDING', -- PENDING, ACTIVE, RESOLVED, VOID
-                    challenger_vote INTEGER DEFAULT NULL,
-                    opponent_vote INTEGER DEFAULT NULL,
-                    winner_id INTEGER DEFAULT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 13. Ladder System (v2.6)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS ladders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER,
-                    name TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(guild_id, name)
-                )
-            """)
-
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS ladder_players (
-                    ladder_id INTEGER,
-                    user_id INTEGER,
-                    elo INTEGER DEFAULT 1000,
-                    wins INTEGER DEFAULT 0,
-                    losses INTEGER DEFAULT 0,
-                    streak INTEGER DEFAULT 0,
-                    PRIMARY KEY (ladder_id, user_id),
-                    FOREIGN KEY(ladder_id) REFERENCES ladders(id) ON DELETE CASCADE
-                )
-            """)
-
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS ladder_matches (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ladder_id INTEGER,
-                    p1_id INTEGER,
-                    p2_id INTEGER,
-                    status TEXT DEFAULT 'PENDING', -- PENDING, ACTIVE, REPORTED, CONFIRMED, DISPUTED
-                    winner_id INTEGER,
-                    wager INTEGER DEFAULT 0,
-                    p1_report INTEGER DEFAULT NULL, -- 1=Self Win, 2=Opponent Win
-                    p2_report INTEGER DEFAULT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(ladder_id) REFERENCES ladders(id) ON DELETE CASCADE
-                )
-            """)
-
-            await db.commit()
+    async def init_db(self):
+        async with self.write() as db:
+            await migrations.migrate(db)
 
     async def migrate_from_json(self):
         if not os.path.exists("guild_configs.json"):
@@ -342,7 +417,7 @@ class DatabaseManager:
             with open("guild_configs.json", "r") as f:
                 data = json.load(f)
 
-            async with aiosqlite.connect(self.db_file) as db:
+            async with self.write() as db:
                 for guild_id_str, config in data.items():
                     guild_id = int(guild_id_str)
                     owner_role = config.get('owner_role_id')
@@ -352,13 +427,7 @@ class DatabaseManager:
                     allowed = json.dumps(config.get('allowed_search_channels', []))
                     mod_roles = json.dumps(config.get('mod_roles', []))
 
-                    await db.execute("""
-                        INSERT OR REPLACE INTO guild_configs
-                        (guild_id, owner_role_id, forum_channel_id, log_channel_id, muted_role_id, allowed_search_channels, mod_roles)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (guild_id, owner_role, forum_chan, log_chan, muted_role, allowed, mod_roles))
-
-                await db.commit()
+                    await db.run("config.import_json", (guild_id, owner_role, forum_chan, log_chan, muted_role, allowed, mod_roles))
 
             os.rename("guild_configs.json", "guild_configs.json.bak")
             logger.success("Migration complete. Renamed JSON to .bak")
@@ -368,31 +437,19 @@ class DatabaseManager:
 
     # --- Helper Methods ---
     async def get_guild_config(self, guild_id):
-        async with aiosqlite.connect(self.db_file) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM guild_configs WHERE guild_id = ?", (guild_id,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return dict(row)
-                return {}
+        row = await self.fetchone("config.guild", (guild_id,))
+        return dict(row) if row else {}
 
     async def update_guild_config(self, guild_id, key, value):
-        valid_columns = ['owner_role_id', 'forum_channel_id', 'log_channel_id', 'muted_role_id', 'allowed_search_channels', 'mod_roles', 'xp_rate', 'update_log_channel_id', 'tcfc_channel_id', 'tcfc_analyst_role_id', 'level_up_channel_id']
-        if key not in valid_columns:
+        if key not in queries.CONFIG_COLUMNS:
             return False
 
-        async with aiosqlite.connect(self.db_file) as db:
-            async with db.execute("SELECT 1 FROM guild_configs WHERE guild_id = ?", (guild_id,)) as cursor:
-                exists = await cursor.fetchone()
-
-            if not exists:
-                await db.execute("INSERT INTO guild_configs (guild_id) VALUES (?)", (guild_id,))
-
-            if key in ['allowed_search_channels', 'mod_roles'] and isinstance(value, list):
-                value = json.dumps(value)
+        if key in ['allowed_search_channels', 'mod_roles'] and isinstance(value, list):
+            value = json.dumps(value)
 
-            await db.execute(f"UPDATE guild_configs SET {key} = ? WHERE guild_id = ?", (value, guild_id))
-            await db.commit()
+        async with self.write() as db:
+            await db.run("config.ensure", (guild_id,))
+            await db.run(f"config.set_{key}", (value, guild_id))
         return True
 
     # Helper for generic adding to lists (used by legacy code)
@@ -1,41 +1,274 @@
 import discord
-from discord.ext import commands
-import aiosqlite
+from discord.ext import commands, tasks
+from database import db_manager
+from caching import LRUCache, TTLCache
+from shop_catalog import ShopCatalog
+import asyncio
+import contextlib
 import random
 import datetime
+import json
+import os
+import time
+import weakref
+from dotenv import load_dotenv
+import logger
+
+load_dotenv()
+
+# Seconds a guild's richest-members board is reused before it is queried again
+MONEY_LEADERBOARD_CACHE_SECONDS = float(os.getenv("MONEY_LEADERBOARD_CACHE_SECONDS", "30"))
+# Wallets kept in memory; the least recently used are dropped first
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", "10000"))
+# Minutes between checks of cached balances against global_users (0 = off)
+BALANCE_VERIFY_MINUTES = float(os.getenv("BALANCE_VERIFY_MINUTES", "10"))
 
 class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.richest = TTLCache(MONEY_LEADERBOARD_CACHE_SECONDS)
+        self.catalog = ShopCatalog()
+        # Write-through wallet cache: user_id -> balance
+        self.balances = LRUCache(BALANCE_CACHE_SIZE, sizeof=lambda _: 1)
+        self._generation = 0  # bumped on every balance write so in-flight misses don't store stale reads
+        self._wallet_locks = weakref.WeakValueDictionary()  # user_id -> asyncio.Lock, dropped when idle
+        # Item quantities per user (user_id -> {item_name: qty}), for O(1) item checks
+        self.items = LRUCache(BALANCE_CACHE_SIZE, sizeof=lambda _: 1)
+        self._items_generation = 0
+        # settle() metrics
+        self.settlements = 0
+        self.settled_rows = 0
+        self.settle_seconds = 0.0
+        # verify_balances() metrics
+        self.verify_runs = 0
+        self.verify_mismatches = 0
+
+    async def cog_load(self):
+        if BALANCE_VERIFY_MINUTES > 0:
+            self.verify_balances.change_interval(minutes=BALANCE_VERIFY_MINUTES)
+            self.verify_balances.start()
+
+    async def cog_unload(self):
+        self.verify_balances.cancel()
 
     async def get_balance(self, user_id):
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT balance FROM global_users WHERE user_id = ?", (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                return row[0] if row else 0
-
-    async def update_balance(self, user_id, amount):
-        async with aiosqlite.connect("bot_data.db") as db:
-            # Upsert
-            await db.execute("""
-                INSERT INTO global_users (user_id, balance) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET balance = balance + ?
-            """, (user_id, amount, amount))
-            await db.commit()
+        balance = self.balances.get(user_id)
+        if balance is not None:
+            return balance
+
+        generation = self._generation
+        balance = await db_manager.fetchval("economy.balance", (user_id,), 0)
+        # Reads inside a write block can see uncommitted changes; only cache committed ones
+        if generation == self._generation and not db_manager.in_write():
+            self.balances.put(user_id, balance)
+        return balance
+
+    # --- Balance Engine ---
+    # Each change is a single statement that returns the new balance (RETURNING)
+    # plus a ledger row, in one transaction on the writer. Called inside an outer
+    # db_manager.write() block, they join that block's transaction instead.
+    # The new balance is written through to self.balances before the block
+    # commits; a rollback drops it again.
+
+    @contextlib.asynccontextmanager
+    async def wallets(self, *user_ids):
+        """Hold the per-user locks for a balance change, taken in id order so transfers can't deadlock."""
+        if db_manager.in_write():
+            # The caller's write block already orders every balance write, and waiting
+            # here while holding the writer could deadlock with a task holding the wallet
+            yield
+            return
 
-            # Fetch new balance
-            async with db.execute("SELECT balance FROM global_users WHERE user_id = ?", (user_id,)) as cursor:
-                return (await cursor.fetchone())[0]
+        async with contextlib.AsyncExitStack() as stack:
+            for user_id in sorted(set(user_ids)):
+                lock = self._wallet_locks.get(user_id)
+                if lock is None:
+                    lock = self._wallet_locks[user_id] = asyncio.Lock()
+                await stack.enter_async_context(lock)
+            yield
+
+    def _cache_balance(self, db, user_id, balance):
+        self._generation += 1
+        self.balances.put(user_id, balance)
+        db.on_rollback(lambda: self.balances.pop(user_id))
+
+    async def _record(self, db, user_id, amount, balance, reason, counterparty_id=None):
+        self._cache_balance(db, user_id, balance)
+        await db.run("ledger.insert", (user_id, amount, balance, reason, counterparty_id))
+
+    async def credit(self, user_id, amount, reason="credit", counterparty_id=None):
+        """Add coins, creating the account if needed. Returns the new balance."""
+        async with self.wallets(user_id), db_manager.write() as db:
+            balance = await db.fetchval("economy.credit", (user_id, amount))
+            await self._record(db, user_id, amount, balance, reason, counterparty_id)
+        return balance
+
+    async def debit(self, user_id, amount, reason="debit", counterparty_id=None):
+        """Take coins only if the user has enough. Returns the new balance, or None if short."""
+        async with self.wallets(user_id), db_manager.write() as db:
+            balance = await db.fetchval("economy.debit", (amount, user_id, amount))
+            if balance is None:
+                return None
+            await self._record(db, user_id, -amount, balance, reason, counterparty_id)
+        return balance
+
+    async def transfer(self, from_id, to_id, amount, reason="transfer"):
+        """Move coins between two users. Returns (from_balance, to_balance), or None if short."""
+        async with self.wallets(from_id, to_id), db_manager.write() as db:
+            from_bal = await self.debit(from_id, amount, reason, counterparty_id=to_id)
+            if from_bal is None:
+                return None
+            to_bal = await self.credit(to_id, amount, reason, counterparty_id=from_id)
+        return from_bal, to_bal
+
+    async def settle(self, payouts, reason, counterparty_id=None):
+        """
+        Pay out many users at once: one executemany on global_users, one read of
+        the new balances and one executemany into the ledger, in a single
+        transaction. payouts is [(user_id, amount)]; a user listed twice is paid
+        the sum. Returns {user_id: new balance}.
+        """
+        totals = {}
+        for user_id, amount in payouts:
+            totals[user_id] = totals.get(user_id, 0) + amount
+        totals = {user_id: amount for user_id, amount in totals.items() if amount}
+        if not totals:
+            return {}
+
+        start = time.perf_counter()
+        async with self.wallets(*totals), db_manager.write() as db:
+            await db.run_many("economy.credit_many", list(totals.items()))
+            rows = await db.fetchall("economy.balances_of", (json.dumps(list(totals)),))
+            balances = {row[0]: row[1] for row in rows}
+            for user_id, balance in balances.items():
+                self._cache_balance(db, user_id, balance)
+            await db.run_many("ledger.insert", [
+                (user_id, amount, balances[user_id], reason, counterparty_id)
+                for user_id, amount in totals.items()
+            ])
+
+        self.settlements += 1
+        self.settled_rows += len(totals)
+        self.settle_seconds += time.perf_counter() - start
+        return balances
+
+    # --- Inventory ---
+    # Purchases are rows in inventory; inventory_counts holds the quantity per
+    # item and self.items caches it per user, so the per-spin checks in the
+    # casino (Auto Slot unlock, Lucky Charm charges) are a dict lookup.
+
+    async def item_counts(self, user_id):
+        """{item_name: qty} of everything the user holds."""
+        counts = self.items.get(user_id)
+        if counts is not None:
+            return counts
+
+        generation = self._items_generation
+        rows = await db_manager.fetchall("inventory.list", (user_id,))
+        counts = {name: qty for name, qty in rows}
+        if generation == self._items_generation and not db_manager.in_write():
+            self.items.put(user_id, counts)
+        return counts
+
+    async def has_item(self, user_id, item_name):
+        return (await self.item_counts(user_id)).get(item_name, 0) > 0
+
+    def _change_items(self, db, user_id, item_name, delta):
+        self._items_generation += 1
+        counts = self.items.peek(user_id)
+        if counts is not None:
+            counts = dict(counts)  # Callers may still hold the old dict
+            qty = counts.get(item_name, 0) + delta
+            if qty > 0:
+                counts[item_name] = qty
+            else:
+                counts.pop(item_name, None)
+            self.items.put(user_id, counts)
+        db.on_commit(lambda: self._items_committed(user_id, counts))
+        db.on_rollback(lambda: self.items.pop(user_id))
+
+    def _items_committed(self, user_id, counts):
+        # A load that read the table before the commit may have cached the old
+        # counts after the bump above; fail it or drop what it stored
+        self._items_generation += 1
+        if self.items.peek(user_id) is not counts:
+            self.items.pop(user_id)
+
+    async def add_item(self, user_id, guild_id, item_name):
+        """Record one purchase of an item."""
+        async with db_manager.write() as db:
+            await db.run("inventory.add", (user_id, guild_id, item_name))
+            await db.run("inventory.count_add", (user_id, guild_id or 0, item_name))
+            self._change_items(db, user_id, item_name, 1)
+
+    async def consume_item(self, user_id, item_name):
+        """Use up one of an item. Returns False if the user has none."""
+        if not await self.has_item(user_id, item_name):
+            return False
+        async with db_manager.write() as db:
+            row = await db.fetchone("inventory.count_take", (user_id, item_name))
+            if row is None:
+                self.items.pop(user_id)  # Cache was ahead of the table; reload next time
+                return False
+            guild_id, qty = row
+            if qty <= 0:
+                await db.run("inventory.count_prune", (user_id,))
+            # Delete a purchase row from the same guild the count came off
+            item_id = await db.fetchval("inventory.first_item", (user_id, item_name, guild_id))
+            if item_id is not None:
+                await db.run("inventory.delete", (item_id,))
+            self._change_items(db, user_id, item_name, -1)
+        return True
+
+    @tasks.loop(minutes=10)
+    async def verify_balances(self):
+        """Compare cached wallets with global_users and drop any that disagree."""
+        user_ids = self.balances.keys()
+        mismatched = 0
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            generation = self._generation
+            rows = await db_manager.fetchall("economy.balances_of", (json.dumps(chunk),))
+            if generation != self._generation:
+                continue  # A balance changed mid-read; check these next time
+            stored = {row[0]: row[1] for row in rows}
+            for user_id in chunk:
+                cached = self.balances.peek(user_id)
+                if cached is not None and cached != stored.get(user_id, 0):
+                    self.balances.pop(user_id)
+                    mismatched += 1
+
+        self.verify_runs += 1
+        self.verify_mismatches += mismatched
+        if mismatched:
+            logger.warning(f"Balance cache: dropped {mismatched} wallets that no longer matched the database.")
+
+    def stats(self):
+        cache = self.balances.stats()
+        return {
+            "cached": cache["entries"],
+            "max_cached": cache["max_bytes"],
+            "hits": cache["hits"],
+            "misses": cache["misses"],
+            "hit_rate": cache["hit_rate"],
+            "evictions": cache["evictions"],
+            "verify_runs": self.verify_runs,
+            "verify_mismatches": self.verify_mismatches,
+            "settlements": self.settlements,
+            "settled_rows": self.settled_rows,
+            "rows_per_sec": (self.settled_rows / self.settle_seconds) if self.settle_seconds else 0.0,
+        }
+
+    async def update_balance(self, user_id, amount, reason="adjust"):
+        """Unconditional signed change (payouts, refunds). Use debit() to charge a user."""
+        return await self.credit(user_id, amount, reason)
 
     @commands.hybrid_command(name="daily", description="Collect your daily coins")
     async def daily(self, ctx):
         user_id = ctx.author.id
         now = datetime.datetime.now().timestamp()
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT last_daily FROM global_users WHERE user_id = ?", (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                last_daily = row[0] if row else 0
+        last_daily = await db_manager.fetchval("economy.last_daily", (user_id,), 0)
 
         if now - last_daily < 86400: # 24 hours
             hours_left = int((86400 - (now - last_daily)) / 3600)
@@ -43,10 +276,9 @@ class Economy(commands.Cog):
             return
 
         amount = 100 # Daily amount
-        new_bal = await self.update_balance(user_id, amount)
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("UPDATE global_users SET last_daily = ? WHERE user_id = ?", (now, user_id))
+        async with db_manager.write() as db:
+            new_bal = await self.credit(user_id, amount, "daily")
+            await db.run("economy.set_last_daily", (now, user_id))
             await db.commit()
 
         await ctx.send(f"💰 You claimed {amount} coins! Balance: {new_bal}")
@@ -60,27 +292,11 @@ class Economy(commands.Cog):
 
     @commands.hybrid_command(name="moneyleaderboard", description="Show top 5 richest members")
     async def money_leaderboard(self, ctx):
-        # 1. Get all member IDs in this guild
-        member_ids = [m.id for m in ctx.guild.members if not m.bot]
-        if not member_ids:
-            return await ctx.send("No members found.", ephemeral=True)
-
-        # 2. Chunking (batch size 500)
-        chunks = [member_ids[i:i + 500] for i in range(0, len(member_ids), 500)]
-        all_rows = []
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            for chunk in chunks:
-                placeholders = ",".join("?" for _ in chunk)
-                query = f"SELECT user_id, balance FROM global_users WHERE user_id IN ({placeholders}) AND balance > 0"
-                async with db.execute(query, tuple(chunk)) as cursor:
-                    rows = await cursor.fetchall()
-                    all_rows.extend(rows)
-
-        # 3. Sort and limit
-        # all_rows is list of (user_id, balance) tuples
-        all_rows.sort(key=lambda x: x[1], reverse=True)
-        top_5 = all_rows[:5]
+        # One indexed join over guild_members (kept in sync by guild_members.py)
+        top_5 = self.richest.get(ctx.guild.id)
+        if top_5 is None:
+            top_5 = [tuple(row) for row in await db_manager.fetchall("economy.guild_top", (ctx.guild.id, 5))]
+            self.richest.put(ctx.guild.id, top_5)
 
         if not top_5:
             return await ctx.send("No one has any money yet!", ephemeral=True)
@@ -100,14 +316,16 @@ class Economy(commands.Cog):
 
     @gamble.command(name="rps", description="Play Rock-Paper-Scissors for coins")
     async def rps(self, ctx, amount: int, choice: str):
-        bal = await self.get_balance(ctx.author.id)
-        if bal < amount: return await ctx.send("Insufficient funds.")
         if amount < 1: return await ctx.send("Amount must be positive.")
 
         choices = ['rock', 'paper', 'scissors']
         choice = choice.lower()
         if choice not in choices: return await ctx.send("Choose rock, paper, or scissors.")
 
+        # Stake is taken up front; a win pays it back doubled, a tie refunds it
+        new_bal = await self.debit(ctx.author.id, amount, "rps_wager")
+        if new_bal is None: return await ctx.send("Insufficient funds.")
+
         bot_choice = random.choice(choices)
         result = "lost"
 
@@ -119,12 +337,12 @@ class Economy(commands.Cog):
             result = "won"
 
         if result == "won":
-            new_bal = await self.update_balance(ctx.author.id, amount)
+            new_bal = await self.credit(ctx.author.id, amount * 2, "rps_win")
             msg = f"Bot chose {bot_choice}. You won {amount} coins! Balance: {new_bal}"
         elif result == "lost":
-            new_bal = await self.update_balance(ctx.author.id, -amount)
             msg = f"Bot chose {bot_choice}. You lost {amount} coins. Balance: {new_bal}"
         else:
+            await self.credit(ctx.author.id, amount, "rps_refund")
             msg = f"Bot chose {bot_choice}. It's a tie!"
 
         await ctx.send(msg)
@@ -136,10 +354,7 @@ class Economy(commands.Cog):
 
     @shop.command(name="list", description="List available items in the shop")
     async def shop_list(self, ctx):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM shop_items WHERE guild_id = ?", (ctx.guild.id,)) as cursor:
-                items = await cursor.fetchall()
+        items = (await self.catalog.get(ctx.guild.id)).items
 
         if not items: return await ctx.send("Shop is empty.")
 
@@ -164,16 +379,10 @@ class Economy(commands.Cog):
 
     @shop.command(name="buy", description="Buy an item from the shop")
     async def shop_buy(self, ctx, item_name: str):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM shop_items WHERE guild_id = ? AND lower(name) = ?", (ctx.guild.id, item_name.lower())) as cursor:
-                item = await cursor.fetchone()
+        item = (await self.catalog.get(ctx.guild.id)).find(item_name)
 
         if not item: return await ctx.send("Item not found.")
 
-        bal = await self.get_balance(ctx.author.id)
-        if bal < item['price']: return await ctx.send("Insufficient funds.")
-
         role_id = item['role_id']
         role = ctx.guild.get_role(role_id) if role_id else None
 
@@ -184,38 +393,34 @@ class Economy(commands.Cog):
         if not is_inventory_item and not role:
              return await ctx.send("Role associated with this item no longer exists.")
 
-        await self.update_balance(ctx.author.id, -item['price'])
+        if await self.debit(ctx.author.id, item['price'], "shop_buy") is None:
+            return await ctx.send("Insufficient funds.")
 
         try:
             if role:
                 await ctx.author.add_roles(role, reason="Bought from shop")
 
             # Add to Inventory DB
-            async with aiosqlite.connect("bot_data.db") as db:
-                await db.execute("INSERT INTO inventory (user_id, guild_id, item_name) VALUES (?, ?, ?)",
-                                 (ctx.author.id, ctx.guild.id, item['name']))
-                await db.commit()
+            await self.add_item(ctx.author.id, ctx.guild.id, item['name'])
 
             msg = f"You bought **{item['name']}**!"
             if role: msg += f" Received role {role.name}."
             await ctx.send(msg)
 
         except Exception as e:
-            await self.update_balance(ctx.author.id, item['price']) # Refund
+            await self.credit(ctx.author.id, item['price'], "shop_refund") # Refund
             await ctx.send(f"Transaction failed: {e}. Refunded.")
 
     @commands.hybrid_command(name="inventory", description="Check your inventory items")
     async def inventory(self, ctx):
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT item_name, count(*) FROM inventory WHERE user_id = ? GROUP BY item_name", (ctx.author.id,)) as cursor:
-                rows = await cursor.fetchall()
+        counts = await self.item_counts(ctx.author.id)
 
-        if not rows:
+        if not counts:
             return await ctx.send("Your inventory is empty.", ephemeral=True)
 
         embed = discord.Embed(title=f"{ctx.author.display_name}'s Inventory", color=discord.Color.blue())
         desc = ""
-        for name, count in rows:
+        for name, count in sorted(counts.items()):
             desc += f"**{name}**: x{count}\n"
         embed.description = desc
         await ctx.send(embed=embed)
@@ -239,23 +444,32 @@ class Economy(commands.Cog):
 
         role_id = role.id if role else 0
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("INSERT INTO shop_items (guild_id, name, price, role_id, description, item_type) VALUES (?, ?, ?, ?, ?, ?)",
-                             (ctx.guild.id, name, price, role_id, description, type_val))
-            await db.commit()
+        await db_manager.run("shop.add", (ctx.guild.id, name, price, role_id, description, type_val))
+        self.catalog.invalidate(ctx.guild.id)
         await ctx.send(f"Added {name} ({type_val}) to shop.")
 
     @shop.command(name="remove", description="Remove an item from the shop (Admin)")
     @commands.has_permissions(administrator=True)
     async def shop_remove(self, ctx, item_name: str):
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT 1 FROM shop_items WHERE guild_id = ? AND lower(name) = ?", (ctx.guild.id, item_name.lower())) as cursor:
-                if not await cursor.fetchone():
-                    return await ctx.send("Item not found.", ephemeral=True)
-
-            await db.execute("DELETE FROM shop_items WHERE guild_id = ? AND lower(name) = ?", (ctx.guild.id, item_name.lower()))
-            await db.commit()
-        await ctx.send(f"Removed **{item_name}** from the shop.")
+        item = (await self.catalog.get(ctx.guild.id)).find(item_name)
+        if not item:
+            return await ctx.send("Item not found.", ephemeral=True)
+
+        await db_manager.run("shop.remove", (item['id'], ctx.guild.id))
+        self.catalog.invalidate(ctx.guild.id)
+        await ctx.send(f"Removed **{item['name']}** from the shop.")
+
+    @shop_buy.autocomplete("item_name")
+    @shop_remove.autocomplete("item_name")
+    async def shop_item_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Served from the cached catalog: no query per keystroke
+        if not interaction.guild:
+            return []
+        catalog = await self.catalog.get(interaction.guild.id)
+        return [
+            discord.app_commands.Choice(name=f"{item['name']} ({item['price']} coins)"[:100], value=item['name'][:100])
+            for item in catalog.search(current)
+        ]
 
     # --- Custom Bets ---
     @commands.hybrid_group(name="bet", description="Betting system")
@@ -267,75 +481,67 @@ class Economy(commands.Cog):
     async def bet_create(self, ctx, description: str, options: str):
         # Options separate by comma
         opt_list = [o.strip() for o in options.split(',')]
-        import json
-        async with aiosqlite.connect("bot_data.db") as db:
-            cursor = await db.execute("INSERT INTO active_bets (guild_id, description, options, creator_id) VALUES (?, ?, ?, ?)",
-                             (ctx.guild.id, description, json.dumps(opt_list), ctx.author.id))
-            await db.commit()
-            bet_id = cursor.lastrowid
+        cursor = await db_manager.run("bets.create", (ctx.guild.id, description, json.dumps(opt_list), ctx.author.id))
+        bet_id = cursor.lastrowid
 
         await ctx.send(f"Bet created! ID: {bet_id}\nOptions: {', '.join(opt_list)}")
 
     @bet.command(name="place", description="Place a bet on an active event")
     async def bet_place(self, ctx, bet_id: int, option: str, amount: int):
-        bal = await self.get_balance(ctx.author.id)
-        if bal < amount: return await ctx.send("Insufficient funds.")
         if amount < 1: return await ctx.send("Positive amounts only.")
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            # Check bet
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM active_bets WHERE id = ? AND status = 'OPEN'", (bet_id,)) as cursor:
-                bet = await cursor.fetchone()
+        # Check bet
+        bet = await db_manager.fetchone("bets.get_open", (bet_id,))
 
-            if not bet: return await ctx.send("Bet invalid or closed.")
+        if not bet: return await ctx.send("Bet invalid or closed.")
 
-            # Check option
-            import json
-            opts = json.loads(bet['options'])
-            if option not in opts: return await ctx.send(f"Invalid option. Choices: {', '.join(opts)}")
+        # Check option
+        opts = json.loads(bet['options'])
+        if option not in opts: return await ctx.send(f"Invalid option. Choices: {', '.join(opts)}")
 
+        async with db_manager.write() as db:
             # Deduct
-            await self.update_balance(ctx.author.id, -amount)
+            placed = await self.debit(ctx.author.id, amount, "bet_place") is not None
 
             # Record
-            await db.execute("INSERT INTO bet_entries (bet_id, user_id, option, amount) VALUES (?, ?, ?, ?)",
-                             (bet_id, ctx.author.id, option, amount))
-            await db.commit()
+            if placed:
+                await db.run("bets.add_entry", (bet_id, ctx.author.id, option, amount))
+                await db.commit()
 
+        if not placed: return await ctx.send("Insufficient funds.")
         await ctx.send(f"Placed {amount} on {option} for Bet #{bet_id}.")
 
     @bet.command(name="resolve", description="Resolve a bet and distribute winnings (Admin)")
     @commands.has_permissions(administrator=True)
     async def bet_resolve(self, ctx, bet_id: int, winning_option: str):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM active_bets WHERE id = ?", (bet_id,)) as cursor:
-                bet = await cursor.fetchone()
-
-            if not bet or bet['status'] != 'OPEN': return await ctx.send("Invalid bet.")
+        async with db_manager.write() as db:
+            # Close the bet first; a second resolve finds it closed and pays nothing
+            resolved = await db.fetchval("bets.resolve", (winning_option, bet_id)) is not None
+            if resolved:
+                # Get winners
+                entries = await db.fetchall("bets.entries", (bet_id,))
+
+                total_pool = sum(e['amount'] for e in entries)
+                winners = [e for e in entries if e['option'] == winning_option]
+                winning_pool = sum(e['amount'] for e in winners)
+
+                if winning_pool == 0:
+                    # House wins? Or refund? Let's refund everyone if no one won?
+                    # Or house keeps. Let's say house keeps.
+                    pass
+                else:
+                    # Distribute, all winners in one batch
+                    await self.settle(
+                        [(w['user_id'], int(total_pool * w['amount'] / winning_pool)) for w in winners],
+                        "bet_payout"
+                    )
 
-            # Get winners
-            async with db.execute("SELECT * FROM bet_entries WHERE bet_id = ?", (bet_id,)) as cursor:
-                entries = await cursor.fetchall()
-
-            total_pool = sum(e['amount'] for e in entries)
-            winners = [e for e in entries if e['option'] == winning_option]
-            winning_pool = sum(e['amount'] for e in winners)
+                await db.commit()
 
-            if winning_pool == 0:
-                # House wins? Or refund? Let's refund everyone if no one won?
-                # Or house keeps. Let's say house keeps.
-                await ctx.send(f"No one bet on {winning_option}. Pot lost.")
-            else:
-                # Distribute
-                for w in winners:
-                    share = w['amount'] / winning_pool
-                    payout = int(total_pool * share)
-                    await self.update_balance(w['user_id'], payout)
+        if not resolved: return await ctx.send("Invalid bet.")
 
-            await db.execute("UPDATE active_bets SET status = 'RESOLVED', winning_option = ? WHERE id = ?", (winning_option, bet_id))
-            await db.commit()
+        if winning_pool == 0:
+            await ctx.send(f"No one bet on {winning_option}. Pot lost.")
 
         await ctx.send(f"Bet #{bet_id} resolved! Winner: {winning_option}. Pool: {total_pool}.")
 
@@ -346,7 +552,7 @@ class Economy(commands.Cog):
         if amount <= 0:
             return await ctx.send("Amount must be positive.", ephemeral=True)
 
-        new_bal = await self.update_balance(user.id, amount)
+        new_bal = await self.credit(user.id, amount, "admin_add")
         await ctx.send(f"✅ Added {amount} coins to {user.mention}. New Balance: {new_bal}")
 
     @commands.hybrid_command(name="remove_money", description="Remove coins from a user (Admin Only)")
@@ -355,12 +561,10 @@ class Economy(commands.Cog):
         if amount <= 0:
             return await ctx.send("Amount must be positive.", ephemeral=True)
 
-        # Check balance first
-        current = await self.get_balance(user.id)
-        if current < amount:
+        new_bal = await self.debit(user.id, amount, "admin_remove")
+        if new_bal is None:
+            current = await self.get_balance(user.id)
             return await ctx.send(f"User only has {current} coins.", ephemeral=True)
-
-        new_bal = await self.update_balance(user.id, -amount)
         await ctx.send(f"✅ Removed {amount} coins from {user.mention}. New Balance: {new_bal}")
 
     @commands.hybrid_command(name="pay", description="Give money to another user")
@@ -370,14 +574,10 @@ class Economy(commands.Cog):
         if amount <= 0:
             return await ctx.send("Amount must be positive.", ephemeral=True)
 
-        # Check sender balance
-        sender_bal = await self.get_balance(ctx.author.id)
-        if sender_bal < amount:
-            return await ctx.send(f"Insufficient funds. You have {sender_bal} coins.", ephemeral=True)
-
         # Transfer
-        await self.update_balance(ctx.author.id, -amount)
-        await self.update_balance(user.id, amount)
+        if await self.transfer(ctx.author.id, user.id, amount, "pay") is None:
+            sender_bal = await self.get_balance(ctx.author.id)
+            return await ctx.send(f"Insufficient funds. You have {sender_bal} coins.", ephemeral=True)
 
         await ctx.send(f"💸 {ctx.author.mention} paid {amount} coins to {user.mention}!")
 
@@ -393,23 +593,18 @@ class Economy(commands.Cog):
         if amount <= 0:
             return await ctx.send("Amount must be positive.", ephemeral=True)
 
-        # Check Challenger Balance
-        bal = await self.get_balance(ctx.author.id)
-        if bal < amount:
-            return await ctx.send(f"Insufficient funds. You have {bal} coins.", ephemeral=True)
-
         # Create Pending Bet in DB
-        # We put Challenger's money in escrow NOW?
-        # Plan says "Amount is deducted from A (Escrow)".
-        await self.update_balance(ctx.author.id, -amount)
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            cursor = await db.execute("""
-                INSERT INTO pvp_bets (guild_id, challenger_id, opponent_id, amount, status)
-                VALUES (?, ?, ?, ?, 'PENDING')
-            """, (ctx.guild.id, ctx.author.id, opponent.id, amount))
-            bet_id = cursor.lastrowid
-            await db.commit()
+        # Challenger's money goes into escrow in the same transaction
+        bet_id = None
+        async with db_manager.write() as db:
+            if await self.debit(ctx.author.id, amount, "wager_escrow", counterparty_id=opponent.id) is not None:
+                cursor = await db.run("pvp.create", (ctx.guild.id, ctx.author.id, opponent.id, amount))
+                bet_id = cursor.lastrowid
+                await db.commit()
+
+        if bet_id is None:
+            bal = await self.get_balance(ctx.author.id)
+            return await ctx.send(f"Insufficient funds. You have {bal} coins.", ephemeral=True)
 
         # Send Challenge
         embed = discord.Embed(title="⚔️ Wager Challenge", description=f"{ctx.author.mention} challenges {opponent.mention} to a wager of **{amount}** coins!", color=discord.Color.red())
@@ -419,34 +614,27 @@ class Economy(commands.Cog):
 
     @wager.command(name="cancel", description="Cancel a pending wager (Refund)")
     async def wager_cancel(self, ctx):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
+        async with db_manager.write() as db:
             # Find the most recent pending bet by this user
-            async with db.execute("SELECT * FROM pvp_bets WHERE challenger_id = ? AND status = 'PENDING' ORDER BY id DESC LIMIT 1", (ctx.author.id,)) as cursor:
-                bet = await cursor.fetchone()
+            bet = await db.fetchone("pvp.pending_by_challenger", (ctx.author.id,))
 
-            if not bet:
-                return await ctx.send("You have no pending wagers to cancel.", ephemeral=True)
+            if bet:
+                # Refund
+                await self.credit(ctx.author.id, bet['amount'], "wager_refund")
 
-            # Refund
-            await self.update_balance(ctx.author.id, bet['amount'])
+                # Delete
+                await db.run("pvp.delete", (bet['id'],))
+                await db.commit()
 
-            # Delete
-            await db.execute("DELETE FROM pvp_bets WHERE id = ?", (bet['id'],))
-            await db.commit()
+        if not bet:
+            return await ctx.send("You have no pending wagers to cancel.", ephemeral=True)
 
         await ctx.send(f"✅ Wager #{bet['id']} cancelled. Refunded {bet['amount']} coins.")
 
     @wager.command(name="resolve", description="Resolve an active wager")
     async def wager_resolve(self, ctx):
         # Find active bets for this user
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM pvp_bets
-                WHERE (challenger_id = ? OR opponent_id = ?) AND status = 'ACTIVE'
-            """, (ctx.author.id, ctx.author.id)) as cursor:
-                bets = await cursor.fetchall()
+        bets = await db_manager.fetchall("pvp.active_for_user", (ctx.author.id, ctx.author.id))
 
         if not bets:
             return await ctx.send("You have no active wagers.", ephemeral=True)
@@ -487,16 +675,15 @@ class WagerAcceptView(View):
         if interaction.user.id != self.opponent_id:
             return await interaction.response.send_message("Not your challenge.", ephemeral=True)
 
-        # Check Opponent Balance
-        bal = await self.cog.get_balance(self.opponent_id)
-        if bal < self.amount:
-            return await interaction.response.send_message("Insufficient funds to accept.", ephemeral=True)
-
-        await self.cog.update_balance(self.opponent_id, -self.amount)
+        # Opponent's stake goes into escrow with the status change
+        async with db_manager.write() as db:
+            accepted = await self.cog.debit(self.opponent_id, self.amount, "wager_escrow", counterparty_id=self.challenger_id) is not None
+            if accepted:
+                await db.run("pvp.activate", (self.bet_id,))
+                await db.commit()
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("UPDATE pvp_bets SET status = 'ACTIVE' WHERE id = ?", (self.bet_id,))
-            await db.commit()
+        if not accepted:
+            return await interaction.response.send_message("Insufficient funds to accept.", ephemeral=True)
 
         embed = discord.Embed(title="⚔️ Wager Accepted!", description=f"Bet #{self.bet_id} is LIVE! Pot: {self.amount * 2}\nUse `/wager resolve` to declare the winner.", color=discord.Color.green())
         await interaction.response.edit_message(embed=embed, view=None)
@@ -508,22 +695,16 @@ class WagerAcceptView(View):
             return await interaction.response.send_message("Not your challenge.", ephemeral=True)
 
         # Refund Challenger
-        await self.cog.update_balance(self.challenger_id, self.amount)
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("DELETE FROM pvp_bets WHERE id = ?", (self.bet_id,))
-            await db.commit()
+        await self.cog.credit(self.challenger_id, self.amount, "wager_refund")
+        await db_manager.run("pvp.delete", (self.bet_id,))
 
         await interaction.response.edit_message(content="Wager declined/cancelled. Refunded.", embed=None, view=None)
         self.stop()
 
     async def on_timeout(self):
         # Refund Challenger on Timeout
-        await self.cog.update_balance(self.challenger_id, self.amount)
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("DELETE FROM pvp_bets WHERE id = ?", (self.bet_id,))
-            await db.commit()
+        await self.cog.credit(self.challenger_id, self.amount, "wager_refund")
+        await db_manager.run("pvp.delete", (self.bet_id,))
 
         if self.message:
             try:
@@ -540,16 +721,14 @@ class WagerResolveView(View):
         self.amount = amount
 
     async def register_vote(self, interaction, voter_id, winner_id):
-        col = "challenger_vote" if voter_id == self.c_id else "opponent_vote"
+        vote = "pvp.challenger_vote" if voter_id == self.c_id else "pvp.opponent_vote"
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute(f"UPDATE pvp_bets SET {col} = ? WHERE id = ?", (winner_id, self.bet_id))
+        async with db_manager.write() as db:
+            await db.run(vote, (winner_id, self.bet_id))
             await db.commit()
 
             # Check if both voted
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM pvp_bets WHERE id = ?", (self.bet_id,)) as cursor:
-                bet = await cursor.fetchone()
+            bet = await db.fetchone("pvp.get", (self.bet_id,))
 
         if bet['challenger_vote'] is not None and bet['opponent_vote'] is not None:
             # Resolution
@@ -559,23 +738,18 @@ class WagerResolveView(View):
                 # Match
                 winner_id = bet['challenger_vote']
                 pot = self.amount * 2
-                await econ.update_balance(winner_id, pot)
-
-                async with aiosqlite.connect("bot_data.db") as db:
-                    await db.execute("UPDATE pvp_bets SET status = 'RESOLVED', winner_id = ? WHERE id = ?", (winner_id, self.bet_id))
-                    await db.commit()
+                async with db_manager.write() as db:
+                    await econ.settle([(winner_id, pot)], "wager_payout")
+                    await db.run("pvp.resolve", (winner_id, self.bet_id))
 
                 winner = interaction.guild.get_member(winner_id)
                 await interaction.channel.send(f"🏆 **Wager #{self.bet_id} Resolved!**\nWinner: {winner.mention if winner else winner_id}\nPayout: {pot} coins!")
 
             else:
                 # Mismatch -> Void
-                await econ.update_balance(self.c_id, self.amount)
-                await econ.update_balance(self.o_id, self.amount)
-
-                async with aiosqlite.connect("bot_data.db") as db:
-                    await db.execute("UPDATE pvp_bets SET status = 'VOID' WHERE id = ?", (self.bet_id,))
-                    await db.commit()
+                async with db_manager.write() as db:
+                    await econ.settle([(self.c_id, self.amount), (self.o_id, self.amount)], "wager_refund")
+                    await db.run("pvp.void", (self.bet_id,))
 
                 await interaction.channel.send(f"❌ **Wager #{self.bet_id} Dispute!**\nPlayers selected different winners.\nBet VOIDED and refunded.")
 
@@ -0,0 +1,110 @@
+# Mirrors each guild's (non-bot) member list into guild_members.
+# Per-guild queries over global tables, like the richest-members board, join
+# against it instead of sending every member id to SQLite. Joins and leaves
+# keep it current; at startup (and when the bot joins a guild) the table is
+# diffed against the member cache and fixed up in batches.
+
+import asyncio
+import os
+import time
+from discord.ext import commands, tasks
+from dotenv import load_dotenv
+from database import db_manager
+import logger
+
+load_dotenv()
+
+# Rows written per transaction during a sync; the writer is released between batches
+MEMBER_SYNC_BATCH = int(os.getenv("MEMBER_SYNC_BATCH", "1000"))
+
+class GuildMembers(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # Metrics
+        self.synced_guilds = 0
+        self.added = 0
+        self.removed = 0
+        self.last_sync_at = None
+        self.last_sync_ms = 0.0
+
+    async def cog_load(self):
+        self.startup_sync.start()
+
+    async def cog_unload(self):
+        self.startup_sync.cancel()
+
+    async def _write_batches(self, name, rows, batch_size):
+        for i in range(0, len(rows), batch_size):
+            async with db_manager.write() as db:
+                await db.run_many(name, rows[i:i + batch_size])
+            await asyncio.sleep(0)  # Let other writers in between batches
+
+    async def sync_guild(self, guild, batch_size=MEMBER_SYNC_BATCH):
+        """Bring one guild's rows in line with its member cache. Returns (added, removed)."""
+        current = {m.id for m in guild.members if not m.bot}
+        stored = {row[0] for row in await db_manager.fetchall("members.ids_for_guild", (guild.id,))}
+
+        added = [(guild.id, user_id) for user_id in current - stored]
+        # A partial member cache would look like mass leaves; only prune complete ones
+        removed = [(guild.id, user_id) for user_id in stored - current] if guild.chunked else []
+
+        await self._write_batches("members.add_many", added, batch_size)
+        await self._write_batches("members.remove", removed, batch_size)
+        self.added += len(added)
+        self.removed += len(removed)
+        self.synced_guilds += 1
+        return len(added), len(removed)
+
+    @tasks.loop(count=1)
+    async def startup_sync(self):
+        start = time.perf_counter()
+        added = removed = 0
+        for guild in self.bot.guilds:
+            try:
+                a, r = await self.sync_guild(guild)
+                added += a
+                removed += r
+            except Exception as e:
+                logger.error(f"Member sync failed for guild {guild.id}: {e}")
+        self.last_sync_at = time.time()
+        self.last_sync_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Member sync: {len(self.bot.guilds)} guilds, +{added} / -{removed} rows in {self.last_sync_ms:.0f} ms.")
+
+    @startup_sync.before_loop
+    async def before_startup_sync(self):
+        # Guilds are chunked before the bot reports ready
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if member.bot: return
+        await db_manager.run("members.add_many", (member.guild.id, member.id))
+        self.added += 1
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        if member.bot: return
+        await db_manager.run("members.remove", (member.guild.id, member.id))
+        self.removed += 1
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        if not guild.chunked:
+            await guild.chunk()
+        await self.sync_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        await db_manager.run("members.remove_guild", (guild.id,))
+
+    def stats(self):
+        return {
+            "synced_guilds": self.synced_guilds,
+            "added": self.added,
+            "removed": self.removed,
+            "last_sync_at": self.last_sync_at,
+            "last_sync_ms": self.last_sync_ms,
+        }
+
+async def setup(bot):
+    await bot.add_cog(GuildMembers(bot))
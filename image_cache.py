@@ -0,0 +1,396 @@
+# Image caches for rank cards.
+# ImageCache (backgrounds) has two tiers:
+# Memory: card-ready pixels (cropped and resized by card_renderer), keyed by the
+# image's content digest plus the crop, bounded by bytes.
+# Disk: original downloads stored by SHA-256, with an index of url -> digest and
+# the server's ETag/Last-Modified, so a stale entry is revalidated with a
+# conditional GET instead of being downloaded again.
+# AvatarCache keeps circle-cut avatars in memory, keyed by Discord's avatar hash.
+# CardCache keeps finished PNGs, reused while nothing visible on the card changed.
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+import aiohttp
+from dotenv import load_dotenv
+from caching import LRUCache
+from card_renderer import RenderBusy
+import logger
+
+load_dotenv()
+
+MB = 1024 * 1024
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join("cache", "images"))
+IMAGE_CACHE_MEMORY_MB = float(os.getenv("IMAGE_CACHE_MEMORY_MB", "64"))
+IMAGE_CACHE_DISK_MB = float(os.getenv("IMAGE_CACHE_DISK_MB", "256"))
+# Hours a download is trusted before it is revalidated with the server
+IMAGE_CACHE_MAX_AGE_HOURS = float(os.getenv("IMAGE_CACHE_MAX_AGE_HOURS", "24"))
+# Images larger than this are refused
+IMAGE_MAX_DOWNLOAD_MB = float(os.getenv("IMAGE_MAX_DOWNLOAD_MB", "8"))
+
+AVATAR_CACHE_MEMORY_MB = float(os.getenv("AVATAR_CACHE_MEMORY_MB", "16"))
+# Avatars are requested at this size from the CDN; cards draw them at 150px
+AVATAR_FETCH_SIZE = 256
+# Hourly, warm avatars of the top N users by XP in each guild (0 = off)
+AVATAR_PREFETCH_TOP = int(os.getenv("AVATAR_PREFETCH_TOP", "10"))
+
+CARD_CACHE_MEMORY_MB = float(os.getenv("CARD_CACHE_MEMORY_MB", "32"))
+
+class ImageFetchError(Exception):
+    """The image could not be downloaded (bad status, too large)."""
+
+class ImageCache:
+    def __init__(self, renderer, directory=IMAGE_CACHE_DIR):
+        self.renderer = renderer
+        self.directory = directory
+        self.disk_bytes = int(IMAGE_CACHE_DISK_MB * MB)
+        self.max_age = IMAGE_CACHE_MAX_AGE_HOURS * 3600
+        self.max_download = int(IMAGE_MAX_DOWNLOAD_MB * MB)
+        self.memory = LRUCache(int(IMAGE_CACHE_MEMORY_MB * MB))
+        # url -> {"digest", "size", "etag", "last_modified", "checked_at", "used_at"}
+        self._index = {}
+        self._index_lock = asyncio.Lock()
+        self._fetch_locks = {}  # url -> Lock, so concurrent /rank calls share one download
+        self._session = None
+
+        # Metrics
+        self.disk_hits = 0
+        self.downloads = 0
+        self.download_bytes = 0
+        self.revalidated = 0
+        self.stale_served = 0
+
+    # --- Disk tier ---
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, "index.json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.img")
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {url: meta for url, meta in index.items() if os.path.exists(self._blob_path(meta["digest"]))}
+
+    def _write_index(self, payload):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.index_path)
+
+    def _read_blob(self, digest):
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_blob(self, digest, data):
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_blobs(self, digests):
+        for digest in digests:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError as e:
+                logger.error(f"Could not remove cached image {digest}: {e}")
+
+    def disk_usage(self):
+        return sum({meta["digest"]: meta["size"] for meta in self._index.values()}.values())
+
+    async def load(self):
+        self._index = await asyncio.to_thread(self._read_index)
+        if self._index:
+            logger.info(f"Image cache: {len(self._index)} backgrounds on disk ({self.disk_usage() / MB:.1f} MB).")
+
+    async def _save_index(self):
+        async with self._index_lock:
+            await asyncio.to_thread(self._write_index, json.dumps(self._index))
+
+    async def _evict_disk(self):
+        """Drop least recently used urls until the originals fit in IMAGE_CACHE_DISK_MB."""
+        usage = self.disk_usage()
+        if usage <= self.disk_bytes:
+            return
+        refs = Counter(meta["digest"] for meta in self._index.values())
+        removed = []
+        for url in sorted(self._index, key=lambda u: self._index[u]["used_at"]):
+            if usage <= self.disk_bytes:
+                break
+            meta = self._index.pop(url)
+            refs[meta["digest"]] -= 1
+            if refs[meta["digest"]] == 0:
+                usage -= meta["size"]
+                removed.append(meta["digest"])
+        await asyncio.to_thread(self._remove_blobs, removed)
+
+    async def store(self, url, data, etag=None, last_modified=None):
+        """Save original bytes for url on disk. Returns the content digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write_blob, digest, data)
+        now = time.time()
+        self._index[url] = {
+            "digest": digest, "size": len(data),
+            "etag": etag, "last_modified": last_modified,
+            "checked_at": now, "used_at": now,
+        }
+        await self._evict_disk()
+        await self._save_index()
+        return digest
+
+    # --- Network ---
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        return self._session
+
+    async def _download(self, url, meta=None):
+        """GET url, conditional on meta's validators. Returns (status, body, headers); body is None on 304."""
+        headers = {}
+        if meta:
+            if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+
+        async with self._get_session().get(url, headers=headers) as resp:
+            if resp.status == 304 and meta:
+                return 304, None, resp.headers
+            if resp.status != 200:
+                raise ImageFetchError(f"HTTP {resp.status}")
+            if resp.content_length and resp.content_length > self.max_download:
+                raise ImageFetchError(f"Image is larger than {self.max_download / MB:g} MB")
+
+            body = bytearray()
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                body += chunk
+                if len(body) > self.max_download:
+                    raise ImageFetchError(f"Image is larger than {self.max_download / MB:g} MB")
+            return resp.status, bytes(body), resp.headers
+
+    async def fetch(self, url):
+        """Original bytes of url, from disk when fresh. Returns (data, digest)."""
+        lock = self._fetch_locks.setdefault(url, asyncio.Lock())
+        try:
+            async with lock:
+                return await self._fetch(url)
+        finally:
+            if not lock.locked():
+                self._fetch_locks.pop(url, None)
+
+    async def _fetch(self, url):
+        now = time.time()
+        meta = self._index.get(url)
+        data = await asyncio.to_thread(self._read_blob, meta["digest"]) if meta else None
+        if data is not None and now - meta["checked_at"] < self.max_age:
+            self.disk_hits += 1
+            meta["used_at"] = now
+            return data, meta["digest"]
+
+        try:
+            status, body, headers = await self._download(url, meta if data is not None else None)
+        except Exception as e:
+            if data is None:
+                raise
+            # Server unreachable or changed its mind: keep serving the copy we have
+            logger.warning(f"Revalidating {url} failed ({e}), using cached copy.")
+            self.stale_served += 1
+            return data, meta["digest"]
+
+        if status == 304:
+            self.revalidated += 1
+            meta["checked_at"] = meta["used_at"] = now
+            await self._save_index()
+            return data, meta["digest"]
+
+        self.downloads += 1
+        self.download_bytes += len(body)
+        digest = await self.store(url, body, headers.get("ETag"), headers.get("Last-Modified"))
+        return body, digest
+
+    # --- Card backgrounds ---
+
+    def digest_for(self, url):
+        """Content digest currently cached for url, or None."""
+        meta = self._index.get(url)
+        return meta["digest"] if meta else None
+
+    async def background(self, url, crop_x=0, crop_y=0, crop_w=0):
+        """Card-ready RGBA pixels for url and crop (see card_renderer.prepare_background)."""
+        meta = self._index.get(url)
+        if meta and time.time() - meta["checked_at"] < self.max_age:
+            pixels = self.memory.get((meta["digest"], crop_x, crop_y, crop_w))
+            if pixels is not None:
+                meta["used_at"] = time.time()
+                return pixels
+
+        data, digest = await self.fetch(url)
+        key = (digest, crop_x, crop_y, crop_w)
+        # Revalidation may have confirmed the image we already prepared
+        if key in self.memory:
+            return self.memory.get(key)
+
+        pixels = await self.renderer.prepare_background(data, crop_x, crop_y, crop_w)
+        self.memory.put(key, pixels)
+        return pixels
+
+    async def warm(self, url, data, crop_x=0, crop_y=0, crop_w=0):
+        """Seed both tiers with an image the caller already has, so the next card needs no network."""
+        digest = hashlib.sha256(data).hexdigest()
+        meta = self._index.get(url)
+        if not meta or meta["digest"] != digest:
+            await self.store(url, data)
+        pixels = await self.renderer.prepare_background(data, crop_x, crop_y, crop_w)
+        self.memory.put((digest, crop_x, crop_y, crop_w), pixels)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._index:
+            # used_at is only kept in memory between saves
+            await self._save_index()
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "disk_entries": len(self._index),
+            "disk_bytes": self.disk_usage(),
+            "disk_max_bytes": self.disk_bytes,
+            "disk_hits": self.disk_hits,
+            "downloads": self.downloads,
+            "download_bytes": self.download_bytes,
+            "revalidated": self.revalidated,
+            "stale_served": self.stale_served,
+        }
+
+class AvatarCache:
+    """
+    Circle-cut 150x150 avatars keyed by Asset.key (the avatar hash).
+    A changed avatar has a new hash and simply misses; Leveling's user/member
+    listeners drop the old entry so it doesn't sit in memory until evicted.
+    """
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.memory = LRUCache(int(AVATAR_CACHE_MEMORY_MB * MB))
+        self._fetch_locks = {}  # avatar key -> Lock, one download per avatar
+        # Metrics
+        self.fetches = 0
+        self.prefetched = 0
+        self.invalidated = 0
+
+    async def get(self, asset):
+        """Card-ready RGBA pixels for an avatar Asset (see card_renderer.prepare_avatar)."""
+        pixels = self.memory.get(asset.key)
+        if pixels is not None:
+            return pixels
+
+        lock = self._fetch_locks.setdefault(asset.key, asyncio.Lock())
+        try:
+            async with lock:
+                # Someone else may have loaded it while we waited
+                if asset.key in self.memory:
+                    return self.memory.get(asset.key)
+                data = await asset.with_size(AVATAR_FETCH_SIZE).read()
+                self.fetches += 1
+                pixels = await self.renderer.prepare_avatar(data)
+                self.memory.put(asset.key, pixels)
+                return pixels
+        finally:
+            if not lock.locked():
+                self._fetch_locks.pop(asset.key, None)
+
+    def invalidate(self, key):
+        if self.memory.pop(key) is not None:
+            self.invalidated += 1
+
+    async def prefetch(self, members):
+        """Load avatars that aren't cached yet, a few at a time. Returns how many were loaded."""
+        assets = {}
+        for member in members:
+            asset = member.display_avatar
+            if asset.key not in self.memory:
+                assets[asset.key] = asset
+        pending = list(assets.values())
+
+        loaded = 0
+        # One batch per render worker, so /rank never queues behind a prefetch
+        batch_size = self.renderer.workers
+        for i in range(0, len(pending), batch_size):
+            results = await asyncio.gather(*(self.get(asset) for asset in pending[i:i + batch_size]), return_exceptions=True)
+            loaded += sum(1 for result in results if isinstance(result, bytes))
+            if any(isinstance(result, RenderBusy) for result in results):
+                break  # Cards are busy being drawn; try again next round
+        self.prefetched += loaded
+        return loaded
+
+    def stats(self):
+        return {
+            "memory": self.memory.stats(),
+            "fetches": self.fetches,
+            "prefetched": self.prefetched,
+            "invalidated": self.invalidated,
+        }
+
+class CardCache:
+    """
+    Encoded rank cards, one per (guild, user). An entry is only served while
+    the fingerprint of everything drawn on the card (name, XP, rank, settings,
+    avatar hash, background) matches, so any change re-renders.
+    """
+    def __init__(self):
+        self.memory = LRUCache(int(CARD_CACHE_MEMORY_MB * MB), sizeof=lambda entry: len(entry[1]))
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def fingerprint(*parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def get(self, guild_id, user_id, fingerprint):
+        entry = self.memory.get((guild_id, user_id))
+        if entry is not None and entry[0] == fingerprint:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, guild_id, user_id, fingerprint, png):
+        self.memory.put((guild_id, user_id), (fingerprint, png))
+
+    def invalidate_user(self, user_id):
+        """Drop a user's cards in every guild (their card settings are global)."""
+        for key in self.memory.keys():
+            if key[1] == user_id:
+                self.memory.pop(key)
+                self.invalidated += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "bytes": self.memory.bytes,
+            "max_bytes": self.memory.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "invalidated": self.invalidated,
+        }
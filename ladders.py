@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from discord.ui import View, Button, Select
-import aiosqlite
+from database import db_manager
 import asyncio
 from config_manager import config_manager
 
@@ -10,16 +10,10 @@ class LadderSystem(commands.Cog):
         self.bot = bot
 
     async def get_ladder(self, guild_id, name):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM ladders WHERE guild_id = ? AND lower(name) = ?", (guild_id, name.lower())) as cursor:
-                return await cursor.fetchone()
+        return await db_manager.fetchone("ladders.find", (guild_id, name.lower()))
 
     async def get_player(self, ladder_id, user_id):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM ladder_players WHERE ladder_id = ? AND user_id = ?", (ladder_id, user_id)) as cursor:
-                return await cursor.fetchone()
+        return await db_manager.fetchone("ladders.player", (ladder_id, user_id))
 
     @commands.hybrid_group(name="ladder", description="Competitive Ladder System")
     async def ladder(self, ctx):
@@ -32,9 +26,7 @@ class LadderSystem(commands.Cog):
             return await ctx.send("Admin only.", ephemeral=True)
 
         try:
-            async with aiosqlite.connect("bot_data.db") as db:
-                await db.execute("INSERT INTO ladders (guild_id, name) VALUES (?, ?)", (ctx.guild.id, name))
-                await db.commit()
+            await db_manager.run("ladders.create", (ctx.guild.id, name))
             await ctx.send(f"✅ Ladder **{name}** created!", ephemeral=True)
         except Exception:
             await ctx.send(f"Ladder **{name}** likely already exists.", ephemeral=True)
@@ -44,23 +36,18 @@ class LadderSystem(commands.Cog):
         ladder = await self.get_ladder(ctx.guild.id, name)
         if not ladder: return await ctx.send("Ladder not found.", ephemeral=True)
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            try:
-                await db.execute("INSERT INTO ladder_players (ladder_id, user_id) VALUES (?, ?)", (ladder['id'], ctx.author.id))
-                await db.commit()
-                await ctx.send(f"✅ Joined **{ladder['name']}**!", ephemeral=True)
-            except:
-                await ctx.send("You are already in this ladder.", ephemeral=True)
+        try:
+            await db_manager.run("ladders.join", (ladder['id'], ctx.author.id))
+            await ctx.send(f"✅ Joined **{ladder['name']}**!", ephemeral=True)
+        except:
+            await ctx.send("You are already in this ladder.", ephemeral=True)
 
     @ladder.command(name="leaderboard", description="View ladder rankings")
     async def leaderboard(self, ctx, name: str):
         ladder = await self.get_ladder(ctx.guild.id, name)
         if not ladder: return await ctx.send("Ladder not found.", ephemeral=True)
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM ladder_players WHERE ladder_id = ? ORDER BY elo DESC LIMIT 10", (ladder['id'],)) as cursor:
-                players = await cursor.fetchall()
+        players = await db_manager.fetchall("ladders.top", (ladder['id'],))
 
         embed = discord.Embed(title=f"🏆 {ladder['name']} Leaderboard", color=discord.Color.gold())
         for i, p in enumerate(players, 1):
@@ -87,19 +74,14 @@ class LadderSystem(commands.Cog):
         # Wager Logic
         if wager > 0:
             econ = self.bot.get_cog("Economy")
-            bal = await econ.get_balance(ctx.author.id)
-            if bal < wager: return await ctx.send(f"Insufficient funds. You have {bal}.", ephemeral=True)
             # Deduct Escrow
-            await econ.update_balance(ctx.author.id, -wager)
+            if await econ.debit(ctx.author.id, wager, "ladder_escrow", counterparty_id=opponent.id) is None:
+                bal = await econ.get_balance(ctx.author.id)
+                return await ctx.send(f"Insufficient funds. You have {bal}.", ephemeral=True)
 
         # Create Match
-        async with aiosqlite.connect("bot_data.db") as db:
-            cursor = await db.execute("""
-                INSERT INTO ladder_matches (ladder_id, p1_id, p2_id, wager, status)
-                VALUES (?, ?, ?, ?, 'PENDING')
-            """, (ladder['id'], ctx.author.id, opponent.id, wager))
-            match_id = cursor.lastrowid
-            await db.commit()
+        cursor = await db_manager.run("ladders.create_match", (ladder['id'], ctx.author.id, opponent.id, wager))
+        match_id = cursor.lastrowid
 
         embed = discord.Embed(title="⚔️ Ranked Challenge", description=f"{ctx.author.mention} challenges {opponent.mention} in **{ladder_name}**!\nWager: {wager}", color=discord.Color.red())
         view = ChallengeView(match_id, opponent.id, wager, ctx.author.id, self.bot)
@@ -108,13 +90,7 @@ class LadderSystem(commands.Cog):
     @ladder.command(name="report", description="Report match result")
     async def report(self, ctx):
         # Find active match
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM ladder_matches
-                WHERE (p1_id = ? OR p2_id = ?) AND status IN ('ACTIVE', 'REPORTED')
-            """, (ctx.author.id, ctx.author.id)) as cursor:
-                match = await cursor.fetchone()
+        match = await db_manager.fetchone("ladders.active_match", (ctx.author.id, ctx.author.id))
 
         if not match: return await ctx.send("No active ranked match found.", ephemeral=True)
 
@@ -139,14 +115,10 @@ class ChallengeView(View):
         # Check balance if wager
         if self.wager > 0:
             econ = self.bot.get_cog("Economy")
-            bal = await econ.get_balance(self.target_id)
-            if bal < self.wager:
+            if await econ.debit(self.target_id, self.wager, "ladder_escrow", counterparty_id=self.challenger_id) is None:
                 return await interaction.response.send_message("Insufficient funds.", ephemeral=True)
-            await econ.update_balance(self.target_id, -self.wager)
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("UPDATE ladder_matches SET status = 'ACTIVE' WHERE id = ?", (self.match_id,))
-            await db.commit()
+        await db_manager.run("ladders.accept_match", (self.match_id,))
 
         await interaction.response.edit_message(content="✅ Challenge Accepted! Match is LIVE. Use `/ladder report` after playing.", embed=None, view=None)
         self.stop()
@@ -158,11 +130,9 @@ class ChallengeView(View):
         # Refund Challenger
         if self.wager > 0:
             econ = self.bot.get_cog("Economy")
-            await econ.update_balance(self.challenger_id, self.wager)
+            await econ.credit(self.challenger_id, self.wager, "ladder_refund")
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("DELETE FROM ladder_matches WHERE id = ?", (self.match_id,))
-            await db.commit()
+        await db_manager.run("ladders.delete_match", (self.match_id,))
 
         await interaction.response.edit_message(content="❌ Challenge Declined.", embed=None, view=None)
         self.stop()
@@ -186,16 +156,14 @@ class ReportView(View):
         # Store Actual User ID of Winner in report column?
         # Let's say p1_report stores ID of who P1 thinks won.
 
-        col = "p1_report" if is_p1 else "p2_report"
+        report = "ladders.p1_report" if is_p1 else "ladders.p2_report"
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute(f"UPDATE ladder_matches SET {col} = ?, status = 'REPORTED' WHERE id = ?", (winner_id, self.match_id))
+        async with db_manager.write() as db:
+            await db.run(report, (winner_id, self.match_id))
             await db.commit()
 
             # Check for Match
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM ladder_matches WHERE id = ?", (self.match_id,)) as cursor:
-                m = await cursor.fetchone()
+            m = await db.fetchone("ladders.match", (self.match_id,))
 
         if m['p1_report'] and m['p2_report']:
             if m['p1_report'] == m['p2_report']:
@@ -222,20 +190,19 @@ class ReportView(View):
         new_w_elo = p_win['elo'] + delta
         new_l_elo = p_lose['elo'] - delta
 
-        async with aiosqlite.connect("bot_data.db") as db:
+        async with db_manager.write() as db:
             # Update Winner
-            await db.execute("UPDATE ladder_players SET elo = ?, wins = wins + 1 WHERE ladder_id = ? AND user_id = ?", (new_w_elo, match['ladder_id'], winner_id))
+            await db.run("ladders.record_win", (new_w_elo, match['ladder_id'], winner_id))
             # Update Loser
-            await db.execute("UPDATE ladder_players SET elo = ?, losses = losses + 1 WHERE ladder_id = ? AND user_id = ?", (new_l_elo, match['ladder_id'], loser_id))
+            await db.run("ladders.record_loss", (new_l_elo, match['ladder_id'], loser_id))
             # Close Match
-            await db.execute("UPDATE ladder_matches SET status = 'CONFIRMED', winner_id = ? WHERE id = ?", (winner_id, match['id']))
+            await db.run("ladders.confirm_match", (winner_id, match['id']))
+            # Payout, in the same transaction as the result
+            if match['wager'] > 0:
+                econ = self.bot.get_cog("Economy")
+                await econ.settle([(winner_id, match['wager'] * 2)], "ladder_payout")
             await db.commit()
 
-        # Payout
-        if match['wager'] > 0:
-            econ = self.bot.get_cog("Economy")
-            await econ.update_balance(winner_id, match['wager'] * 2)
-
         w_user = interaction.guild.get_member(winner_id)
         await interaction.channel.send(f"🏆 **Match Resolved!**\n{w_user.mention} wins! (+{delta} ELO)")
 
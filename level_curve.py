@@ -0,0 +1,80 @@
+# XP <-> level conversion in closed form, configurable per guild.
+# A guild's curve is a short spec stored in guild_configs.level_curve:
+#   "linear:100"     level L needs 100 * L total XP (the default, the original curve)
+#   "quadratic:50"   level L needs 50 * L^2
+#   "power:100:1.5"  level L needs 100 * L^1.5
+# Parsed curves are cached by spec. level_for is also registered as the SQL
+# function level_for(curve, xp) so a guild can be re-levelled in one UPDATE.
+
+from functools import lru_cache
+
+DEFAULT_CURVE = "linear:100"
+MAX_EXPONENT = 4
+
+class LevelCurve:
+    def __init__(self, spec, factor, exponent):
+        self.spec = spec
+        self.factor = factor
+        self.exponent = exponent
+
+    def __repr__(self):
+        return f"LevelCurve({self.spec!r})"
+
+    def xp_for(self, level):
+        """Total XP needed to reach level."""
+        if level <= 0:
+            return 0
+        return int(self.factor * level ** self.exponent)
+
+    def level_for(self, xp):
+        """Highest level whose xp_for() is <= xp."""
+        if xp < self.xp_for(1):
+            return 0
+        level = int((xp / self.factor) ** (1 / self.exponent))
+        # The float root can land one off either way; step to the exact answer
+        while self.xp_for(level + 1) <= xp:
+            level += 1
+        while level > 0 and self.xp_for(level) > xp:
+            level -= 1
+        return level
+
+    def progress(self, xp):
+        """(level, XP into the level, XP the level spans) for progress bars."""
+        level = self.level_for(xp)
+        start = self.xp_for(level)
+        return level, xp - start, self.xp_for(level + 1) - start
+
+@lru_cache(maxsize=64)
+def parse(spec):
+    """LevelCurve for a spec string. Raises ValueError if it's malformed."""
+    kind, *args = spec.strip().lower().split(":")
+    try:
+        if kind == "linear":
+            factor, exponent = float(args[0]) if args else 100.0, 1.0
+        elif kind == "quadratic":
+            factor, exponent = float(args[0]) if args else 50.0, 2.0
+        elif kind == "power":
+            factor, exponent = float(args[0]), float(args[1])
+        else:
+            raise ValueError(f"Unknown level curve '{kind}' (use linear, quadratic or power)")
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Invalid level curve '{spec}': {e}")
+
+    if factor <= 0 or not 0 < exponent <= MAX_EXPONENT:
+        raise ValueError(f"Invalid level curve '{spec}': XP per level must be positive and the exponent between 0 and {MAX_EXPONENT}")
+    return LevelCurve(spec.strip().lower(), factor, exponent)
+
+def for_config(config):
+    """The guild's curve, or the default when unset or unparseable."""
+    try:
+        return parse(config.level_curve or DEFAULT_CURVE)
+    except ValueError:
+        return parse(DEFAULT_CURVE)
+
+def sql_level_for(spec, xp):
+    """SQL function level_for(curve, xp)."""
+    try:
+        curve = parse(spec or DEFAULT_CURVE)
+    except ValueError:
+        curve = parse(DEFAULT_CURVE)
+    return curve.level_for(xp or 0)
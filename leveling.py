@@ -1,16 +1,33 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import ui
-import aiosqlite
-from PIL import Image, ImageDraw, ImageFont
+from database import db_manager
+from xp_accumulator import XPAccumulator, XP_FLUSH_INTERVAL
+from xp_cooldown import CooldownWheel, XP_COOLDOWN
+from rank_index import RankIndex
+from card_renderer import CardSpec, RenderBusy, RenderService
+from crop_preview import CropProxy
+from image_cache import AvatarCache, CardCache, ImageCache, ImageFetchError, AVATAR_PREFETCH_TOP
+from caching import TTLCache
 import io
+import time
 import requests
-import aiohttp
 from config_manager import config_manager
+import level_curve
 import logger
 
+LEADERBOARD_PAGE_SIZE = 10
+# Seconds a built leaderboard page (names, levels, image) is reused
+LEADERBOARD_CACHE_SECONDS = 30
+
 # --- Views for Settings ---
 
+def card_settings_changed(interaction):
+    """Drop the user's cached rank cards after they change a card setting."""
+    cog = interaction.client.get_cog("Leveling")
+    if cog:
+        cog.cards.invalidate_user(interaction.user.id)
+
 class ColorSelect(ui.Select):
     def __init__(self, target_setting):
         self.target_setting = target_setting # 'card_color' or 'card_bg_color'
@@ -34,12 +51,8 @@ class ColorSelect(ui.Select):
             await self.update_db(interaction, value)
 
     async def update_db(self, interaction, value):
-        async with aiosqlite.connect("bot_data.db") as db:
-             await db.execute(f"""
-                INSERT INTO global_users (user_id, {self.target_setting}) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET {self.target_setting} = ?
-             """, (interaction.user.id, value, value))
-             await db.commit()
+        await db_manager.run(f"profile.set_{self.target_setting}", (interaction.user.id, value))
+        card_settings_changed(interaction)
         await interaction.response.send_message(f"Updated {self.target_setting} to `{value}`!", ephemeral=True)
 
 class HexModal(ui.Modal, title="Enter Hex Color"):
@@ -60,12 +73,8 @@ class HexModal(ui.Modal, title="Enter Hex Color"):
              await interaction.response.send_message("Invalid Hex Code!", ephemeral=True)
              return
 
-        async with aiosqlite.connect("bot_data.db") as db:
-             await db.execute(f"""
-                INSERT INTO global_users (user_id, {self.target_setting}) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET {self.target_setting} = ?
-             """, (interaction.user.id, value, value))
-             await db.commit()
+        await db_manager.run(f"profile.set_{self.target_setting}", (interaction.user.id, value))
+        card_settings_changed(interaction)
         await interaction.response.send_message(f"Updated {self.target_setting} to `{value}`!", ephemeral=True)
 
 class FontSelect(ui.Select):
@@ -79,12 +88,8 @@ class FontSelect(ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         value = self.values[0]
-        async with aiosqlite.connect("bot_data.db") as db:
-             await db.execute("""
-                INSERT INTO global_users (user_id, card_font) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET card_font = ?
-             """, (interaction.user.id, value, value))
-             await db.commit()
+        await db_manager.run("profile.set_card_font", (interaction.user.id, value))
+        card_settings_changed(interaction)
         await interaction.response.send_message(f"Font updated to `{value}`!", ephemeral=True)
 
 class OpacitySelect(ui.Select):
@@ -102,22 +107,20 @@ class OpacitySelect(ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         value = float(self.values[0])
-        async with aiosqlite.connect("bot_data.db") as db:
-             await db.execute("""
-                INSERT INTO global_users (user_id, card_opacity) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET card_opacity = ?
-             """, (interaction.user.id, value, value))
-             await db.commit()
+        await db_manager.run("profile.set_card_opacity", (interaction.user.id, value))
+        card_settings_changed(interaction)
         await interaction.response.send_message(f"Overlay opacity updated to `{int(value*100)}%`!", ephemeral=True)
 
 class CropView(ui.View):
-    def __init__(self, user_id, url, image_bytes):
+    def __init__(self, cog, user_id, url, image_bytes, proxy):
         super().__init__(timeout=300)
+        self.cog = cog
         self.user_id = user_id
         self.url = url
         self.image_bytes = image_bytes
-        self.img = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
-        self.img_w, self.img_h = self.img.size
+        # Previews come from a downscaled proxy; the original is only cropped on Save
+        self.proxy = proxy
+        self.img_w, self.img_h = proxy.size
 
         # Calculate max initial crop
         # Target Ratio 3.6 (900/250)
@@ -140,19 +143,17 @@ class CropView(ui.View):
 
         self.step = 20 # Pixel step for movement
 
-    def get_file(self):
-        # Crop
-        crop_box = (self.crop_x, self.crop_y, self.crop_x + self.crop_w, self.crop_y + self.crop_h)
-        cropped = self.img.crop(crop_box)
-        resized = cropped.resize((900, 250), Image.Resampling.LANCZOS)
+    @classmethod
+    async def create(cls, cog, user_id, url, image_bytes):
+        proxy = await CropProxy.load(image_bytes)
+        return cls(cog, user_id, url, image_bytes, proxy)
 
-        buffer = io.BytesIO()
-        resized.save(buffer, "PNG")
-        buffer.seek(0)
-        return discord.File(buffer, filename="preview.png")
+    async def get_file(self):
+        data = await self.proxy.preview(self.crop_x, self.crop_y, self.crop_w, self.crop_h)
+        return discord.File(io.BytesIO(data), filename="preview.jpg")
 
     async def update_view(self, interaction):
-        f = self.get_file()
+        f = await self.get_file()
         await interaction.response.edit_message(attachments=[f], view=self)
 
     @ui.button(label="Zoom In", style=discord.ButtonStyle.secondary, row=0)
@@ -223,17 +224,16 @@ class CropView(ui.View):
 
     @ui.button(label="Save", style=discord.ButtonStyle.green, row=2)
     async def save(self, interaction: discord.Interaction, button: ui.Button):
-        async with aiosqlite.connect("bot_data.db") as db:
-             await db.execute("""
-                INSERT INTO global_users (user_id, bg_url, bg_crop_x, bg_crop_y, bg_crop_w)
-                VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET
-                bg_url = ?, bg_crop_x = ?, bg_crop_y = ?, bg_crop_w = ?
-             """, (interaction.user.id, self.url, self.crop_x, self.crop_y, self.crop_w,
-                   self.url, self.crop_x, self.crop_y, self.crop_w))
-             await db.commit()
+        await db_manager.run("profile.set_background", (interaction.user.id, self.url, self.crop_x, self.crop_y, self.crop_w))
+        card_settings_changed(interaction)
         await interaction.response.edit_message(content="Background Image Saved!", view=None, attachments=[])
 
+        # Prepare the saved crop now so the next /rank doesn't touch the network
+        try:
+            await self.cog.backgrounds.warm(self.url, self.image_bytes, self.crop_x, self.crop_y, self.crop_w)
+        except Exception as e:
+            logger.warning(f"Could not warm background cache for {self.url}: {e}")
+
     def clamp(self):
         # Ensure crop box is within image bounds
         if self.crop_x < 0: self.crop_x = 0
@@ -244,6 +244,10 @@ class CropView(ui.View):
 class ImageModal(ui.Modal, title="Background Image"):
     url_input = ui.TextInput(label="Image URL", placeholder="https://example.com/image.png")
 
+    def __init__(self, cog):
+        super().__init__()
+        self.cog = cog
+
     async def on_submit(self, interaction: discord.Interaction):
         url = self.url_input.value
         # Simple validation
@@ -254,16 +258,15 @@ class ImageModal(ui.Modal, title="Background Image"):
         await interaction.response.defer(ephemeral=True)
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=10) as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send("Failed to download image. Check the URL.", ephemeral=True)
-                        return
-                    data = await resp.read()
+            try:
+                data, _ = await self.cog.backgrounds.fetch(url)
+            except ImageFetchError:
+                await interaction.followup.send("Failed to download image. Check the URL.", ephemeral=True)
+                return
 
             # Create View
-            view = CropView(interaction.user.id, url, data)
-            f = view.get_file()
+            view = await CropView.create(self.cog, interaction.user.id, url, data)
+            f = await view.get_file()
             await interaction.followup.send("Adjust your background image:", file=f, view=view, ephemeral=True)
 
         except Exception as e:
@@ -280,7 +283,7 @@ class RankSettingsView(ui.View):
 
     @ui.button(label="Set Background Image", style=discord.ButtonStyle.secondary, emoji="🖼️", row=2)
     async def set_bg_image(self, interaction: discord.Interaction, button: ui.Button):
-        await interaction.response.send_modal(ImageModal())
+        await interaction.response.send_modal(ImageModal(self.cog))
 
     @ui.button(label="Show Preview", style=discord.ButtonStyle.primary, emoji="👁️", row=2)
     async def preview(self, interaction: discord.Interaction, button: ui.Button):
@@ -290,63 +293,182 @@ class RankSettingsView(ui.View):
 
     @ui.button(label="Reset to Default", style=discord.ButtonStyle.danger, row=2)
     async def reset(self, interaction: discord.Interaction, button: ui.Button):
-        async with aiosqlite.connect("bot_data.db") as db:
-             await db.execute("""
-                INSERT INTO global_users (user_id, bg_url, card_color, card_bg_color, card_opacity, card_font)
-                VALUES (?, NULL, '#7289da', '#2C2F33', 0.5, 'default')
-                ON CONFLICT(user_id) DO UPDATE SET
-                bg_url=NULL, card_color='#7289da', card_bg_color='#2C2F33', card_opacity=0.5, card_font='default'
-             """, (interaction.user.id,))
-             await db.commit()
+        await db_manager.run("profile.reset_card", (interaction.user.id,))
+        card_settings_changed(interaction)
         await interaction.followup.send("Rank card settings reset to default!", ephemeral=True)
 
+class LeaderboardView(ui.View):
+    def __init__(self, cog, ctx, as_image=False):
+        super().__init__(timeout=180)
+        self.cog = cog
+        self.guild = ctx.guild
+        self.author_id = ctx.author.id
+        self.as_image = as_image
+        self.page = None
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Run /leaderboard to browse it yourself.", ephemeral=True)
+            return False
+        return True
+
+    async def load(self, after=None, before=None):
+        """Fetch a page and build its message. Returns (embed, file or None)."""
+        page = self.page = await self.cog.leaderboard_page(self.guild, after=after, before=before)
+        self.prev_page.disabled = not page['has_prev']
+        self.next_page.disabled = not page['has_next']
+
+        title = f"📊 {self.guild.name} Leaderboard"
+        footer = f"Page {page['page']}/{page['pages']} • {page['total']} ranked members"
+        if self.as_image:
+            try:
+                if 'image' not in page:
+                    page['image'] = await self.cog.renderer.render_leaderboard(f"{self.guild.name} Leaderboard", page['rows'])
+                embed = discord.Embed(title=title, color=discord.Color.gold())
+                embed.set_image(url="attachment://leaderboard.png")
+                embed.set_footer(text=footer)
+                return embed, discord.File(io.BytesIO(page['image']), filename="leaderboard.png")
+            except RenderBusy:
+                pass  # Cards are busy; the text version is just as good
+
+        lines = [f"**#{position}** {name} • Level {level} • {xp} XP" for position, name, level, xp in page['rows']]
+        embed = discord.Embed(title=title, description="\n".join(lines), color=discord.Color.gold())
+        embed.set_footer(text=footer)
+        return embed, None
+
+    async def turn(self, interaction, **cursor):
+        await interaction.response.defer()
+        embed, file = await self.load(**cursor)
+        await interaction.edit_original_response(embed=embed, attachments=[file] if file else [], view=self)
+
+    @ui.button(label="Prev", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def prev_page(self, interaction: discord.Interaction, button: ui.Button):
+        await self.turn(interaction, before=self.page['first'])
+
+    @ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: ui.Button):
+        await self.turn(interaction, after=self.page['last'])
+
 # --- Leveling Cog ---
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # XP is buffered here and written to user_levels in batches
+        self.xp = XPAccumulator()
+        # Messages inside a member's cooldown are dropped here, before any I/O
+        self.cooldowns = CooldownWheel()
+        # Sorted XP per guild for rank positions and top lists
+        self.ranks = RankIndex()
+        self.leaderboard_cache = TTLCache(LEADERBOARD_CACHE_SECONDS)
+        # Rank cards are drawn in worker processes, off the event loop
+        self.renderer = RenderService()
+        self.backgrounds = ImageCache(self.renderer)
+        self.avatars = AvatarCache(self.renderer)
+        self.cards = CardCache()
+
+    async def cog_load(self):
+        await self.ranks.load()
+        await self.seed_cooldowns()
+        await self.backgrounds.load()
+        try:
+            await self.renderer.start()
+        except Exception as e:
+            logger.error(f"Could not start card render workers: {e}")
+        self.flush_xp.start()
+        if AVATAR_PREFETCH_TOP > 0:
+            self.prefetch_avatars.start()
+
+    async def cog_unload(self):
+        self.flush_xp.cancel()
+        self.prefetch_avatars.cancel()
+        self.renderer.shutdown()
+        await self.backgrounds.close()
+        # Save whatever is still pending before the pool closes
+        await self.xp.flush()
+
+    @tasks.loop(seconds=XP_FLUSH_INTERVAL)
+    async def flush_xp(self):
+        try:
+            await self.xp.flush()
+        except Exception:
+            pass  # Logged by the accumulator, retried on the next tick
+
+    @tasks.loop(hours=1)
+    async def prefetch_avatars(self):
+        # Warm the avatars most likely to show up on rank cards and leaderboards
+        loaded = 0
+        for guild in self.bot.guilds:
+            try:
+                top = self.ranks.top(guild.id, AVATAR_PREFETCH_TOP)
+                members = [m for m in (guild.get_member(user_id) for user_id, _ in top) if m]
+                loaded += await self.avatars.prefetch(members)
+            except Exception as e:
+                logger.error(f"Avatar prefetch failed for guild {guild.id}: {e}")
+        if loaded:
+            logger.debug(f"Prefetched {loaded} avatars.")
+
+    @prefetch_avatars.before_loop
+    async def before_prefetch_avatars(self):
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        if before.display_avatar.key != after.display_avatar.key:
+            self.avatars.invalidate(before.display_avatar.key)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        # Server-specific avatars live on the member, not the user
+        if before.guild_avatar and before.guild_avatar != after.guild_avatar:
+            self.avatars.invalidate(before.guild_avatar.key)
+
+    async def seed_cooldowns(self):
+        """Restore cooldowns still running from user_levels.last_message_time after a restart."""
+        now = time.time()
+        configs = {}
+        rows = await db_manager.fetchall("levels.recent_messages", (now - 86400,))
+        for guild_id, user_id, last_message_time in rows:
+            if guild_id not in configs:
+                configs[guild_id] = self.cooldown_for(await config_manager.get_guild_config(guild_id))
+            self.cooldowns.seed((guild_id, user_id), last_message_time, configs[guild_id], now)
+
+    @staticmethod
+    def cooldown_for(config):
+        return XP_COOLDOWN if config.xp_cooldown is None else config.xp_cooldown
 
     async def get_xp(self, guild_id, user_id):
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT xp, level FROM user_levels WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)) as cursor:
-                row = await cursor.fetchone()
-                return row if row else (0, 0)
-
-    async def add_xp(self, guild_id, user_id, amount):
-        async with aiosqlite.connect("bot_data.db") as db:
-            row = await self.get_xp(guild_id, user_id)
-            current_xp, current_level = row
-
-            new_xp = current_xp + amount
-            next_level_xp = (current_level + 1) * 100
-            new_level = current_level
-
-            while new_xp >= next_level_xp:
-                new_level += 1
-                next_level_xp = (new_level + 1) * 100
-
-            await db.execute("""
-                INSERT INTO user_levels (guild_id, user_id, xp, level) VALUES (?, ?, ?, ?)
-                ON CONFLICT(guild_id, user_id) DO UPDATE SET xp = ?, level = ?
-            """, (guild_id, user_id, new_xp, new_level, new_xp, new_level))
-            await db.commit()
+        return await self.xp.get(guild_id, user_id)
+
+    async def curve_for(self, guild_id):
+        if guild_id is None:
+            return level_curve.parse(level_curve.DEFAULT_CURVE)
+        return level_curve.for_config(await config_manager.get_guild_config(guild_id))
 
-            return new_level > current_level, new_level
+    async def add_xp(self, guild_id, user_id, amount, message_time=None):
+        curve = await self.curve_for(guild_id)
+        leveled_up, new_level = await self.xp.add(guild_id, user_id, amount, curve, message_time)
+        xp, _ = await self.xp.get(guild_id, user_id)
+        self.ranks.set(guild_id, user_id, xp)
+        return leveled_up, new_level
 
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot or not message.guild: return
 
+        config = await config_manager.get_guild_config(message.guild.id)
+        now = time.time()
+        if not self.cooldowns.hit((message.guild.id, message.author.id), self.cooldown_for(config), now):
+            return
+
         # Calculate XP with Rate
         base_xp = 15
-        config = await config_manager.get_guild_config(message.guild.id)
-        rate = config.get('xp_rate', 1.0)
-        final_xp = int(base_xp * rate)
+        final_xp = int(base_xp * config.xp_rate)
 
-        leveled_up, new_level = await self.add_xp(message.guild.id, message.author.id, final_xp)
+        leveled_up, new_level = await self.add_xp(message.guild.id, message.author.id, final_xp, message_time=now)
         if leveled_up:
             # Check for Level Up Channel
-            channel_id = config.get('level_up_channel_id')
+            channel_id = config.level_up_channel_id
             channel = None
             if channel_id:
                 channel = message.guild.get_channel(channel_id)
@@ -360,159 +482,75 @@ class Leveling(commands.Cog):
             else:
                 await message.channel.send(f"🎉 {message.author.mention} has reached **Level {new_level}**!")
 
-    def hex_to_rgb(self, hex_code):
-        hex_code = hex_code.lstrip('#')
-        try:
-            return tuple(int(hex_code[i:i+2], 16) for i in (0, 2, 4))
-        except:
-            return (114, 137, 218) # Default Blurple
-
     # Separate generation logic to support both command and preview
     async def generate_card(self, ctx_or_interaction, user, ephemeral=False):
         # Determine send method
         send = ctx_or_interaction.send if hasattr(ctx_or_interaction, 'send') else ctx_or_interaction.followup.send
         guild_id = ctx_or_interaction.guild.id if ctx_or_interaction.guild else None
 
-        xp, level = await self.get_xp(guild_id, user.id)
+        xp, _ = await self.get_xp(guild_id, user.id)
+        curve = await self.curve_for(guild_id)
+        level, progress, needed = curve.progress(xp)
 
-        # Calculate Rank
-        rank_pos = 1
-        async with aiosqlite.connect("bot_data.db") as db:
-             async with db.execute("SELECT COUNT(*) FROM user_levels WHERE guild_id = ? AND xp > ?", (guild_id, xp)) as cursor:
-                 rank_pos = (await cursor.fetchone())[0] + 1
+        # Calculate Rank (the index already includes unflushed XP)
+        rank_pos = self.ranks.rank(guild_id, xp)
 
-        # Fetch Custom Settings
+        # Fetch Custom Settings (CardSpec defaults cover anything unset)
         bg_url = None
-        card_color = "#5865F2" # Blurple
-        card_bg_color = "#2C2F33" # Dark Gray
-        card_opacity = 0.5
-        card_font = "default"
-
-        bg_crop_x = 0
-        bg_crop_y = 0
-        bg_crop_w = 0
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM global_users WHERE user_id = ?", (user.id,)) as cursor:
-                profile = await cursor.fetchone()
-                if profile:
-                    if profile['bg_url']: bg_url = profile['bg_url']
-                    if profile['card_color']: card_color = profile['card_color']
-                    if profile['card_bg_color']: card_bg_color = profile['card_bg_color']
-                    if profile['card_opacity'] is not None: card_opacity = profile['card_opacity']
-                    if profile['card_font']: card_font = profile['card_font']
-
-                    # Safe fetch for new columns in case of migration delay/error
-                    try:
-                        if profile['bg_crop_w']: bg_crop_w = profile['bg_crop_w']
-                        if profile['bg_crop_x']: bg_crop_x = profile['bg_crop_x']
-                        if profile['bg_crop_y']: bg_crop_y = profile['bg_crop_y']
-                    except: pass
+        crop = (0, 0, 0)
+        settings = {}
+
+        profile = await db_manager.fetchone("profile.get", (user.id,))
+        if profile:
+            bg_url = profile['bg_url']
+            if profile['card_color']: settings['card_color'] = profile['card_color']
+            if profile['card_bg_color']: settings['card_bg_color'] = profile['card_bg_color']
+            if profile['card_opacity'] is not None: settings['card_opacity'] = profile['card_opacity']
+            if profile['card_font']: settings['card_font'] = profile['card_font']
+
+            # Safe fetch for new columns in case of migration delay/error
+            try:
+                crop = (profile['bg_crop_x'] or 0, profile['bg_crop_y'] or 0, profile['bg_crop_w'] or 0)
+            except: pass
 
         # Generate Image
         try:
-            width, height = 900, 250
-
-            # 1. Background
-            try:
-                if bg_url:
-                    # Non-blocking request
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(bg_url, timeout=5) as resp:
-                            if resp.status == 200:
-                                data = await resp.read()
-                                bg_image = Image.open(io.BytesIO(data)).convert("RGBA")
-
-                                # Apply Crop if configured
-                                if bg_crop_w > 0:
-                                    bg_crop_h = int(bg_crop_w / 3.6)
-                                    crop_box = (bg_crop_x, bg_crop_y, bg_crop_x + bg_crop_w, bg_crop_y + bg_crop_h)
-                                    bg_image = bg_image.crop(crop_box)
-
-                                bg_image = bg_image.resize((width, height), Image.Resampling.LANCZOS)
-                                image = bg_image
-                            else:
-                                image = Image.new("RGBA", (width, height), self.hex_to_rgb(card_bg_color))
-                else:
-                    image = Image.new("RGBA", (width, height), self.hex_to_rgb(card_bg_color))
-            except Exception as e:
-                # Fallback if URL fails
-                logger.error(f"BG Image Load Error: {e}")
-                image = Image.new("RGBA", (width, height), self.hex_to_rgb(card_bg_color))
-
-            draw = ImageDraw.Draw(image)
-
-            # 2. Overlay (Dark Box)
-            overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            draw_overlay = ImageDraw.Draw(overlay)
-
-            box_x, box_y, box_w, box_h = 20, 20, 860, 210
-            alpha = int(255 * card_opacity)
-            draw_overlay.rectangle((box_x, box_y, box_x + box_w, box_y + box_h), fill=(0, 0, 0, alpha))
-
-            image = Image.alpha_composite(image, overlay)
-            draw = ImageDraw.Draw(image)
-
-            # 3. Avatar
-            avatar_bytes = await user.display_avatar.read()
-            avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGBA")
-            avatar = avatar.resize((150, 150))
-
-            mask = Image.new("L", (150, 150), 0)
-            draw_mask = ImageDraw.Draw(mask)
-            draw_mask.ellipse((0, 0, 150, 150), fill=255)
-
-            border_size = 5
-            draw.ellipse((50 - border_size, 50 - border_size, 50 + 150 + border_size, 50 + 150 + border_size), fill=self.hex_to_rgb(card_color))
-
-            image.paste(avatar, (50, 50), mask=mask)
-
-            # 4. Text & Fonts
-            text_color = (255, 255, 255)
-
-            try:
-                font_large = ImageFont.truetype("Roboto-Bold.ttf", 60)
-                font_medium = ImageFont.truetype("Roboto-Regular.ttf", 40)
-                font_small = ImageFont.truetype("Roboto-Regular.ttf", 30)
-            except:
-                font_large = ImageFont.load_default()
-                font_medium = ImageFont.load_default()
-                font_small = ImageFont.load_default()
-
-            text_x = 230
-            draw.text((text_x, 50), str(user.name), font=font_large, fill=text_color)
-
-            stats_text = f"Rank #{rank_pos}   Level {level}"
-            draw.text((text_x, 120), stats_text, font=font_medium, fill=text_color)
-
-            next_level_xp = (level + 1) * 100
-            current_level_base = level * 100
-            needed = next_level_xp - current_level_base
-            current_progress = xp - current_level_base
-
-            xp_text = f"{current_progress} / {needed} XP"
-            try:
-                bbox = font_small.getbbox(xp_text)
-                text_w = bbox[2] - bbox[0]
-            except:
-                text_w = 100
-
-            draw.text((860 - text_w - 20, 170), xp_text, font=font_small, fill=text_color)
-
-            # 5. Progress Bar
-            bar_x, bar_y, bar_w, bar_h = 230, 180, 600, 20
-            draw.rectangle((bar_x, bar_y, bar_x + bar_w, bar_y + bar_h), fill=(50, 50, 50))
-
-            percent = max(0, min(1, current_progress / needed)) if needed > 0 else 0
-            draw.rectangle((bar_x, bar_y, bar_x + int(bar_w * percent), bar_y + bar_h), fill=self.hex_to_rgb(card_color))
+            # Same inputs as the last card drawn for this user: resend it without touching Pillow
+            fingerprint = self.cards.fingerprint(
+                str(user.name), xp, curve.spec, rank_pos, sorted(settings.items()),
+                user.display_avatar.key, bg_url, crop, self.backgrounds.digest_for(bg_url)
+            )
+            png = self.cards.get(guild_id, user.id, fingerprint)
+            if png is not None:
+                return await send(file=discord.File(io.BytesIO(png), filename="rank.png"), ephemeral=ephemeral)
 
-            buffer = io.BytesIO()
-            image.save(buffer, "PNG")
-            buffer.seek(0)
+            # Cropped background comes from the image cache (memory, then disk, then network)
+            background = None
+            if bg_url:
+                try:
+                    background = await self.backgrounds.background(bg_url, *crop)
+                except RenderBusy:
+                    raise
+                except Exception as e:
+                    # Fallback if URL fails
+                    logger.error(f"BG Image Load Error: {e}")
+
+            avatar = await self.avatars.get(user.display_avatar)
+
+            spec = CardSpec(
+                username=str(user.name), xp=xp, level=level, rank=rank_pos,
+                progress=progress, needed=needed,
+                avatar=avatar, background=background, **settings
+            )
+            png = await self.renderer.render(spec)
+            # A card drawn without its background (download failed) is not worth keeping
+            if background is not None or not bg_url:
+                self.cards.put(guild_id, user.id, fingerprint, png)
 
-            await send(file=discord.File(buffer, filename="rank.png"), ephemeral=ephemeral)
+            await send(file=discord.File(io.BytesIO(png), filename="rank.png"), ephemeral=ephemeral)
 
+        except RenderBusy:
+            await send("⏳ Rank cards are busy right now, try again in a few seconds.", ephemeral=ephemeral)
         except Exception as e:
             await send(f"Failed to generate rank card: {e}", ephemeral=ephemeral)
 
@@ -532,35 +570,68 @@ class Leveling(commands.Cog):
         view = RankSettingsView(self)
         await ctx.send(embed=embed, view=view)
 
-    @commands.hybrid_command(name="leaderboard", description="Show top 5 active members")
-    async def leaderboard(self, ctx):
-        guild_id = ctx.guild.id
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("""
-                SELECT user_id, xp, level FROM user_levels
-                WHERE guild_id = ?
-                ORDER BY xp DESC LIMIT 5
-            """, (guild_id,)) as cursor:
-                rows = await cursor.fetchall()
-
-        if not rows:
-            return await ctx.send("No ranked users yet.", ephemeral=True)
-
-        embed = discord.Embed(title=f"📊 {ctx.guild.name} Leaderboard", color=discord.Color.gold())
-
-        for idx, row in enumerate(rows, start=1):
-            user_id, xp, level = row
-            # Fetch user object (try cache first)
-            member = ctx.guild.get_member(user_id)
-            name = member.display_name if member else f"User {user_id}"
+    async def resolve_names(self, guild, user_ids):
+        """Display names from the member cache, with one gateway query for any that are missing."""
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            member = guild.get_member(user_id)
+            if member:
+                names[user_id] = member.display_name
+            else:
+                missing.append(user_id)
 
-            embed.add_field(
-                name=f"#{idx} {name}",
-                value=f"Level {level} • {xp} XP",
-                inline=False
-            )
+        if missing:
+            try:
+                for member in await guild.query_members(user_ids=missing, limit=len(missing)):
+                    names[member.id] = member.display_name
+            except Exception as e:
+                logger.debug(f"Member lookup for leaderboard failed: {e}")
+        return {user_id: names.get(user_id, f"User {user_id}") for user_id in user_ids}
+
+    async def leaderboard_page(self, guild, after=None, before=None):
+        """
+        One page of the guild's XP ranking, keyset-paginated on (xp, user_id)
+        over the rank index. Pages are cached for LEADERBOARD_CACHE_SECONDS.
+        """
+        key = (guild.id, after, before)
+        page = self.leaderboard_cache.get(key)
+        if page is not None:
+            return page
+
+        start, entries = self.ranks.page(guild.id, LEADERBOARD_PAGE_SIZE, after=after, before=before)
+        if not entries and (after or before):
+            # The cursor ran off the end (members were reset); start over
+            start, entries = self.ranks.page(guild.id, LEADERBOARD_PAGE_SIZE)
+
+        names = await self.resolve_names(guild, [user_id for user_id, _ in entries])
+        curve = await self.curve_for(guild.id)
+        total = self.ranks.size(guild.id)
+        page = {
+            "rows": [(start + i + 1, names[user_id], curve.level_for(xp), xp) for i, (user_id, xp) in enumerate(entries)],
+            "first": (entries[0][1], entries[0][0]) if entries else None,
+            "last": (entries[-1][1], entries[-1][0]) if entries else None,
+            "has_prev": start > 0,
+            "has_next": start + len(entries) < total,
+            "page": start // LEADERBOARD_PAGE_SIZE + 1,
+            "pages": max(1, -(-total // LEADERBOARD_PAGE_SIZE)),
+            "total": total,
+        }
+        self.leaderboard_cache.put(key, page)
+        return page
+
+    @commands.hybrid_command(name="leaderboard", description="Browse the XP leaderboard")
+    @discord.app_commands.describe(image="Show each page as an image")
+    async def leaderboard(self, ctx, image: bool = False):
+        if not self.ranks.size(ctx.guild.id):
+            return await ctx.send("No ranked users yet.", ephemeral=True)
 
-        await ctx.send(embed=embed)
+        view = LeaderboardView(self, ctx, as_image=image)
+        embed, file = await view.load()
+        if file:
+            await ctx.send(embed=embed, file=file, view=view)
+        else:
+            await ctx.send(embed=embed, view=view)
 
     @commands.hybrid_command(name="set_xp_rate", description="Set the XP multiplier (Admin/Owner)")
     async def set_xp_rate(self, ctx, multiplier: float):
@@ -608,9 +679,13 @@ class Leveling(commands.Cog):
             if not user:
                 return await ctx.send("Please specify a user to reset.", ephemeral=True)
 
-            async with aiosqlite.connect("bot_data.db") as db:
-                await db.execute("DELETE FROM user_levels WHERE guild_id = ? AND user_id = ?", (ctx.guild.id, user.id))
+            async with db_manager.write() as db:
+                await db.run("levels.delete_user", (ctx.guild.id, user.id))
                 await db.commit()
+                # After the commit, so a message that loaded the old row meanwhile can't keep it
+                self.xp.discard(ctx.guild.id, user.id)
+                self.ranks.remove(ctx.guild.id, user.id)
+            self.leaderboard_cache.invalidate(lambda key: key[0] == ctx.guild.id)
             await ctx.send(f"✅ Reset XP and Level for {user.mention}.", ephemeral=True)
 
         elif scope.value == "all":
@@ -618,6 +693,51 @@ class Leveling(commands.Cog):
             view = ResetConfirmView(ctx)
             await ctx.send("⚠️ **Are you sure?** This will reset **EVERYONE'S** XP and Level in this server.", view=view, ephemeral=True)
 
+    @leveling_group.command(name="curve", description="Set how much XP each level needs")
+    @discord.app_commands.describe(spec="linear[:xp], quadratic[:xp] or power:xp:exponent, e.g. linear:100")
+    @commands.has_permissions(administrator=True)
+    async def set_level_curve(self, ctx, spec: str):
+        if not ctx.author.guild_permissions.administrator:
+            return await ctx.send("You need Administrator permissions.", ephemeral=True)
+
+        try:
+            curve = level_curve.parse(spec)
+        except ValueError as e:
+            return await ctx.send(f"❌ {e}", ephemeral=True)
+
+        await ctx.defer(ephemeral=True)
+        await config_manager.update_guild_config(ctx.guild.id, 'level_curve', curve.spec)
+
+        # Re-level everyone in one UPDATE; pending XP is flushed first so the rows are current
+        async with db_manager.write() as db:
+            await self.xp.flush()
+            cursor = await db.run("levels.recompute_guild", (curve.spec, ctx.guild.id, curve.spec))
+            changed = cursor.rowcount
+            await db.commit()
+            self.xp.relevel(ctx.guild.id, curve)
+        self.leaderboard_cache.invalidate(lambda key: key[0] == ctx.guild.id)
+
+        logger.info(f"Level curve for guild {ctx.guild.id} set to {curve.spec}; {changed} members re-levelled.")
+        await ctx.send(
+            f"✅ Level curve set to `{curve.spec}` (level 10 needs {curve.xp_for(10):,} XP). "
+            f"{changed} members changed level.",
+            ephemeral=True
+        )
+
+    @leveling_group.command(name="cooldown", description="Set the seconds between XP-earning messages")
+    @discord.app_commands.describe(seconds="Seconds a member waits before another message earns XP (0 = every message)")
+    @commands.has_permissions(administrator=True)
+    async def set_xp_cooldown(self, ctx, seconds: int):
+        if not ctx.author.guild_permissions.administrator:
+            return await ctx.send("You need Administrator permissions.", ephemeral=True)
+
+        if not 0 <= seconds <= 86400:
+            return await ctx.send("Cooldown must be between 0 and 86400 seconds.", ephemeral=True)
+
+        # Running cooldowns keep their old end time; new ones use this value
+        await config_manager.update_guild_config(ctx.guild.id, 'xp_cooldown', seconds)
+        await ctx.send(f"✅ Messages now earn XP at most once every **{seconds}s**.", ephemeral=True)
+
 class ResetConfirmView(ui.View):
     def __init__(self, ctx):
         super().__init__(timeout=60)
@@ -628,9 +748,13 @@ class ResetConfirmView(ui.View):
         if interaction.user != self.ctx.author: return
         await interaction.response.defer()
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("DELETE FROM user_levels WHERE guild_id = ?", (self.ctx.guild.id,))
+        async with db_manager.write() as db:
+            await db.run("levels.delete_guild", (self.ctx.guild.id,))
             await db.commit()
+            # After the commit, so a message that loaded an old row meanwhile can't keep it
+            self.ctx.cog.xp.discard(self.ctx.guild.id)
+            self.ctx.cog.ranks.clear_guild(self.ctx.guild.id)
+        self.ctx.cog.leaderboard_cache.invalidate(lambda key: key[0] == self.ctx.guild.id)
 
         await interaction.edit_original_response(content="✅ **All levels have been reset.**", view=None)
 
@@ -0,0 +1,482 @@
+import sqlite3
+import time
+import logger
+
+# Versioned schema for bot_data.db.
+# Each migration runs once, in order, and is recorded in `schema_version`.
+# To change the schema, append a new (version, name, function) entry to MIGRATIONS.
+# Never edit a migration that has already shipped.
+
+async def _columns(db, table):
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1] for row in await cursor.fetchall()}
+
+async def _add_columns(db, table, columns):
+    """ADD COLUMN for every (name, definition) the table doesn't have yet."""
+    existing = await _columns(db, table)
+    for name, definition in columns:
+        if name not in existing:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+async def _seed_shop_item(db, name, price, description, item_type):
+    async with db.execute("SELECT 1 FROM shop_items WHERE name = ?", (name,)) as cursor:
+        exists = await cursor.fetchone()
+    if not exists:
+        await db.execute("INSERT INTO shop_items (name, price, role_id, description, item_type) VALUES (?, ?, ?, ?, ?)",
+                         (name, price, 0, description, item_type))
+    else:
+        await db.execute("UPDATE shop_items SET item_type = ? WHERE name = ?", (item_type, name))
+
+# --- Migrations ---
+
+async def _v1_baseline(db):
+    """
+    Everything init_db used to run on every boot (up to v2.6).
+    Written to be safe on both an empty file and any older bot_data.db.
+    """
+    # 1. Guild Configs
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS guild_configs (
+            guild_id INTEGER PRIMARY KEY,
+            owner_role_id INTEGER,
+            forum_channel_id INTEGER,
+            log_channel_id INTEGER,
+            muted_role_id INTEGER,
+            allowed_search_channels TEXT, -- JSON List
+            mod_roles TEXT, -- JSON List
+            xp_rate REAL DEFAULT 1.0,
+            update_log_channel_id INTEGER DEFAULT NULL,
+            level_up_channel_id INTEGER DEFAULT NULL,
+            tcfc_channel_id INTEGER DEFAULT NULL,
+            tcfc_analyst_role_id INTEGER DEFAULT NULL
+        )
+    """)
+    # Older files may be missing any of these (xp_rate v1.x, update log v2.3.1, level up v2.3.x, TCFC v2.3.5)
+    await _add_columns(db, "guild_configs", [
+        ("owner_role_id", "INTEGER"),
+        ("forum_channel_id", "INTEGER"),
+        ("log_channel_id", "INTEGER"),
+        ("muted_role_id", "INTEGER"),
+        ("allowed_search_channels", "TEXT"),
+        ("mod_roles", "TEXT"),
+        ("xp_rate", "REAL DEFAULT 1.0"),
+        ("update_log_channel_id", "INTEGER DEFAULT NULL"),
+        ("level_up_channel_id", "INTEGER DEFAULT NULL"),
+        ("tcfc_channel_id", "INTEGER DEFAULT NULL"),
+        ("tcfc_analyst_role_id", "INTEGER DEFAULT NULL"),
+    ])
+
+    # 2. Flagged Words
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS flagged_words (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            word TEXT,
+            UNIQUE(guild_id, word)
+        )
+    """)
+
+    # 3. Warnings
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            user_id INTEGER,
+            moderator_id INTEGER,
+            reason TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 4. Leveling
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS user_levels (
+            guild_id INTEGER,
+            user_id INTEGER,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 0,
+            last_message_time REAL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """)
+
+    # 5. Global Economy / Profile
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS global_users (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            last_daily REAL DEFAULT 0,
+            bg_url TEXT DEFAULT NULL,
+            card_color TEXT DEFAULT '#7289da',
+            card_bg_color TEXT DEFAULT '#2C2F33',
+            card_opacity REAL DEFAULT 0.5,
+            card_font TEXT DEFAULT 'default',
+            bg_crop_x INTEGER DEFAULT 0,
+            bg_crop_y INTEGER DEFAULT 0,
+            bg_crop_w INTEGER DEFAULT 0
+        )
+    """)
+    # Rank Card columns (v1.1)
+    await _add_columns(db, "global_users", [
+        ("card_bg_color", "TEXT DEFAULT '#2C2F33'"),
+        ("card_opacity", "REAL DEFAULT 0.5"),
+        ("card_font", "TEXT DEFAULT 'default'"),
+        ("bg_crop_x", "INTEGER DEFAULT 0"),
+        ("bg_crop_y", "INTEGER DEFAULT 0"),
+        ("bg_crop_w", "INTEGER DEFAULT 0"),
+    ])
+
+    # 6. TCFC (v2.3.0)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS tcfc_fighters (
+            user_id INTEGER PRIMARY KEY,
+            elo INTEGER DEFAULT 1000,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            kos INTEGER DEFAULT 0,
+            rounds_fought INTEGER DEFAULT 0,
+            total_damage REAL DEFAULT 0.0
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS tcfc_matches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fighter_a INTEGER,
+            fighter_b INTEGER,
+            tournament_id TEXT,
+            status TEXT DEFAULT 'OPEN', -- OPEN, CLOSED, RESOLVED
+            winner_id INTEGER,
+            method TEXT, -- KO, DEC
+            round INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS tcfc_bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            match_id INTEGER,
+            bet_type TEXT, -- WINNER, METHOD, ROUND
+            selection TEXT,
+            wager INTEGER,
+            odds REAL,
+            potential_payout INTEGER,
+            status TEXT DEFAULT 'PENDING'
+        )
+    """)
+
+    # 7. Shop Items
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS shop_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            name TEXT,
+            price INTEGER,
+            role_id INTEGER,
+            description TEXT,
+            item_type TEXT DEFAULT 'ROLE'
+        )
+    """)
+    await _add_columns(db, "shop_items", [("item_type", "TEXT DEFAULT 'ROLE'")])
+
+    # 8. User Inventory (v2.4.1)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            item_name TEXT,
+            purchase_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Global shop items (v2.4.3)
+    await _seed_shop_item(db, 'Lucky Charm', 2500, 'Increases luck in Casino games!', 'LUCK')
+    await _seed_shop_item(db, 'Auto Slot', 5000, 'Unlocks /autoslots command for rapid spinning.', 'UNLOCK')
+
+    # 9. Active Bets
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS active_bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            description TEXT,
+            options TEXT, -- JSON list of options
+            status TEXT DEFAULT 'OPEN', -- OPEN, CLOSED, RESOLVED
+            creator_id INTEGER,
+            winning_option TEXT DEFAULT NULL
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS bet_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bet_id INTEGER,
+            user_id INTEGER,
+            option TEXT,
+            amount INTEGER,
+            FOREIGN KEY(bet_id) REFERENCES active_bets(id)
+        )
+    """)
+
+    # 10. Active Sports Bets (Plugin 2.2)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS active_sports_bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            guild_id INTEGER,
+            game_id TEXT,
+            sport_key TEXT,
+            bet_type TEXT, -- moneyline, spread, total
+            bet_selection TEXT, -- Team Name or Over/Under
+            bet_line TEXT, -- e.g. -110, +200, or -5.5
+            wager_amount INTEGER,
+            potential_payout INTEGER,
+            status TEXT DEFAULT 'PENDING', -- PENDING, WON, LOST, PUSH
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            matchup TEXT DEFAULT NULL
+        )
+    """)
+    # Matchup label (v2.2.1)
+    await _add_columns(db, "active_sports_bets", [("matchup", "TEXT DEFAULT NULL")])
+
+    # 11. Birthdays
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS birthdays (
+            user_id INTEGER PRIMARY KEY,
+            day INTEGER,
+            month INTEGER
+        )
+    """)
+
+    # 12. Global Config (e.g. RTP)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS global_config (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+    # 13. PvP Bets (Economy)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS pvp_bets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            challenger_id INTEGER,
+            opponent_id INTEGER,
+            amount INTEGER,
+            status TEXT DEFAULT 'PENDING', -- PENDING, ACTIVE, RESOLVED, VOID
+            challenger_vote INTEGER DEFAULT NULL,
+            opponent_vote INTEGER DEFAULT NULL,
+            winner_id INTEGER DEFAULT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 14. Ladder System (v2.6)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ladders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            name TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(guild_id, name)
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ladder_players (
+            ladder_id INTEGER,
+            user_id INTEGER,
+            elo INTEGER DEFAULT 1000,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            streak INTEGER DEFAULT 0,
+            PRIMARY KEY (ladder_id, user_id),
+            FOREIGN KEY(ladder_id) REFERENCES ladders(id) ON DELETE CASCADE
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ladder_matches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ladder_id INTEGER,
+            p1_id INTEGER,
+            p2_id INTEGER,
+            status TEXT DEFAULT 'PENDING', -- PENDING, ACTIVE, REPORTED, CONFIRMED, DISPUTED
+            winner_id INTEGER,
+            wager INTEGER DEFAULT 0,
+            p1_report INTEGER DEFAULT NULL, -- 1=Self Win, 2=Opponent Win
+            p2_report INTEGER DEFAULT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(ladder_id) REFERENCES ladders(id) ON DELETE CASCADE
+        )
+    """)
+
+async def _v2_hot_indexes(db):
+    """Indexes for the hot lookups in queries.QUERIES."""
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_user_levels_rank ON user_levels (guild_id, xp)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_inventory_user_item ON inventory (user_id, item_name)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_warnings_guild_user ON warnings (guild_id, user_id, timestamp)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_shop_items_guild ON shop_items (guild_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_bet_entries_bet ON bet_entries (bet_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sports_bets_status ON active_sports_bets (status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sports_bets_user ON active_sports_bets (user_id, status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tcfc_bets_match ON tcfc_bets (match_id, status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tcfc_matches_status ON tcfc_matches (status)")
+    # Split so "challenger_id = ? OR opponent_id = ?" can use a multi-index OR
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_pvp_bets_challenger ON pvp_bets (challenger_id, status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_pvp_bets_opponent ON pvp_bets (opponent_id, status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ladder_matches_p1 ON ladder_matches (p1_id, status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ladder_matches_p2 ON ladder_matches (p2_id, status)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ladder_players_elo ON ladder_players (ladder_id, elo)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_birthdays_date ON birthdays (month, day)")
+
+async def _v3_ledger(db):
+    """Append-only record of every balance change made through Economy."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            amount INTEGER, -- Signed change
+            balance INTEGER, -- Balance after the change
+            reason TEXT,
+            counterparty_id INTEGER DEFAULT NULL, -- Other side of a transfer
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (user_id, id)")
+
+async def _v4_archive(db):
+    """
+    resolved_at on settled rows plus *_archive tables the Archiver moves them into.
+    Archive tables copy the live table's columns (CREATE ... AS SELECT), so a later
+    migration that adds a column to a live table must add it to the archive too.
+    """
+    settled = {
+        "active_sports_bets": "status IN ('WON', 'LOST', 'PUSH')",
+        "pvp_bets": "status IN ('RESOLVED', 'VOID')",
+        "ladder_matches": "status = 'CONFIRMED'",
+        "tcfc_matches": "status IN ('RESOLVED', 'VOID')",
+        "active_bets": "status = 'RESOLVED'",
+    }
+    for table, condition in settled.items():
+        await _add_columns(db, table, [("resolved_at", "DATETIME DEFAULT NULL")])
+        # Rows settled before this column existed age from when they were created
+        since = "timestamp" if "timestamp" in await _columns(db, table) else "CURRENT_TIMESTAMP"
+        await db.execute(f"UPDATE {table} SET resolved_at = {since} WHERE {condition} AND resolved_at IS NULL")
+        await db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_resolved ON {table} (resolved_at)")
+
+    for table in list(settled) + ["tcfc_bets", "bet_entries"]:
+        await db.execute(f"CREATE TABLE IF NOT EXISTS {table}_archive AS SELECT * FROM {table} WHERE 0")
+
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sports_bets_archive_user ON active_sports_bets_archive (user_id, id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_tcfc_bets_archive_match ON tcfc_bets_archive (match_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_bet_entries_archive_bet ON bet_entries_archive (bet_id)")
+
+async def _v5_level_curve(db):
+    """Per-guild level curve spec (see level_curve.py); NULL means the default linear curve."""
+    await _add_columns(db, "guild_configs", [("level_curve", "TEXT DEFAULT NULL")])
+
+async def _v6_xp_cooldown(db):
+    """Per-guild message XP cooldown in seconds; NULL means XP_COOLDOWN."""
+    await _add_columns(db, "guild_configs", [("xp_cooldown", "INTEGER DEFAULT NULL")])
+
+async def _v7_guild_members(db):
+    """Who is in which guild (kept by guild_members.py), for per-guild joins against global_users."""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS guild_members (
+            guild_id INTEGER,
+            user_id INTEGER,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID
+    """)
+
+async def _v8_inventory_counts(db):
+    """
+    Per-user item quantities, kept next to the row-per-purchase inventory table
+    so item checks and /inventory read one small row instead of counting purchases.
+    """
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_counts (
+            user_id INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL, -- 0 for purchases made before guild_id was recorded
+            item_name TEXT NOT NULL,
+            qty INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, guild_id, item_name)
+        ) WITHOUT ROWID
+    """)
+    await db.execute("""
+        INSERT OR IGNORE INTO inventory_counts (user_id, guild_id, item_name, qty)
+        SELECT user_id, COALESCE(guild_id, 0), item_name, COUNT(*) FROM inventory
+        WHERE user_id IS NOT NULL AND item_name IS NOT NULL
+        GROUP BY user_id, COALESCE(guild_id, 0), item_name
+    """)
+
+MIGRATIONS = [
+    (1, "baseline schema", _v1_baseline),
+    (2, "hot lookup indexes", _v2_hot_indexes),
+    (3, "balance ledger", _v3_ledger),
+    (4, "settled row archive", _v4_archive),
+    (5, "per-guild level curve", _v5_level_curve),
+    (6, "per-guild xp cooldown", _v6_xp_cooldown),
+    (7, "guild membership", _v7_guild_members),
+    (8, "inventory counts", _v8_inventory_counts),
+]
+
+# --- Runner ---
+
+async def get_version(db):
+    try:
+        async with db.execute("SELECT MAX(version) FROM schema_version") as cursor:
+            row = await cursor.fetchone()
+        return row[0] or 0
+    except sqlite3.OperationalError:
+        # No schema_version table yet: fresh file or pre-migration database
+        return 0
+
+async def migrate(db):
+    """
+    Bring the schema up to the latest version on the writer connection `db`.
+    A warm start is a single version read. Pending migrations are applied
+    together in one transaction, so a failure leaves the file untouched.
+    """
+    version = await get_version(db)
+    latest = MIGRATIONS[-1][0]
+    if version >= latest:
+        return version
+
+    start = time.perf_counter()
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                duration_ms REAL
+            )
+        """)
+        # Re-read under the write lock in case another process migrated first
+        version = await get_version(db)
+
+        for number, name, func in MIGRATIONS:
+            if number <= version:
+                continue
+            step_start = time.perf_counter()
+            await func(db)
+            duration_ms = (time.perf_counter() - step_start) * 1000
+            await db.execute("INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)",
+                             (number, name, duration_ms))
+            logger.info(f"Applied migration {number} ({name}) in {duration_ms:.1f} ms")
+
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Schema migration failed, rolled back to v{version}: {e}")
+        raise
+
+    total_ms = (time.perf_counter() - start) * 1000
+    logger.success(f"Database schema migrated v{version} -> v{latest} in {total_ms:.1f} ms")
+    return latest
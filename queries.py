@@ -0,0 +1,275 @@
+# Every SQL statement the cogs run, by name.
+# Cogs call them through the pooled connection (`await db.fetchone("economy.balance", (uid,))`)
+# or the one-shot db_manager helpers, never with inline SQL. Keeping the text
+# constant means each statement is prepared once per connection and then reused
+# from sqlite3's statement cache, and lets the pool time every call by name.
+#
+# `!dbcheck` runs EXPLAIN QUERY PLAN over the whole catalog and flags any full
+# table scan not listed in SCAN_OK, so a new query or a dropped index is caught
+# before it gets slow.
+
+# Columns /config may write. Each gets its own UPDATE below rather than an
+# f-string, so no column name ever comes from user input.
+CONFIG_COLUMNS = (
+    'owner_role_id', 'forum_channel_id', 'log_channel_id', 'muted_role_id',
+    'allowed_search_channels', 'mod_roles', 'xp_rate', 'update_log_channel_id',
+    'tcfc_channel_id', 'tcfc_analyst_role_id', 'level_up_channel_id', 'level_curve',
+    'xp_cooldown',
+)
+
+# Rank card settings a user can change one at a time
+PROFILE_SETTINGS = ('card_color', 'card_bg_color', 'card_font', 'card_opacity')
+
+# Tables the Archiver moves settled rows out of: table -> "settled" condition.
+# Settling a row must also set resolved_at, which is what the age cutoff uses.
+ARCHIVED_TABLES = {
+    "active_sports_bets": "status IN ('WON', 'LOST', 'PUSH')",
+    "pvp_bets": "status IN ('RESOLVED', 'VOID')",
+    "ladder_matches": "status = 'CONFIRMED'",
+    "tcfc_matches": "status IN ('RESOLVED', 'VOID')",
+    "active_bets": "status = 'RESOLVED'",
+}
+# Child rows that move together with their parent: parent -> (child table, parent key column)
+ARCHIVED_CHILDREN = {
+    "tcfc_matches": ("tcfc_bets", "match_id"),
+    "active_bets": ("bet_entries", "bet_id"),
+}
+
+QUERIES = {
+    # Guild config
+    "config.all": "SELECT * FROM guild_configs",
+    "config.guild": "SELECT * FROM guild_configs WHERE guild_id = ?",
+    "config.ensure": "INSERT OR IGNORE INTO guild_configs (guild_id) VALUES (?)",
+    "config.import_json": """
+        INSERT OR REPLACE INTO guild_configs
+        (guild_id, owner_role_id, forum_channel_id, log_channel_id, muted_role_id, allowed_search_channels, mod_roles)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    **{f"config.set_{col}": f"UPDATE guild_configs SET {col} = ? WHERE guild_id = ?" for col in CONFIG_COLUMNS},
+
+    # Leveling
+    "levels.get_xp": "SELECT xp, level, last_message_time FROM user_levels WHERE guild_id = ? AND user_id = ?",
+    "levels.upsert_many": """
+        INSERT INTO user_levels (guild_id, user_id, xp, level, last_message_time) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(guild_id, user_id) DO UPDATE SET
+            xp = excluded.xp, level = excluded.level, last_message_time = excluded.last_message_time
+    """,
+    "levels.all_xp": "SELECT guild_id, user_id, xp FROM user_levels",
+    "levels.recent_messages": "SELECT guild_id, user_id, last_message_time FROM user_levels WHERE last_message_time > ?",
+    # level_for() is level_curve.sql_level_for, registered on every pooled connection
+    "levels.recompute_guild": "UPDATE user_levels SET level = level_for(?, xp) WHERE guild_id = ? AND level != level_for(?, xp)",
+    "levels.delete_user": "DELETE FROM user_levels WHERE guild_id = ? AND user_id = ?",
+    "levels.delete_guild": "DELETE FROM user_levels WHERE guild_id = ?",
+
+    # Rank card profile
+    "profile.get": "SELECT * FROM global_users WHERE user_id = ?",
+    **{f"profile.set_{col}": f"""
+        INSERT INTO global_users (user_id, {col}) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET {col} = excluded.{col}
+    """ for col in PROFILE_SETTINGS},
+    "profile.set_background": """
+        INSERT INTO global_users (user_id, bg_url, bg_crop_x, bg_crop_y, bg_crop_w) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+        bg_url = excluded.bg_url, bg_crop_x = excluded.bg_crop_x, bg_crop_y = excluded.bg_crop_y, bg_crop_w = excluded.bg_crop_w
+    """,
+    "profile.reset_card": """
+        INSERT INTO global_users (user_id, bg_url, card_color, card_bg_color, card_opacity, card_font)
+        VALUES (?, NULL, '#7289da', '#2C2F33', 0.5, 'default')
+        ON CONFLICT(user_id) DO UPDATE SET
+        bg_url=NULL, card_color='#7289da', card_bg_color='#2C2F33', card_opacity=0.5, card_font='default'
+    """,
+
+    # Economy
+    "economy.balance": "SELECT balance FROM global_users WHERE user_id = ?",
+    "economy.credit": """
+        INSERT INTO global_users (user_id, balance) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance
+        RETURNING balance
+    """,
+    "economy.debit": """
+        UPDATE global_users SET balance = balance - ?
+        WHERE user_id = ? AND balance >= ?
+        RETURNING balance
+    """,
+    # executemany can't take RETURNING, so settle() reads the new balances back in one query
+    "economy.credit_many": """
+        INSERT INTO global_users (user_id, balance) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance
+    """,
+    "economy.balances_of": "SELECT user_id, balance FROM global_users WHERE user_id IN (SELECT value FROM json_each(?))",
+    "economy.last_daily": "SELECT last_daily FROM global_users WHERE user_id = ?",
+    "economy.set_last_daily": "UPDATE global_users SET last_daily = ? WHERE user_id = ?",
+    # Richest members of one guild: a join through the guild_members primary key, top N by balance
+    "economy.guild_top": """
+        SELECT g.user_id, g.balance FROM guild_members m
+        JOIN global_users g ON g.user_id = m.user_id
+        WHERE m.guild_id = ? AND g.balance > 0
+        ORDER BY g.balance DESC LIMIT ?
+    """,
+    "ledger.insert": "INSERT INTO ledger (user_id, amount, balance, reason, counterparty_id) VALUES (?, ?, ?, ?, ?)",
+
+    # Guild membership (guild_members.py)
+    "members.ids_for_guild": "SELECT user_id FROM guild_members WHERE guild_id = ?",
+    "members.add_many": "INSERT OR IGNORE INTO guild_members (guild_id, user_id) VALUES (?, ?)",
+    "members.remove": "DELETE FROM guild_members WHERE guild_id = ? AND user_id = ?",
+    "members.remove_guild": "DELETE FROM guild_members WHERE guild_id = ?",
+
+    # Shop / Inventory
+    "shop.list": "SELECT * FROM shop_items WHERE guild_id = ?",
+    "shop.add": "INSERT INTO shop_items (guild_id, name, price, role_id, description, item_type) VALUES (?, ?, ?, ?, ?, ?)",
+    # Items are looked up by name in shop_catalog.ShopCatalog and removed by id
+    "shop.remove": "DELETE FROM shop_items WHERE id = ? AND guild_id = ?",
+    "inventory.add": "INSERT INTO inventory (user_id, guild_id, item_name) VALUES (?, ?, ?)",
+    "inventory.first_item": "SELECT id FROM inventory WHERE user_id = ? AND item_name = ? AND COALESCE(guild_id, 0) = ? LIMIT 1",
+    "inventory.delete": "DELETE FROM inventory WHERE id = ?",
+    # inventory_counts mirrors the purchase rows above; Economy.add_item/consume_item keep both in step
+    "inventory.list": "SELECT item_name, SUM(qty) FROM inventory_counts WHERE user_id = ? AND qty > 0 GROUP BY item_name",
+    "inventory.count_add": """
+        INSERT INTO inventory_counts (user_id, guild_id, item_name, qty) VALUES (?, ?, ?, 1)
+        ON CONFLICT(user_id, guild_id, item_name) DO UPDATE SET qty = qty + 1
+    """,
+    "inventory.count_take": """
+        UPDATE inventory_counts SET qty = qty - 1
+        WHERE (user_id, guild_id, item_name) = (
+            SELECT user_id, guild_id, item_name FROM inventory_counts
+            WHERE user_id = ? AND item_name = ? AND qty > 0 LIMIT 1
+        )
+        RETURNING guild_id, qty
+    """,
+    "inventory.count_prune": "DELETE FROM inventory_counts WHERE user_id = ? AND qty <= 0",
+
+    # Custom bets
+    "bets.create": "INSERT INTO active_bets (guild_id, description, options, creator_id) VALUES (?, ?, ?, ?)",
+    "bets.get_open": "SELECT * FROM active_bets WHERE id = ? AND status = 'OPEN'",
+    "bets.resolve": "UPDATE active_bets SET status = 'RESOLVED', winning_option = ?, resolved_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'OPEN' RETURNING id",
+    "bets.entries": "SELECT * FROM bet_entries WHERE bet_id = ?",
+    "bets.add_entry": "INSERT INTO bet_entries (bet_id, user_id, option, amount) VALUES (?, ?, ?, ?)",
+
+    # PvP wagers
+    "pvp.create": "INSERT INTO pvp_bets (guild_id, challenger_id, opponent_id, amount, status) VALUES (?, ?, ?, ?, 'PENDING')",
+    "pvp.get": "SELECT * FROM pvp_bets WHERE id = ?",
+    "pvp.pending_by_challenger": "SELECT * FROM pvp_bets WHERE challenger_id = ? AND status = 'PENDING' ORDER BY id DESC LIMIT 1",
+    "pvp.active_for_user": "SELECT * FROM pvp_bets WHERE (challenger_id = ? OR opponent_id = ?) AND status = 'ACTIVE'",
+    "pvp.activate": "UPDATE pvp_bets SET status = 'ACTIVE' WHERE id = ?",
+    "pvp.challenger_vote": "UPDATE pvp_bets SET challenger_vote = ? WHERE id = ?",
+    "pvp.opponent_vote": "UPDATE pvp_bets SET opponent_vote = ? WHERE id = ?",
+    "pvp.resolve": "UPDATE pvp_bets SET status = 'RESOLVED', winner_id = ?, resolved_at = CURRENT_TIMESTAMP WHERE id = ?",
+    "pvp.void": "UPDATE pvp_bets SET status = 'VOID', resolved_at = CURRENT_TIMESTAMP WHERE id = ?",
+    "pvp.delete": "DELETE FROM pvp_bets WHERE id = ?",
+
+    # Casino
+    "casino.get_rtp": "SELECT value FROM global_config WHERE key = 'rtp_modifier'",
+    "casino.set_rtp": """
+        INSERT INTO global_config (key, value) VALUES ('rtp_modifier', ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """,
+
+    # Sportsbook
+    "sports.place": """
+        INSERT INTO active_sports_bets
+        (user_id, guild_id, game_id, sport_key, bet_type, bet_selection, bet_line, wager_amount, potential_payout, status, matchup)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'PENDING', ?)
+    """,
+    "sports.pending": "SELECT * FROM active_sports_bets WHERE status = 'PENDING'",
+    "sports.pending_recent": "SELECT * FROM active_sports_bets WHERE status = 'PENDING' ORDER BY id DESC LIMIT 25",
+    "sports.user_active": "SELECT * FROM active_sports_bets WHERE user_id = ? AND status = 'PENDING' ORDER BY id DESC LIMIT 20",
+    # History spans the live table and the archive; each side is limited first so both use (user_id, ...) indexes
+    "sports.user_history": """
+        SELECT * FROM (SELECT * FROM active_sports_bets WHERE user_id = ? AND status != 'PENDING' ORDER BY id DESC LIMIT 20)
+        UNION ALL
+        SELECT * FROM (SELECT * FROM active_sports_bets_archive WHERE user_id = ? ORDER BY id DESC LIMIT 20)
+        ORDER BY id DESC LIMIT 20
+    """,
+    "sports.user_all": """
+        SELECT * FROM (SELECT * FROM active_sports_bets WHERE user_id = ? ORDER BY id DESC LIMIT 20)
+        UNION ALL
+        SELECT * FROM (SELECT * FROM active_sports_bets_archive WHERE user_id = ? ORDER BY id DESC LIMIT 20)
+        ORDER BY id DESC LIMIT 20
+    """,
+    # Only called with a settled status (WON, LOST, PUSH)
+    "sports.set_status": "UPDATE active_sports_bets SET status = ?, resolved_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'PENDING'",
+
+    # TCFC
+    "tcfc.fighter": "SELECT * FROM tcfc_fighters WHERE user_id = ?",
+    "tcfc.create_fighter": "INSERT OR IGNORE INTO tcfc_fighters (user_id) VALUES (?)",
+    "tcfc.top_fighters": "SELECT * FROM tcfc_fighters ORDER BY elo DESC LIMIT 10",
+    "tcfc.all_fighters": "SELECT * FROM tcfc_fighters",
+    "tcfc.record_win": "UPDATE tcfc_fighters SET elo = ?, wins = wins + 1, kos = kos + ?, rounds_fought = rounds_fought + ? WHERE user_id = ?",
+    "tcfc.record_loss": "UPDATE tcfc_fighters SET elo = ?, losses = losses + 1, rounds_fought = rounds_fought + ? WHERE user_id = ?",
+    "tcfc.reset_fighter": """
+        UPDATE tcfc_fighters
+        SET elo = 1000, wins = 0, losses = 0, kos = 0, rounds_fought = 0, total_damage = 0
+        WHERE user_id = ?
+    """,
+    "tcfc.create_match": "INSERT INTO tcfc_matches (fighter_a, fighter_b, tournament_id, status) VALUES (?, ?, ?, 'OPEN')",
+    "tcfc.match": "SELECT * FROM tcfc_matches WHERE id = ?",
+    "tcfc.open_match": "SELECT * FROM tcfc_matches WHERE id = ? AND status = 'OPEN'",
+    "tcfc.open_matches": "SELECT * FROM tcfc_matches WHERE status = 'OPEN'",
+    "tcfc.resolve_match": "UPDATE tcfc_matches SET status = 'RESOLVED', winner_id = ?, method = ?, round = ?, resolved_at = CURRENT_TIMESTAMP WHERE id = ?",
+    "tcfc.void_match": "UPDATE tcfc_matches SET status = 'VOID', resolved_at = CURRENT_TIMESTAMP WHERE id = ?",
+    "tcfc.place_bet": """
+        INSERT INTO tcfc_bets (user_id, match_id, bet_type, selection, wager, odds, potential_payout, status)
+        VALUES (?, ?, 'WINNER', ?, ?, ?, ?, 'PENDING')
+    """,
+    "tcfc.pending_bets": "SELECT * FROM tcfc_bets WHERE match_id = ? AND status = 'PENDING'",
+    "tcfc.match_bets": "SELECT * FROM tcfc_bets WHERE match_id = ?",
+    "tcfc.bet_won": "UPDATE tcfc_bets SET status = 'WON', potential_payout = ? WHERE id = ?",
+    "tcfc.set_bet_status": "UPDATE tcfc_bets SET status = ? WHERE id = ?",
+
+    # Ladders
+    "ladders.create": "INSERT INTO ladders (guild_id, name) VALUES (?, ?)",
+    "ladders.find": "SELECT * FROM ladders WHERE guild_id = ? AND lower(name) = ?",
+    "ladders.join": "INSERT INTO ladder_players (ladder_id, user_id) VALUES (?, ?)",
+    "ladders.player": "SELECT * FROM ladder_players WHERE ladder_id = ? AND user_id = ?",
+    "ladders.top": "SELECT * FROM ladder_players WHERE ladder_id = ? ORDER BY elo DESC LIMIT 10",
+    "ladders.record_win": "UPDATE ladder_players SET elo = ?, wins = wins + 1 WHERE ladder_id = ? AND user_id = ?",
+    "ladders.record_loss": "UPDATE ladder_players SET elo = ?, losses = losses + 1 WHERE ladder_id = ? AND user_id = ?",
+    "ladders.create_match": "INSERT INTO ladder_matches (ladder_id, p1_id, p2_id, wager, status) VALUES (?, ?, ?, ?, 'PENDING')",
+    "ladders.match": "SELECT * FROM ladder_matches WHERE id = ?",
+    "ladders.active_match": "SELECT * FROM ladder_matches WHERE (p1_id = ? OR p2_id = ?) AND status IN ('ACTIVE', 'REPORTED')",
+    "ladders.accept_match": "UPDATE ladder_matches SET status = 'ACTIVE' WHERE id = ?",
+    "ladders.p1_report": "UPDATE ladder_matches SET p1_report = ?, status = 'REPORTED' WHERE id = ?",
+    "ladders.p2_report": "UPDATE ladder_matches SET p2_report = ?, status = 'REPORTED' WHERE id = ?",
+    "ladders.confirm_match": "UPDATE ladder_matches SET status = 'CONFIRMED', winner_id = ?, resolved_at = CURRENT_TIMESTAMP WHERE id = ?",
+    "ladders.delete_match": "DELETE FROM ladder_matches WHERE id = ?",
+
+    # Moderation / Tracking
+    "warnings.add": "INSERT INTO warnings (guild_id, user_id, moderator_id, reason) VALUES (?, ?, ?, ?)",
+    "warnings.count": "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?",
+    "warnings.recent": "SELECT * FROM warnings WHERE guild_id = ? AND user_id = ? ORDER BY timestamp DESC LIMIT 10",
+    "flagged.add": "INSERT INTO flagged_words (guild_id, word) VALUES (?, ?)",
+    "flagged.remove": "DELETE FROM flagged_words WHERE guild_id = ? AND word = ?",
+    "flagged.words": "SELECT word FROM flagged_words WHERE guild_id = ?",
+
+    # Birthdays
+    "birthdays.set": """
+        INSERT INTO birthdays (user_id, day, month) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET day = excluded.day, month = excluded.month
+    """,
+    "birthdays.today": "SELECT user_id FROM birthdays WHERE day = ? AND month = ?",
+
+    # Archiver: pick a batch of settled rows older than the cutoff ('-30 days'),
+    # copy them to <table>_archive and delete them, all by the same JSON id list
+    **{f"archive.{table}.due": f"""
+        SELECT id FROM {table}
+        WHERE resolved_at < datetime('now', ?) AND {condition}
+        ORDER BY resolved_at LIMIT ?
+    """ for table, condition in ARCHIVED_TABLES.items()},
+    **{f"archive.{table}.copy": f"INSERT INTO {table}_archive SELECT * FROM {table} WHERE id IN (SELECT value FROM json_each(?))"
+       for table in ARCHIVED_TABLES},
+    **{f"archive.{table}.delete": f"DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))"
+       for table in ARCHIVED_TABLES},
+    **{f"archive.{child}.copy": f"INSERT INTO {child}_archive SELECT * FROM {child} WHERE {key} IN (SELECT value FROM json_each(?))"
+       for child, key in ARCHIVED_CHILDREN.values()},
+    **{f"archive.{child}.delete": f"DELETE FROM {child} WHERE {key} IN (SELECT value FROM json_each(?))"
+       for child, key in ARCHIVED_CHILDREN.values()},
+}
+
+# Queries that read a whole table on purpose (startup preload, small global tables)
+SCAN_OK = frozenset({
+    "config.all",
+    "levels.all_xp",
+    "levels.recent_messages",
+    "tcfc.all_fighters",
+    "tcfc.top_fighters",
+})
@@ -0,0 +1,135 @@
+# In-memory XP ranking per guild.
+# Each guild keeps its members sorted by (-xp, user_id), so a rank position is
+# one bisect and a top-N list is a slice; nothing has to COUNT(*) user_levels.
+# Built from user_levels at startup and kept current by Leveling.add_xp and the
+# reset commands, so it also reflects XP the accumulator hasn't flushed yet.
+
+import bisect
+import time
+from database import db_manager
+import logger
+
+class GuildRanking:
+    __slots__ = ("keys", "xp")
+
+    def __init__(self):
+        self.keys = []  # sorted (-xp, user_id)
+        self.xp = {}    # user_id -> xp
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set(self, user_id, xp):
+        old = self.xp.get(user_id)
+        if old == xp:
+            return
+        if old is not None:
+            del self.keys[bisect.bisect_left(self.keys, (-old, user_id))]
+        bisect.insort(self.keys, (-xp, user_id))
+        self.xp[user_id] = xp
+
+    def remove(self, user_id):
+        old = self.xp.pop(user_id, None)
+        if old is not None:
+            del self.keys[bisect.bisect_left(self.keys, (-old, user_id))]
+
+    def rank(self, xp):
+        # (-xp,) sorts before every (-xp, user_id), so this counts members with more XP
+        return bisect.bisect_left(self.keys, (-xp,)) + 1
+
+    def top(self, limit, offset=0):
+        return [(user_id, -neg_xp) for neg_xp, user_id in self.keys[offset:offset + limit]]
+
+    def page(self, limit, after=None, before=None):
+        """
+        Keyset page: up to `limit` members ranked after (or before) the
+        cursor key (-xp, user_id). Returns (position of first row, keys).
+        A cursor stays valid when members above it gain XP, unlike an offset.
+        """
+        if before is not None:
+            end = bisect.bisect_left(self.keys, before)
+            start = max(0, end - limit)
+            if end - start < limit:
+                # Back at the top: show a full first page
+                return 0, self.keys[:limit]
+            return start, self.keys[start:end]
+        start = 0 if after is None else bisect.bisect_right(self.keys, after)
+        return start, self.keys[start:start + limit]
+
+class RankIndex:
+    def __init__(self):
+        self.guilds = {}  # guild_id -> GuildRanking
+        # Metrics
+        self.build_ms = 0.0
+        self.lookups = 0
+        self.updates = 0
+
+    async def load(self):
+        """Build every guild's ranking from user_levels (called from cog_load)."""
+        start = time.perf_counter()
+        rows = await db_manager.fetchall("levels.all_xp")
+        guilds = {}
+        for guild_id, user_id, xp in rows:
+            ranking = guilds.get(guild_id)
+            if ranking is None:
+                ranking = guilds[guild_id] = GuildRanking()
+            ranking.keys.append((-xp, user_id))
+            ranking.xp[user_id] = xp
+        for ranking in guilds.values():
+            ranking.keys.sort()
+
+        self.guilds = guilds
+        self.build_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Rank index built for {len(rows)} members in {len(guilds)} guilds ({self.build_ms:.0f} ms).")
+
+    def set(self, guild_id, user_id, xp):
+        ranking = self.guilds.get(guild_id)
+        if ranking is None:
+            ranking = self.guilds[guild_id] = GuildRanking()
+        ranking.set(user_id, xp)
+        self.updates += 1
+
+    def remove(self, guild_id, user_id):
+        ranking = self.guilds.get(guild_id)
+        if ranking:
+            ranking.remove(user_id)
+
+    def clear_guild(self, guild_id):
+        self.guilds.pop(guild_id, None)
+
+    def rank(self, guild_id, xp):
+        """1-based position of a member with this much XP."""
+        self.lookups += 1
+        ranking = self.guilds.get(guild_id)
+        return ranking.rank(xp) if ranking else 1
+
+    def top(self, guild_id, limit, offset=0):
+        """[(user_id, xp)] by XP descending."""
+        ranking = self.guilds.get(guild_id)
+        return ranking.top(limit, offset) if ranking else []
+
+    def page(self, guild_id, limit, after=None, before=None):
+        """
+        One leaderboard page, keyset-paginated on (xp, user_id): `after` and
+        `before` are the (xp, user_id) of the last/first row of the page the
+        user is on. Returns (position of first row, [(user_id, xp)]).
+        """
+        ranking = self.guilds.get(guild_id)
+        if not ranking:
+            return 0, []
+        to_key = lambda cursor: None if cursor is None else (-cursor[0], cursor[1])
+        start, keys = ranking.page(limit, to_key(after), to_key(before))
+        return start, [(user_id, -neg_xp) for neg_xp, user_id in keys]
+
+    def size(self, guild_id):
+        ranking = self.guilds.get(guild_id)
+        return len(ranking) if ranking else 0
+
+    def stats(self):
+        return {
+            "guilds": len(self.guilds),
+            "members": sum(len(r) for r in self.guilds.values()),
+            "build_ms": self.build_ms,
+            "lookups": self.lookups,
+            "updates": self.updates,
+        }
@@ -0,0 +1,68 @@
+# Per-guild shop catalog, loaded from shop_items once and kept until the shop changes.
+# /shop list, /shop buy and the item-name autocomplete all read it, so browsing
+# and typing never query the database. Names are matched case-insensitively
+# through a casefolded dict; /shop add and /shop remove invalidate the guild.
+
+from database import db_manager
+
+class Catalog:
+    __slots__ = ("items", "by_name")
+
+    def __init__(self, rows):
+        self.items = [dict(row) for row in rows]
+        # First item wins if two share a name, like the old LIMIT-less lookup's first row
+        self.by_name = {}
+        for item in self.items:
+            self.by_name.setdefault(item["name"].casefold(), item)
+
+    def find(self, name):
+        return self.by_name.get(name.strip().casefold())
+
+    def search(self, text, limit=25):
+        """Items whose name starts with text, then ones that contain it."""
+        text = text.strip().casefold()
+        if not text:
+            return self.items[:limit]
+        starts, contains = [], []
+        for item in self.items:
+            name = item["name"].casefold()
+            if name.startswith(text):
+                starts.append(item)
+            elif text in name:
+                contains.append(item)
+        return (starts + contains)[:limit]
+
+class ShopCatalog:
+    def __init__(self):
+        self._catalogs = {}  # guild_id -> Catalog
+        self._generation = 0  # bumped on invalidation so in-flight loads don't store stale rows
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, guild_id):
+        catalog = self._catalogs.get(guild_id)
+        if catalog is not None:
+            self.hits += 1
+            return catalog
+
+        self.misses += 1
+        generation = self._generation
+        catalog = Catalog(await db_manager.fetchall("shop.list", (guild_id,)))
+        if generation == self._generation:
+            self._catalogs[guild_id] = catalog
+        return catalog
+
+    def invalidate(self, guild_id):
+        self._generation += 1
+        self._catalogs.pop(guild_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "guilds": len(self._catalogs),
+            "items": sum(len(c.items) for c in self._catalogs.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
@@ -2,7 +2,7 @@ import discord
 from discord.ext import commands, tasks
 from discord.ui import View, Select, Button, Modal, TextInput
 import logger
-import aiosqlite
+from database import db_manager
 from sports_api import sports_client, SPORT_MAPPING, REVERSE_MAPPING
 from economy import Economy
 import datetime
@@ -23,25 +23,16 @@ class ConfirmationView(View):
         # But wait, send_modal is an interaction response. The ConfirmationView is sent as a followup to that interaction?
         # Yes.
 
-        # Check Balance again (sanity check)
+        # Deduct Balance (fails if it dropped since the modal's check)
         economy = interaction.client.get_cog("Economy")
-        balance = await economy.get_balance(interaction.user.id)
-        if balance < self.wager:
+        if await economy.debit(interaction.user.id, self.wager, "sports_wager") is None:
+            balance = await economy.get_balance(interaction.user.id)
             await interaction.response.send_message(f"Insufficient funds. You have {balance} coins.", ephemeral=True)
             return
 
-        # Deduct Balance
-        await economy.update_balance(interaction.user.id, -self.wager)
-
         # Save to DB
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("""
-                INSERT INTO active_sports_bets
-                (user_id, guild_id, game_id, sport_key, bet_type, bet_selection, bet_line, wager_amount, potential_payout, status, matchup)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'PENDING', ?)
-            """, (interaction.user.id, interaction.guild_id, self.modal.game_id, self.modal.sport_key,
-                  self.modal.bet_type, self.modal.selection, str(self.modal.line), self.wager, self.payout, self.modal.matchup))
-            await db.commit()
+        await db_manager.run("sports.place", (interaction.user.id, interaction.guild_id, self.modal.game_id, self.modal.sport_key,
+                                              self.modal.bet_type, self.modal.selection, str(self.modal.line), self.wager, self.payout, self.modal.matchup))
 
         # Update Message
         embed = discord.Embed(title="✅ Bet Placed Successfully!", color=discord.Color.green())
@@ -341,21 +332,13 @@ class Sportsbook(commands.Cog):
     async def mybets(self, interaction: discord.Interaction, filter: discord.app_commands.Choice[str] = None):
         filter_val = filter.value if filter else "active"
 
-        user_id = interaction.user.id
-        query = "SELECT * FROM active_sports_bets WHERE user_id = ?"
-        params = [user_id]
-
-        if filter_val == "active":
-            query += " AND status = 'PENDING'"
-        elif filter_val == "history":
-            query += " AND status != 'PENDING'"
-
-        query += " ORDER BY id DESC LIMIT 20" # Limit to last 20 for now
-
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(query, tuple(params)) as cursor:
-                bets = await cursor.fetchall()
+        # Last 20 for now
+        query = {"active": "sports.user_active", "history": "sports.user_history"}.get(filter_val, "sports.user_all")
+        if query == "sports.user_active":
+            bets = await db_manager.fetchall(query, (interaction.user.id,))
+        else:
+            # Settled bets may already have been moved to the archive table
+            bets = await db_manager.fetchall(query, (interaction.user.id, interaction.user.id))
 
         if not bets:
             await interaction.response.send_message(f"No {filter_val} bets found.", ephemeral=True)
@@ -398,10 +381,7 @@ class Sportsbook(commands.Cog):
             await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
             return
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM active_sports_bets WHERE status = 'PENDING' ORDER BY id DESC LIMIT 25") as cursor:
-                bets = await cursor.fetchall()
+        bets = await db_manager.fetchall("sports.pending_recent")
 
         if not bets:
             await interaction.response.send_message("No active bets found.", ephemeral=True)
@@ -457,27 +437,30 @@ class Sportsbook(commands.Cog):
     async def run_settlement_logic(self, interaction):
         logger.info("Starting manual settlement...")
         try:
-            async with aiosqlite.connect("bot_data.db") as db:
-                db.row_factory = aiosqlite.Row
-                async with db.execute("SELECT * FROM active_sports_bets WHERE status = 'PENDING'") as cursor:
-                    pending_bets = await cursor.fetchall()
-
-                if not pending_bets:
-                    await interaction.followup.send("No pending bets to settle.")
-                    return
-
-                bets_by_sport = {}
-                for bet in pending_bets:
-                    key = bet['sport_key']
-                    if key not in bets_by_sport: bets_by_sport[key] = []
-                    bets_by_sport[key].append(bet)
-
-                settled_count = 0
-                for sport_key, bets in bets_by_sport.items():
-                    # Fetch scores (API CALL)
-                    scores = await sports_client.get_scores(sport_key)
-                    if not scores: continue
+            pending_bets = await db_manager.fetchall("sports.pending")
+
+            if not pending_bets:
+                await interaction.followup.send("No pending bets to settle.")
+                return
 
+            bets_by_sport = {}
+            for bet in pending_bets:
+                key = bet['sport_key']
+                if key not in bets_by_sport: bets_by_sport[key] = []
+                bets_by_sport[key].append(bet)
+
+            settled_count = 0
+            economy = self.bot.get_cog("Economy")
+            for sport_key, bets in bets_by_sport.items():
+                # Fetch scores (API CALL)
+                scores = await sports_client.get_scores(sport_key)
+                if not scores: continue
+
+                # Scores are fetched before taking the writer so the API call never blocks other writes
+                async with db_manager.write() as db:
+                    # Re-read under the writer: a settlement that ran meanwhile may have closed some
+                    bets = [b for b in await db.fetchall("sports.pending") if b['sport_key'] == sport_key]
+                    payouts, pushes, statuses = [], [], []
                     for bet in bets:
                         game_result = next((g for g in scores if g['id'] == bet['game_id'] and g['completed']), None)
                         if not game_result: continue
@@ -522,16 +505,16 @@ class Sportsbook(commands.Cog):
                         if status != 'PENDING':
                             settled_count += 1
                             if status == 'WON':
-                                economy = self.bot.get_cog("Economy")
-                                if economy: await economy.update_balance(bet['user_id'], bet['potential_payout'])
-                                await db.execute("UPDATE active_sports_bets SET status = 'WON' WHERE id = ?", (bet['id'],))
-                            elif status == 'LOST':
-                                await db.execute("UPDATE active_sports_bets SET status = 'LOST' WHERE id = ?", (bet['id'],))
+                                payouts.append((bet['user_id'], bet['potential_payout']))
                             elif status == 'PUSH':
-                                economy = self.bot.get_cog("Economy")
-                                if economy: await economy.update_balance(bet['user_id'], bet['wager_amount'])
-                                await db.execute("UPDATE active_sports_bets SET status = 'PUSH' WHERE id = ?", (bet['id'],))
-
+                                pushes.append((bet['user_id'], bet['wager_amount']))
+                            statuses.append((status, bet['id']))
+
+                    # One batch per sport: payouts, refunds and statuses commit together
+                    if economy:
+                        await economy.settle(payouts, "sports_payout")
+                        await economy.settle(pushes, "sports_push")
+                    await db.run_many("sports.set_status", statuses)
                     await db.commit()
 
             await interaction.followup.send(f"✅ Settlement Complete. Processed {settled_count} bets.")
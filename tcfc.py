@@ -1,6 +1,6 @@
 import discord
 from discord.ext import commands
-import aiosqlite
+from database import db_manager
 import random
 import math
 import logger
@@ -12,15 +12,10 @@ class TCFC(commands.Cog):
         self.bot = bot
 
     async def get_fighter(self, user_id):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_fighters WHERE user_id = ?", (user_id,)) as cursor:
-                return await cursor.fetchone()
+        return await db_manager.fetchone("tcfc.fighter", (user_id,))
 
     async def create_fighter(self, user_id):
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("INSERT OR IGNORE INTO tcfc_fighters (user_id) VALUES (?)", (user_id,))
-            await db.commit()
+        await db_manager.run("tcfc.create_fighter", (user_id,))
 
     def calculate_odds(self, elo_a, elo_b):
         prob_a = 1 / (1 + 10 ** ((elo_b - elo_a) / 400))
@@ -36,7 +31,7 @@ class TCFC(commands.Cog):
             return True
 
         config = await config_manager.get_guild_config(interaction.guild_id)
-        channel_id = config.get('tcfc_channel_id')
+        channel_id = config.tcfc_channel_id
 
         if channel_id and interaction.channel_id != channel_id:
             await interaction.response.send_message(f"TCFC commands are locked to <#{channel_id}>.", ephemeral=True)
@@ -65,10 +60,7 @@ class TCFC(commands.Cog):
 
     @tcfc.command(name="leaderboard", description="Show leaderboard")
     async def leaderboard(self, ctx):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_fighters ORDER BY elo DESC LIMIT 10") as cursor:
-                fighters = await cursor.fetchall()
+        fighters = await db_manager.fetchall("tcfc.top_fighters")
 
         embed = discord.Embed(title="🥊 TCFC Leaderboard", color=discord.Color.red())
         for idx, f in enumerate(fighters, 1):
@@ -80,10 +72,7 @@ class TCFC(commands.Cog):
     @tcfc.command(name="create_tournament", description="Create fight bracket (Admin)")
     @commands.has_permissions(administrator=True)
     async def create_tournament(self, ctx, name: str, mode: str = "random"):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_fighters") as cursor:
-                fighters = await cursor.fetchall()
+        fighters = await db_manager.fetchall("tcfc.all_fighters")
 
         if len(fighters) < 2: return await ctx.send("Not enough fighters.")
 
@@ -96,7 +85,7 @@ class TCFC(commands.Cog):
             pairs.append((fighters[i], fighters[i+1]))
 
         desc = ""
-        async with aiosqlite.connect("bot_data.db") as db:
+        async with db_manager.write() as db:
             for f1, f2 in pairs:
                 user1 = ctx.guild.get_member(f1['user_id'])
                 user2 = ctx.guild.get_member(f2['user_id'])
@@ -105,8 +94,7 @@ class TCFC(commands.Cog):
 
                 desc += f"🥊 **{n1}** vs **{n2}**\n"
 
-                await db.execute("INSERT INTO tcfc_matches (fighter_a, fighter_b, tournament_id, status) VALUES (?, ?, ?, 'OPEN')",
-                                 (f1['user_id'], f2['user_id'], name))
+                await db.run("tcfc.create_match", (f1['user_id'], f2['user_id'], name))
             await db.commit()
 
         embed = discord.Embed(title=f"🏆 Tournament: {name}", description=desc, color=discord.Color.gold())
@@ -124,10 +112,7 @@ class TCFC(commands.Cog):
         if not f1: return await ctx.send(f"{fighter_a.mention} is not registered.", ephemeral=True)
         if not f2: return await ctx.send(f"{fighter_b.mention} is not registered.", ephemeral=True)
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("INSERT INTO tcfc_matches (fighter_a, fighter_b, tournament_id, status) VALUES (?, ?, 'Single Match', 'OPEN')",
-                             (fighter_a.id, fighter_b.id))
-            await db.commit()
+        await db_manager.run("tcfc.create_match", (fighter_a.id, fighter_b.id, "Single Match"))
 
         embed = discord.Embed(title="🥊 New Fight Created", color=discord.Color.green())
         embed.description = f"**{fighter_a.display_name}** vs **{fighter_b.display_name}**\nStatus: OPEN for betting."
@@ -135,10 +120,7 @@ class TCFC(commands.Cog):
 
     @tcfc.command(name="active_fights", description="Show active fights")
     async def active_fights(self, ctx):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_matches WHERE status = 'OPEN'") as cursor:
-                matches = await cursor.fetchall()
+        matches = await db_manager.fetchall("tcfc.open_matches")
 
         if not matches: return await ctx.send("No active fights.")
 
@@ -179,14 +161,12 @@ class TCFC(commands.Cog):
         if not is_analyst and not ctx.author.guild_permissions.administrator:
             return await ctx.send("Only the TCFC Analyst or Admins can report results.", ephemeral=True)
 
-        # 1. Update Match
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_matches WHERE id = ? AND status = 'OPEN'", (match_id,)) as cursor:
-                match = await cursor.fetchone()
+        match = await db_manager.fetchone("tcfc.open_match", (match_id,))
 
-            if not match: return await ctx.send("Match not found or closed.")
+        if not match: return await ctx.send("Match not found or closed.")
 
+        # 1. Update Match
+        async with db_manager.write() as db:
             loser_id = match['fighter_a'] if match['fighter_b'] == winner.id else match['fighter_b']
 
             # 2. Update ELO
@@ -207,21 +187,17 @@ class TCFC(commands.Cog):
             new_l = elo_l - change
 
             # Save Stats
-            await db.execute("UPDATE tcfc_fighters SET elo = ?, wins = wins + 1, kos = kos + ?, rounds_fought = rounds_fought + ? WHERE user_id = ?",
-                             (new_w, 1 if method.lower() == 'ko' else 0, rounds, winner.id))
-
-            await db.execute("UPDATE tcfc_fighters SET elo = ?, losses = losses + 1, rounds_fought = rounds_fought + ? WHERE user_id = ?",
-                             (new_l, rounds, loser_id))
-
-            await db.execute("UPDATE tcfc_matches SET status = 'RESOLVED', winner_id = ?, method = ?, round = ? WHERE id = ?",
-                             (winner.id, method, rounds, match_id))
+            await db.run("tcfc.record_win", (new_w, 1 if method.lower() == 'ko' else 0, rounds, winner.id))
+            await db.run("tcfc.record_loss", (new_l, rounds, loser_id))
+            await db.run("tcfc.resolve_match", (winner.id, method, rounds, match_id))
 
             # 3. Payout Bets
-            async with db.execute("SELECT * FROM tcfc_bets WHERE match_id = ? AND status = 'PENDING'", (match_id,)) as cursor:
-                bets = await cursor.fetchall()
+            bets = await db.fetchall("tcfc.pending_bets", (match_id,))
 
             econ = self.bot.get_cog("Economy")
-            payout_count = 0
+            payouts = []
+            won_rows = []
+            lost_rows = []
 
             for bet in bets:
                 won = False
@@ -242,11 +218,16 @@ class TCFC(commands.Cog):
 
                     payout = int(wager + profit)
 
-                    await econ.update_balance(bet['user_id'], payout)
-                    payout_count += 1
-                    await db.execute("UPDATE tcfc_bets SET status = 'WON', potential_payout = ? WHERE id = ?", (payout, bet['id']))
+                    payouts.append((bet['user_id'], payout))
+                    won_rows.append((payout, bet['id']))
                 else:
-                    await db.execute("UPDATE tcfc_bets SET status = 'LOST' WHERE id = ?", (bet['id'],))
+                    lost_rows.append(('LOST', bet['id']))
+
+            # Every payout and bet status in one batch each, same transaction
+            await econ.settle(payouts, "tcfc_payout")
+            await db.run_many("tcfc.bet_won", won_rows)
+            await db.run_many("tcfc.set_bet_status", lost_rows)
+            payout_count = len(won_rows)
 
             await db.commit()
 
@@ -256,10 +237,7 @@ class TCFC(commands.Cog):
     async def tcfc_bet(self, ctx):
         # Check permissions handled by interaction_check above
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_matches WHERE status = 'OPEN'") as cursor:
-                matches = await cursor.fetchall()
+        matches = await db_manager.fetchall("tcfc.open_matches")
 
         if not matches: return await ctx.send("No matches open for betting.")
 
@@ -269,41 +247,31 @@ class TCFC(commands.Cog):
     @tcfc.command(name="reset_fighter", description="Reset a fighter's stats and ELO (Admin Only)")
     @commands.has_permissions(administrator=True)
     async def reset_fighter(self, ctx, fighter: discord.Member):
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("""
-                UPDATE tcfc_fighters
-                SET elo = 1000, wins = 0, losses = 0, kos = 0, rounds_fought = 0, total_damage = 0
-                WHERE user_id = ?
-            """, (fighter.id,))
-            await db.commit()
+        await db_manager.run("tcfc.reset_fighter", (fighter.id,))
         await ctx.send(f"✅ Reset stats for {fighter.mention}.", ephemeral=True)
 
     @tcfc.command(name="void_match", description="Void a match (Admin Only)")
     @commands.has_permissions(administrator=True)
     async def void_match(self, ctx, match_id: int):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            # Check match status
-            async with db.execute("SELECT * FROM tcfc_matches WHERE id = ?", (match_id,)) as cursor:
-                match = await cursor.fetchone()
+        # Check match status
+        match = await db_manager.fetchone("tcfc.match", (match_id,))
 
-            if not match: return await ctx.send("Match not found.", ephemeral=True)
+        if not match: return await ctx.send("Match not found.", ephemeral=True)
 
+        async with db_manager.write() as db:
             # Refund Bets if Open
             refund_count = 0
             if match['status'] == 'OPEN':
-                async with db.execute("SELECT * FROM tcfc_bets WHERE match_id = ?", (match_id,)) as cursor:
-                    bets = await cursor.fetchall()
+                bets = await db.fetchall("tcfc.match_bets", (match_id,))
 
                 econ = self.bot.get_cog("Economy")
-                for bet in bets:
-                    if bet['status'] == 'PENDING':
-                        await econ.update_balance(bet['user_id'], bet['wager'])
-                        await db.execute("UPDATE tcfc_bets SET status = 'VOID' WHERE id = ?", (bet['id'],))
-                        refund_count += 1
+                pending = [bet for bet in bets if bet['status'] == 'PENDING']
+                await econ.settle([(bet['user_id'], bet['wager']) for bet in pending], "tcfc_refund")
+                await db.run_many("tcfc.set_bet_status", [('VOID', bet['id']) for bet in pending])
+                refund_count = len(pending)
 
             # Update Match Status
-            await db.execute("UPDATE tcfc_matches SET status = 'VOID' WHERE id = ?", (match_id,))
+            await db.run("tcfc.void_match", (match_id,))
             await db.commit()
 
         await ctx.send(f"🚫 Match #{match_id} marked as VOID. Refunded {refund_count} pending bets.", ephemeral=True)
@@ -406,10 +374,7 @@ class BetTypeView(View):
 
     @discord.ui.button(label="Winner", style=discord.ButtonStyle.primary)
     async def winner(self, interaction: discord.Interaction, button: discord.ui.Button):
-        async with aiosqlite.connect("bot_data.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM tcfc_matches WHERE id = ?", (self.match_id,)) as cursor:
-                match = await cursor.fetchone()
+        match = await db_manager.fetchone("tcfc.match", (self.match_id,))
 
         view = FighterSelectView(match, self.bot, self.cog)
         await interaction.response.edit_message(content="Who will win?", view=view)
@@ -459,10 +424,9 @@ class WagerModalTCFC(Modal):
             return await interaction.response.send_message("Invalid amount.", ephemeral=True)
 
         econ = self.bot.get_cog("Economy")
-        bal = await econ.get_balance(interaction.user.id)
-        if bal < amt: return await interaction.response.send_message(f"Insufficient funds. ({bal})", ephemeral=True)
-
-        await econ.update_balance(interaction.user.id, -amt)
+        if await econ.debit(interaction.user.id, amt, "tcfc_wager") is None:
+            bal = await econ.get_balance(interaction.user.id)
+            return await interaction.response.send_message(f"Insufficient funds. ({bal})", ephemeral=True)
 
         # Calculate Potential Payout
         if self.odds > 0:
@@ -471,12 +435,7 @@ class WagerModalTCFC(Modal):
             profit = amt / (abs(self.odds) / 100)
         potential = int(amt + profit)
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("""
-                INSERT INTO tcfc_bets (user_id, match_id, bet_type, selection, wager, odds, potential_payout, status)
-                VALUES (?, ?, 'WINNER', ?, ?, ?, ?, 'PENDING')
-            """, (interaction.user.id, self.match_id, self.selection, amt, self.odds, potential))
-            await db.commit()
+        await db_manager.run("tcfc.place_bet", (interaction.user.id, self.match_id, self.selection, amt, self.odds, potential))
 
         await interaction.response.send_message(f"✅ Bet {amt} on Fighter {self.selection} (Odds: {self.odds}).\nPotential Payout: {potential}", ephemeral=True)
 
@@ -15,7 +15,7 @@ class Tracking(commands.Cog):
     # --- Helper: Log to Channel ---
     async def log_to_channel(self, guild, embed):
         config = await config_manager.get_guild_config(guild.id)
-        log_channel_id = config.get('log_channel_id')
+        log_channel_id = config.log_channel_id
         if log_channel_id:
             try:
                 channel = guild.get_channel(int(log_channel_id))
@@ -135,10 +135,9 @@ class Tracking(commands.Cog):
 
         # Fetch Rate
         config = await config_manager.get_guild_config(member.guild.id)
-        rate = config.get('xp_rate', 1.0)
 
         base_xp = minutes * 10 # 10 XP per minute
-        xp = int(base_xp * rate)
+        xp = int(base_xp * config.xp_rate)
 
         # Use Leveling Cog to handle XP and Level Ups
         leveling_cog = self.bot.get_cog("Leveling")
@@ -160,28 +159,22 @@ class Tracking(commands.Cog):
     @flag_group.command(name="add", description="Add a word to the flagged list")
     @commands.has_permissions(manage_messages=True)
     async def flag_add(self, ctx, word: str):
-        async with aiosqlite.connect("bot_data.db") as db:
-            try:
-                await db.execute("INSERT INTO flagged_words (guild_id, word) VALUES (?, ?)", (ctx.guild.id, word.lower()))
-                await db.commit()
-                await ctx.send(f"Added `||{word}||` to flagged list.")
-            except aiosqlite.IntegrityError:
-                await ctx.send("Word is already flagged.")
+        try:
+            await db_manager.run("flagged.add", (ctx.guild.id, word.lower()))
+            await ctx.send(f"Added `||{word}||` to flagged list.")
+        except aiosqlite.IntegrityError:
+            await ctx.send("Word is already flagged.")
 
     @flag_group.command(name="remove", description="Remove a word from the flagged list")
     @commands.has_permissions(manage_messages=True)
     async def flag_remove(self, ctx, word: str):
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("DELETE FROM flagged_words WHERE guild_id = ? AND word = ?", (ctx.guild.id, word.lower()))
-            await db.commit()
+        await db_manager.run("flagged.remove", (ctx.guild.id, word.lower()))
         await ctx.send(f"Removed `||{word}||` from flagged list.")
 
     @flag_group.command(name="list", description="List all flagged words")
     @commands.has_permissions(manage_messages=True)
     async def flag_list(self, ctx):
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT word FROM flagged_words WHERE guild_id = ?", (ctx.guild.id,)) as cursor:
-                rows = await cursor.fetchall()
+        rows = await db_manager.fetchall("flagged.words", (ctx.guild.id,))
 
         if not rows:
             await ctx.send("No flagged words set.")
@@ -213,36 +206,34 @@ class Tracking(commands.Cog):
     async def on_message(self, message):
         if message.author.bot: return
 
-        async with aiosqlite.connect("bot_data.db") as db:
-            async with db.execute("SELECT word FROM flagged_words WHERE guild_id = ?", (message.guild.id,)) as cursor:
-                async for row in cursor:
-                    word = row[0]
-                    if word.lower() in message.content.lower():
-                        # Flagged
-                        embed = discord.Embed(
-                            title="⚠️ Flagged Word Detected",
-                            description=f"{message.author.mention} used a flagged word in {message.channel.mention}",
-                            color=discord.Color.yellow(),
-                            timestamp=discord.utils.utcnow()
-                        )
-                        embed.add_field(name="Word", value=f"||{word}||") # Spoiler the word
-                        embed.add_field(name="Content", value=f"||{message.content}||")
-                        await self.log_to_channel(message.guild, embed)
-                        # Optional: Auto-delete? User didn't specify. Just log for now.
-                        break
+        rows = await db_manager.fetchall("flagged.words", (message.guild.id,))
+
+        for row in rows:
+            word = row[0]
+            if word.lower() in message.content.lower():
+                # Flagged
+                embed = discord.Embed(
+                    title="⚠️ Flagged Word Detected",
+                    description=f"{message.author.mention} used a flagged word in {message.channel.mention}",
+                    color=discord.Color.yellow(),
+                    timestamp=discord.utils.utcnow()
+                )
+                embed.add_field(name="Word", value=f"||{word}||") # Spoiler the word
+                embed.add_field(name="Content", value=f"||{message.content}||")
+                await self.log_to_channel(message.guild, embed)
+                # Optional: Auto-delete? User didn't specify. Just log for now.
+                break
 
     # --- Moderation Commands ---
     @commands.hybrid_command(name="warn", description="Warn a user")
     @commands.has_permissions(kick_members=True)
     async def warn(self, ctx, user: discord.Member, *, reason: str):
-        async with aiosqlite.connect("bot_data.db") as db:
-            await db.execute("INSERT INTO warnings (guild_id, user_id, moderator_id, reason) VALUES (?, ?, ?, ?)",
-                             (ctx.guild.id, user.id, ctx.author.id, reason))
+        async with db_manager.write() as db:
+            await db.run("warnings.add", (ctx.guild.id, user.id, ctx.author.id, reason))
             await db.commit()
 
             # Count warnings
-            async with db.execute("SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?", (ctx.guild.id, user.id)) as cursor:
-                count = (await cursor.fetchone())[0]
+            count = await db.fetchval("warnings.count", (ctx.guild.id, user.id), 0)
 
         embed = discord.Embed(title="User Warned", color=discord.Color.gold())
         embed.add_field(name="User", value=user.mention)
@@ -275,10 +266,7 @@ class Tracking(commands.Cog):
 
     @commands.hybrid_command(name="modlogs", description="Check moderation logs for a user")
     async def modlogs(self, ctx, user: discord.Member):
-         async with aiosqlite.connect("bot_data.db") as db:
-             db.row_factory = aiosqlite.Row
-             async with db.execute("SELECT * FROM warnings WHERE guild_id = ? AND user_id = ? ORDER BY timestamp DESC LIMIT 10", (ctx.guild.id, user.id)) as cursor:
-                 rows = await cursor.fetchall()
+         rows = await db_manager.fetchall("warnings.recent", (ctx.guild.id, user.id))
 
          if not rows:
              await ctx.send(f"{user.mention} has no warnings.")
@@ -0,0 +1,159 @@
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from database import db_manager
+import level_curve
+import logger
+
+load_dotenv()
+
+# Seconds between background flushes of pending XP to user_levels
+XP_FLUSH_INTERVAL = float(os.getenv("XP_FLUSH_INTERVAL", "10"))
+# Flush early once this many users have unsaved XP
+XP_FLUSH_MAX = int(os.getenv("XP_FLUSH_MAX", "500"))
+# Clean (already saved) entries kept in memory to skip the read on the next message
+XP_CACHE_SIZE = int(os.getenv("XP_CACHE_SIZE", "10000"))
+
+class XPAccumulator:
+    """
+    Write-behind buffer for user_levels.
+    XP and level-ups are applied in memory straight away; the changed rows are
+    written in one executemany transaction every XP_FLUSH_INTERVAL seconds,
+    once XP_FLUSH_MAX users are pending, and on shutdown.
+    """
+    def __init__(self, max_pending=XP_FLUSH_MAX, cache_size=XP_CACHE_SIZE):
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.entries = OrderedDict()  # (guild_id, user_id) -> [xp, level, last_message_time]
+        self.dirty = set()
+        self.resets = 0  # bumped by discard() so in-flight loads can't resurrect old XP
+
+        # Metrics
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.last_flush_at = None
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_depth = 0
+
+    async def _load(self, key):
+        while True:
+            resets = self.resets
+            row = await db_manager.fetchone("levels.get_xp", key)
+            if resets == self.resets:
+                break
+
+        # Another message for the same user may have loaded it while we awaited
+        if key not in self.entries:
+            self.entries[key] = [row[0], row[1], row[2] or 0] if row else [0, 0, 0]
+        return self.entries[key]
+
+    async def get(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        entry = self.entries.get(key) or await self._load(key)
+        return entry[0], entry[1]
+
+    async def add(self, guild_id, user_id, amount, curve=None, message_time=None):
+        """
+        Add XP in memory. Returns (leveled_up, new_level) like the old add_xp.
+        message_time (message XP only) is saved as last_message_time with the flush.
+        """
+        curve = curve or level_curve.parse(level_curve.DEFAULT_CURVE)
+        key = (guild_id, user_id)
+        entry = self.entries.get(key) or await self._load(key)
+        self.entries.move_to_end(key)
+
+        current_level = entry[1]
+        entry[0] += amount
+        # Closed form, so a big grant jumps straight to its level
+        entry[1] = curve.level_for(entry[0])
+        if message_time is not None:
+            entry[2] = message_time
+
+        self.dirty.add(key)
+        self.max_depth = max(self.max_depth, len(self.dirty))
+        if len(self.dirty) >= self.max_pending:
+            try:
+                await self.flush()
+            except Exception:
+                pass  # Already logged; the rows stay dirty for the next flush
+        else:
+            self._evict()
+
+        return entry[1] > current_level, entry[1]
+
+    def discard(self, guild_id, user_id=None):
+        """
+        Forget pending XP for one user or a whole guild.
+        Call after the DELETE commits, still inside its write() block: a flush
+        can't slip in before it, and a message that read the old row while the
+        DELETE was pending is dropped here instead of being written back.
+        """
+        self.resets += 1
+        keys = [k for k in self.entries if k[0] == guild_id and (user_id is None or k[1] == user_id)]
+        for key in keys:
+            del self.entries[key]
+            self.dirty.discard(key)
+
+    def relevel(self, guild_id, curve):
+        """
+        Recompute cached levels for a guild after its curve changed.
+        Call inside the write() block that re-levels user_levels, after a flush.
+        """
+        for (g, _), entry in self.entries.items():
+            if g == guild_id:
+                entry[1] = curve.level_for(entry[0])
+
+    def _evict(self):
+        # Drop the least recently used clean entries; dirty ones stay until flushed
+        excess = len(self.entries) - self.cache_size
+        if excess <= 0:
+            return
+        for key in list(self.entries):
+            if excess <= 0:
+                break
+            if key not in self.dirty:
+                del self.entries[key]
+                excess -= 1
+
+    async def flush(self):
+        if not self.dirty:
+            return 0
+
+        start = time.perf_counter()
+        async with db_manager.write() as db:
+            # Snapshot under the writer lock so resets can't interleave with the write
+            keys = list(self.dirty)
+            self.dirty.clear()
+            rows = [(g, u, *self.entries[(g, u)]) for g, u in keys]
+            try:
+                await db.run_many("levels.upsert_many", rows)
+                await db.commit()
+            except Exception as e:
+                # Keep the XP so the next flush retries it
+                self.dirty.update(k for k in keys if k in self.entries)
+                logger.error(f"XP flush of {len(rows)} rows failed: {e}")
+                raise
+
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+        self.last_flush_at = time.time()
+        self.last_flush_rows = len(rows)
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        self._evict()
+        return len(rows)
+
+    def stats(self):
+        return {
+            "flush_interval": XP_FLUSH_INTERVAL,
+            "max_pending": self.max_pending,
+            "queue_depth": len(self.dirty),
+            "max_depth": self.max_depth,
+            "cached": len(self.entries),
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "last_flush_at": self.last_flush_at,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": self.last_flush_ms,
+        }
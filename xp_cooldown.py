@@ -0,0 +1,93 @@
+# Per-member message XP cooldown, checked before any database work.
+# Each (guild_id, user_id) on cooldown is filed in a time wheel under the
+# second its cooldown ends; advancing the wheel drops whole buckets, so expiry
+# costs O(members expiring) rather than a sweep of everyone tracked.
+# The last rewarded message time is also kept on the XP accumulator entry and
+# written to user_levels.last_message_time with the next flush, which is what
+# seed() restores cooldowns from after a restart.
+
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default seconds between XP-earning messages; guilds override it with /leveling cooldown
+XP_COOLDOWN = int(os.getenv("XP_COOLDOWN", "60"))
+
+class CooldownWheel:
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+        self.expires = {}  # key -> time its cooldown ends
+        self.buckets = {}  # wheel tick -> keys expiring in that tick
+        self.cursor = None  # next tick to expire
+
+        # Metrics
+        self.allowed = 0
+        self.dropped = 0
+        self.expired = 0
+
+    def _tick(self, when):
+        return int(when // self.resolution)
+
+    def _advance(self, now):
+        tick = self._tick(now)
+        if self.cursor is None:
+            self.cursor = tick
+        if tick < self.cursor:
+            return
+        if tick - self.cursor > len(self.buckets):
+            # Idle for a while: visit the buckets that exist instead of every tick since
+            due = [t for t in self.buckets if t <= tick]
+        else:
+            due = range(self.cursor, tick + 1)
+        for t in due:
+            for key in self.buckets.pop(t, ()):
+                ends = self.expires.get(key)
+                if ends is None or self._tick(ends) != t:
+                    continue  # Discarded, or filed again under a later tick
+                if ends <= now:
+                    del self.expires[key]
+                    self.expired += 1
+                else:
+                    # Ends later in the current tick; look again next time
+                    self.buckets.setdefault(t, set()).add(key)
+        self.cursor = tick
+
+    def _file(self, key, ends):
+        self.expires[key] = ends
+        self.buckets.setdefault(self._tick(ends), set()).add(key)
+
+    def hit(self, key, window, now=None):
+        """
+        Record a message. True if it earns XP (and starts a new cooldown),
+        False if the member is still cooling down from the last one.
+        """
+        now = time.time() if now is None else now
+        self._advance(now)
+        ends = self.expires.get(key)
+        if ends is not None and ends > now:
+            self.dropped += 1
+            return False
+        self.allowed += 1
+        if window > 0:
+            self._file(key, now + window)
+        return True
+
+    def seed(self, key, last_message_time, window, now=None):
+        """Restore a cooldown from a persisted last_message_time."""
+        now = time.time() if now is None else now
+        ends = (last_message_time or 0) + window
+        if ends > now and ends > self.expires.get(key, 0):
+            self._file(key, ends)
+
+    def stats(self):
+        total = self.allowed + self.dropped
+        return {
+            "tracked": len(self.expires),
+            "buckets": len(self.buckets),
+            "allowed": self.allowed,
+            "dropped": self.dropped,
+            "expired": self.expired,
+            "drop_rate": (self.dropped / total) if total else 0.0,
+        }